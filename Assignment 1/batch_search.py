@@ -0,0 +1,217 @@
+"""
+Batched random search for the linear distance correction in ml.py.
+
+Instead of one Python loop per guess and per data point, thetas are drawn in
+chunks (chunk_size x 4) and all losses of a chunk come from one matrix
+product against the stacked features [1, theoretical, angles, footsteps].
+
+The draws are taken from a numpy RandomState that is handed the exact
+Mersenne Twister state of Python's `random` module, so for the same seed
+the thetas are bit for bit the ones ml.py's loop would draw with
+random.uniform (both build a double from two 32-bit outputs the same way).
+Afterwards the `random` module continues where the batch left off.
+
+cem_search is the adaptive alternative: a cross-entropy search that refits
+a Gaussian to the elite fraction of every batch and stops once the best
+loss stalls. Run this file to compare evaluations-to-target-loss of both.
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+
+# (low, high) for theta0..theta3, same as the original loop
+DEFAULT_BOUNDS = [(-50, 50), (-5, 5), (-5, 5), (-5, 5)]
+
+
+def feature_matrix(theoretical, angles, footsteps):
+    """Rows [1, x1, x2, x3] for every data point."""
+    return np.column_stack([np.ones(len(theoretical)), theoretical, angles, footsteps]).astype(np.float64)
+
+
+def numpy_state_from(rnd):
+    """A RandomState continuing exactly where the `random.Random` `rnd` is."""
+    version, internal, gauss = rnd.getstate()
+    state = np.random.RandomState()
+    state.set_state(("MT19937", np.array(internal[:-1], dtype=np.uint32), internal[-1], 0, 0.0))
+    return state
+
+
+def sync_back(rnd, state):
+    """Move `rnd` to where the RandomState `state` is now."""
+    _, key, pos, _, _ = state.get_state()
+    version, _, gauss = rnd.getstate()
+    rnd.setstate((version, tuple(int(k) for k in key) + (int(pos),), gauss))
+
+
+def scalar_loss(theta, X, y):
+    """The loss exactly as the original loop adds it up, point by point."""
+    total = 0.0
+    for row, target in zip(X.tolist(), y):
+        y_hat = theta[0] + theta[1] * row[1] + theta[2] * row[2] + theta[3] * row[3]
+        total += (y_hat - target) ** 2
+    return total
+
+
+def batch_losses(thetas, X, y):
+    """Sum of squared errors of every theta row, as one matrix product."""
+    residuals = thetas @ X.T - y
+    return np.einsum("ij,ij->i", residuals, residuals)
+
+
+def batch_random_search(X, y, n_guesses=50000, bounds=DEFAULT_BOUNDS, chunk_size=50000,
+                        rnd=random, verbose=True, print_interval=0.5):
+    """
+    Random search over `n_guesses` uniform thetas in `bounds`.
+
+    Returns (best_theta, best_loss, best_index). The winner is the first
+    guess with the lowest loss, like the strict `<` of the original loop;
+    near-ties of the vectorized losses are settled with the scalar loss.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    lo = np.array([b[0] for b in bounds], dtype=np.float64)
+    width = np.array([b[1] - b[0] for b in bounds], dtype=np.float64)
+    dim = len(bounds)
+
+    state = numpy_state_from(rnd)
+    best_theta, best_loss, best_index = None, float("inf"), -1
+    last_print = 0.0
+
+    for start in range(0, n_guesses, chunk_size):
+        n = min(chunk_size, n_guesses - start)
+        # Same order as the loop: theta0..theta3 of guess 0, then guess 1, ...
+        thetas = lo + width * state.random_sample(n * dim).reshape(n, dim)
+
+        losses = batch_losses(thetas, X, y)
+
+        chunk_min = losses.min()
+        if chunk_min > best_loss * (1 + 1e-9):
+            continue
+        tol = 1e-9 * max(abs(chunk_min), 1.0)
+        for i in np.flatnonzero(losses <= chunk_min + tol):
+            exact = scalar_loss(thetas[i].tolist(), X, y)
+            if exact < best_loss:
+                best_theta, best_loss, best_index = thetas[i].tolist(), exact, start + int(i)
+
+        now = time.perf_counter()
+        if verbose and now - last_print >= print_interval:
+            print("guess {:>8d}  best loss: {}  theta: {}".format(start + n, best_loss, best_theta))
+            last_print = now
+
+    sync_back(rnd, state)
+    return best_theta, best_loss, best_index
+
+
+def cem_search(X, y, bounds=DEFAULT_BOUNDS, batch_size=1000, elite_frac=0.1, max_evals=50000,
+               alpha=0.8, patience=3, rel_tol=1e-4, rnd=random, verbose=True):
+    """
+    Cross-entropy search: sample a batch from a Gaussian (clipped to `bounds`),
+    refit mean and full covariance to the best `elite_frac` of it, repeat.
+    The full covariance matters here: theta0 and the slopes trade off against
+    each other, and a diagonal Gaussian collapses before reaching the valley
+    floor. Starts from the centre of the box with half its width as std, and
+    stops after `patience` batches in a row that improve the best loss by
+    less than `rel_tol`.
+
+    Returns (best_theta, best_loss, evaluations, history) where history has
+    (evaluations so far, best loss so far) after every batch.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    lo = np.array([b[0] for b in bounds], dtype=np.float64)
+    hi = np.array([b[1] for b in bounds], dtype=np.float64)
+    dim = len(bounds)
+    mean = (lo + hi) / 2
+    cov = np.diag(((hi - lo) / 2) ** 2)
+    jitter = 1e-12 * np.diag((hi - lo) ** 2)
+    n_elite = max(dim + 1, int(batch_size * elite_frac))
+
+    state = numpy_state_from(rnd)
+    best_theta, best_loss = None, float("inf")
+    evals, stalled, history = 0, 0, []
+
+    while evals < max_evals:
+        n = min(batch_size, max_evals - evals)
+        chol = np.linalg.cholesky(cov + jitter)
+        thetas = mean + state.standard_normal((n, dim)) @ chol.T
+        np.clip(thetas, lo, hi, out=thetas)
+        losses = batch_losses(thetas, X, y)
+        evals += n
+
+        previous = best_loss
+        i = int(np.argmin(losses))
+        exact = scalar_loss(thetas[i].tolist(), X, y)
+        if exact < best_loss:
+            best_theta, best_loss = thetas[i].tolist(), exact
+        history.append((evals, best_loss))
+
+        elite = thetas[np.argpartition(losses, min(n_elite, n) - 1)[:n_elite]]
+        mean = alpha * elite.mean(axis=0) + (1 - alpha) * mean
+        cov = alpha * np.cov(elite, rowvar=False) + (1 - alpha) * cov
+
+        if verbose:
+            print("evals {:>7d}  best loss: {}".format(evals, best_loss))
+        if previous - best_loss <= rel_tol * abs(best_loss):
+            stalled += 1
+            if stalled >= patience:
+                break
+        else:
+            stalled = 0
+
+    sync_back(rnd, state)
+    return best_theta, best_loss, evals, history
+
+
+def uniform_evals_to_target(X, y, target, max_evals, bounds=DEFAULT_BOUNDS, rnd=random):
+    """Number of uniform guesses until the running best loss reaches `target` (None if never)."""
+    lo = np.array([b[0] for b in bounds], dtype=np.float64)
+    width = np.array([b[1] - b[0] for b in bounds], dtype=np.float64)
+    state = numpy_state_from(rnd)
+    thetas = lo + width * state.random_sample(max_evals * len(bounds)).reshape(max_evals, len(bounds))
+    losses = batch_losses(thetas, np.asarray(X, float), np.asarray(y, float))
+    # target is a scalar-loop loss; allow for the different summation order
+    hit = np.flatnonzero(losses <= target * (1 + 1e-9))
+    return int(hit[0]) + 1 if len(hit) else None
+
+
+def cem_evals_to_target(history, target):
+    for evals, loss in history:
+        if loss <= target:
+            return evals
+    return None
+
+
+if __name__ == "__main__":
+    from ml import angles, footsteps, real_dist, theoretical
+
+    parser = argparse.ArgumentParser(description="Evaluations to target loss: uniform vs cross-entropy search")
+    parser.add_argument("--seeds", type=int, default=10)
+    parser.add_argument("--guesses", type=int, default=50000, help="budget of the uniform search")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    X = feature_matrix(theoretical, angles, footsteps)
+    print("{:>5s} {:>14s} {:>14s} {:>12s} {:>12s} {:>10s}".format(
+        "seed", "uniform loss", "cem loss", "uniform", "cem", "cem total"))
+    uniform_hits, cem_hits = [], []
+    for seed in range(args.seeds):
+        rnd = random.Random(seed)
+        _, target, _ = batch_random_search(X, real_dist, args.guesses, rnd=rnd, verbose=False)
+        # The uniform search needs this many guesses to find its own best.
+        u = uniform_evals_to_target(X, real_dist, target, args.guesses, rnd=random.Random(seed))
+
+        _, cem_loss, cem_total, history = cem_search(
+            X, real_dist, batch_size=args.batch_size, max_evals=args.guesses,
+            rnd=random.Random(seed), verbose=False)
+        c = cem_evals_to_target(history, target)
+        uniform_hits.append(u)
+        cem_hits.append(c if c is not None else float("inf"))
+        print("{:>5d} {:>14.2f} {:>14.2f} {:>12d} {:>12s} {:>10d}".format(
+            seed, target, cem_loss, u, str(c) if c is not None else "never", cem_total))
+
+    print("median evaluations to reach the uniform search's best loss: uniform {:.0f}, cem {}".format(
+        np.median(uniform_hits), np.median(cem_hits)))
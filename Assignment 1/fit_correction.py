@@ -0,0 +1,199 @@
+"""
+Exact fit of the rangefinder correction and export of the model artifact.
+
+The correction distance = t0 + t1*theoretical + t2*angle + t3*footsteps is
+linear in theta, so instead of a random search it is solved directly with
+one QR decomposition of the measurement table (optionally ridge regularised;
+the intercept is never penalised). The same decomposition gives the hat
+matrix diagonal, so the leave-one-out cross-validated MAE comes for free:
+the LOO residual of point i is r_i / (1 - h_ii).
+
+For input-dependent error bars the fit is bootstrapped: all resamples of
+the table are solved in one batched SVD, and their coefficient vectors are
+stored together with a vector of resampled LOO residuals. The app turns
+those into a prediction interval with one matrix-vector product and a
+quantile, see rangefinder.prediction_interval.
+
+The point fit is written to rangefinder_model.json, which rangefinder.py
+loads at startup. The bootstrap arrays go to a binary sidecar next to it
+(rangefinder_model_bootstrap.npz, named in the JSON), so the JSON stays
+small and readable.
+
+Usage:
+    python fit_correction.py
+    python fit_correction.py --ridge 0.5 --resamples 4000
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from batch_search import feature_matrix
+from ml import angles, footsteps, real_dist, theoretical
+
+
+ARTIFACT_VERSION = 3   # 2: adds "bootstrap"; 3: its arrays move to the .npz sidecar
+FEATURES = ["intercept", "theoretical", "angle", "footsteps"]
+DEFAULT_ARTIFACT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rangefinder_model.json")
+
+
+def fit(X, y, ridge=0.0):
+    """
+    Least squares (ridge > 0: ridge) fit of y ~ X. Returns (theta, residuals,
+    hat_diag), all from one QR of X stacked on sqrt(ridge) * I without the
+    intercept row.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n, d = X.shape
+    if ridge > 0:
+        penalty = np.sqrt(ridge) * np.eye(d)[1:]
+        A = np.vstack([X, penalty])
+        b = np.concatenate([y, np.zeros(d - 1)])
+    else:
+        A, b = X, y
+
+    Q, R = np.linalg.qr(A)
+    theta = np.linalg.solve(R, Q.T @ b)
+    residuals = y - X @ theta
+    hat_diag = np.einsum("ij,ij->i", Q[:n], Q[:n])
+    return theta, residuals, hat_diag
+
+
+def bootstrap(X, y, n_resamples=2000, ridge=0.0, seed=0, min_distinct=None, rcond=1e-4, max_rounds=20):
+    """
+    Coefficients of `n_resamples` row resamples of (X, y), shape (n, d).
+
+    The resampled design matrices are stacked to (n_resamples, rows, d) and
+    solved with one batched SVD. With only a handful of rows many resamples
+    repeat so few distinct points that the fit is (nearly) interpolating or
+    singular, and their coefficients run off to absurd values. A resample is
+    kept only with at least `min_distinct` distinct rows (default d + 2, so
+    two residual degrees of freedom are left) and a smallest singular value
+    above `rcond` times the largest; the others are drawn again, for at most
+    `max_rounds` rounds. A table where a round keeps none, or where the
+    rounds run out (e.g. every measurement at the same angle, without
+    ridge), is degenerate and raises ValueError.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n, d = X.shape
+    if min_distinct is None:
+        min_distinct = d + 2
+    if n < min_distinct:
+        raise ValueError("bootstrap needs at least {} rows, got {}".format(min_distinct, n))
+    rng = np.random.default_rng(seed)
+    penalty = np.sqrt(ridge) * np.eye(d)[1:] if ridge > 0 else np.zeros((0, d))
+
+    coefs = np.empty((0, d))
+    for _ in range(max_rounds):
+        if len(coefs) >= n_resamples:
+            break
+        idx = rng.integers(0, n, size=(n_resamples, n))
+        A = np.concatenate([X[idx], np.broadcast_to(penalty, (n_resamples,) + penalty.shape)], axis=1)
+        b = np.concatenate([y[idx], np.zeros((n_resamples, len(penalty)))], axis=1)
+        U, s, Vt = np.linalg.svd(A, full_matrices=False)
+        distinct = 1 + np.count_nonzero(np.diff(np.sort(idx, axis=1), axis=1), axis=1)
+        ok = (distinct >= min_distinct) & (s[:, -1] > rcond * s[:, 0])
+        if not ok.any():
+            break
+        theta = np.einsum("bji,bj,bj->bi", Vt[ok], 1.0 / s[ok], np.einsum("bkj,bk->bj", U[ok], b[ok]))
+        coefs = np.concatenate([coefs, theta])
+    if len(coefs) < n_resamples:
+        raise ValueError(
+            "degenerate measurement table: only {} of {} bootstrap resamples are well conditioned "
+            "(collinear columns? try --ridge)".format(len(coefs), n_resamples))
+    return coefs[:n_resamples]
+
+
+def evaluate(residuals, hat_diag):
+    """Training MAE and leave-one-out MAE."""
+    loo = residuals / (1.0 - hat_diag)
+    return float(np.mean(np.abs(residuals))), float(np.mean(np.abs(loo)))
+
+
+def build_artifact(theta, training_mae, cv_mae, ridge, n_samples, boot_coefs=None, level=0.9, seed=0):
+    artifact = {
+        "version": ARTIFACT_VERSION,
+        "model": "linear",
+        "features": FEATURES,
+        "intercept": float(theta[0]),
+        "coefs": [float(t) for t in theta[1:]],
+        "training_mae": training_mae,
+        "cv_mae": cv_mae,
+        "ridge": ridge,
+        "n_samples": n_samples,
+        "fitted_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    if boot_coefs is not None:
+        artifact["bootstrap"] = {
+            "level": level,
+            "seed": seed,
+            "n_resamples": len(boot_coefs),
+            "file": None,   # set by write_artifact
+        }
+    return artifact
+
+
+def bootstrap_path(path):
+    """The .npz sidecar of the artifact at `path`."""
+    return os.path.splitext(path)[0] + "_bootstrap.npz"
+
+
+def write_artifact(artifact, path=DEFAULT_ARTIFACT, boot_coefs=None, noise=None):
+    """
+    Write the JSON and, for an artifact with "bootstrap", the sidecar with
+    coefs (rows [intercept, theoretical, angle, footsteps], one per resample)
+    and noise (resampled leave-one-out residuals added to the predictions).
+    The sidecar is replaced first, so the JSON never names a missing file.
+    """
+    if "bootstrap" in artifact:
+        sidecar = bootstrap_path(path)
+        tmp = sidecar + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, coefs=boot_coefs, noise=noise)
+        os.replace(tmp, sidecar)
+        artifact["bootstrap"]["file"] = os.path.basename(sidecar)
+
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(artifact, f, indent=2)
+        f.write("\n")
+    os.replace(tmp, path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit the rangefinder correction exactly")
+    parser.add_argument("--ridge", type=float, default=0.0)
+    parser.add_argument("--resamples", type=int, default=2000)
+    parser.add_argument("--level", type=float, default=0.9, help="coverage of the prediction interval")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=DEFAULT_ARTIFACT)
+    args = parser.parse_args()
+
+    X = feature_matrix(theoretical, angles, footsteps)
+    start = time.perf_counter()
+    theta, residuals, hat_diag = fit(X, real_dist, args.ridge)
+    training_mae, cv_mae = evaluate(residuals, hat_diag)
+    elapsed = time.perf_counter() - start
+
+    print("theta:", theta.tolist())
+    print("loss (SSE): {:.4f}".format(float(residuals @ residuals)))
+    print("training MAE: {:.3f}  LOO CV MAE: {:.3f}".format(training_mae, cv_mae))
+    print("fit took {:.1f} us".format(elapsed * 1e6))
+
+    start = time.perf_counter()
+    boot_coefs = bootstrap(X, real_dist, args.resamples, args.ridge, args.seed)
+    loo = residuals / (1.0 - hat_diag)
+    noise = np.random.default_rng(args.seed + 1).choice(loo, size=args.resamples)
+    elapsed = time.perf_counter() - start
+    print("{} bootstrap resamples took {:.1f} ms, coefficient std: {}".format(
+        args.resamples, elapsed * 1e3, np.round(boot_coefs.std(axis=0), 4).tolist()))
+
+    artifact = build_artifact(theta, training_mae, cv_mae, args.ridge, len(real_dist),
+                              boot_coefs, args.level, args.seed)
+    write_artifact(artifact, args.out, boot_coefs, noise)
+    print("written to", args.out)
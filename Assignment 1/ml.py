@@ -1,3 +1,4 @@
+import argparse
 import math
 import random
 
@@ -29,32 +30,86 @@ def my_model(theta, x1, x2, x3):
 def my_loss(y_hat, y):
     return (y_hat - y) ** 2
 
-best_loss = float("inf")
-best_theta = None
 
+def loop_search(n_guesses=50000):
+    # the original one-guess-at-a-time search, kept for comparison
+    best_loss = float("inf")
+    best_theta = None
 
-for guess in range(50000): 
-    theta0 = random.uniform(-50, 50)  
-    theta1 = random.uniform(-5, 5)    
-    theta2 = random.uniform(-5, 5)    
-    theta3 = random.uniform(-5, 5)    
+    for guess in range(n_guesses):
+        theta0 = random.uniform(-50, 50)
+        theta1 = random.uniform(-5, 5)
+        theta2 = random.uniform(-5, 5)
+        theta3 = random.uniform(-5, 5)
 
-    total_loss = 0.0
-    for x1, x2, x3, y in zip(theoretical, angles, footsteps, real_dist):
-        y_hat = my_model([theta0, theta1, theta2, theta3], x1, x2, x3)
-        total_loss += my_loss(y_hat, y)
+        total_loss = 0.0
+        for x1, x2, x3, y in zip(theoretical, angles, footsteps, real_dist):
+            y_hat = my_model([theta0, theta1, theta2, theta3], x1, x2, x3)
+            total_loss += my_loss(y_hat, y)
+
+        if total_loss < best_loss:
+            best_loss = total_loss
+            best_theta = [theta0, theta1, theta2, theta3]
+            print("new best loss:", best_loss, "theta:", best_theta)
+
+    return best_theta, best_loss
+
+
+def cem_search(max_evals=50000, batch_size=1000):
+    from batch_search import cem_search, feature_matrix
+
+    X = feature_matrix(theoretical, angles, footsteps)
+    best_theta, best_loss, evals, _ = cem_search(X, real_dist, batch_size=batch_size, max_evals=max_evals)
+    print("evaluations:", evals)
+    return best_theta, best_loss
+
+
+def sharded_search(n_guesses=50000, seed=0, workers=None):
+    from batch_search import feature_matrix
+    from sharded_search import sharded_search
 
-    if total_loss < best_loss:
-        best_loss = total_loss
-        best_theta = [theta0, theta1, theta2, theta3]
-        print("new best loss:", best_loss, "theta:", best_theta)
+    X = feature_matrix(theoretical, angles, footsteps)
+    best_theta, best_loss, stats = sharded_search(X, real_dist, n_guesses, seed, workers=workers)
+    print("workers: {}  blocks: {} of {}  {:.0f} guesses/s".format(
+        stats["workers"], stats["blocks"], stats["block_size"], stats["guesses_per_second"]))
+    return best_theta, best_loss
 
-print("\n final results")
-print("Best loss:", best_loss)
-print("Best theta:", best_theta)
 
-print("\npredictions vs real:")
-for x1, x2, x3, y in zip(theoretical, angles, footsteps, real_dist):
-    y_hat = my_model(best_theta, x1, x2, x3)
-    print(f"Pred: {y_hat:.1f}, Real: {y}")
+def batch_search(n_guesses=50000, chunk_size=50000):
+    from batch_search import batch_random_search, feature_matrix
 
+    X = feature_matrix(theoretical, angles, footsteps)
+    best_theta, best_loss, _ = batch_random_search(X, real_dist, n_guesses, chunk_size=chunk_size)
+    return best_theta, best_loss
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Random search for the distance correction")
+    parser.add_argument("--guesses", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--engine", choices=["batch", "loop", "cem", "sharded"], default="batch")
+    parser.add_argument("--chunk-size", type=int, default=50000)
+    parser.add_argument("--workers", type=int, default=None, help="processes for --engine sharded")
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    if args.engine == "loop":
+        best_theta, best_loss = loop_search(args.guesses)
+    elif args.engine == "cem":
+        best_theta, best_loss = cem_search(args.guesses)
+    elif args.engine == "sharded":
+        # seeded by SeedSequence, not the random module
+        best_theta, best_loss = sharded_search(args.guesses, args.seed or 0, args.workers)
+    else:
+        best_theta, best_loss = batch_search(args.guesses, args.chunk_size)
+
+    print("\n final results")
+    print("Best loss:", best_loss)
+    print("Best theta:", best_theta)
+
+    print("\npredictions vs real:")
+    for x1, x2, x3, y in zip(theoretical, angles, footsteps, real_dist):
+        y_hat = my_model(best_theta, x1, x2, x3)
+        print(f"Pred: {y_hat:.1f}, Real: {y}")
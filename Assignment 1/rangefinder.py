@@ -1,11 +1,57 @@
-from flask import Flask, render_template_string, request
+from flask import Flask, jsonify, request
+import functools
+import json
 import math
+import os
+import sys
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:
+    # Unix only; /api/stats then leaves out max_rss_kb
+    resource = None
 
 app = Flask(__name__)
 
-LEARNED_INTERCEPT = 23.787587
-LEARNED_COEFS = [2.252505, -1.944333, 3.939864]
-TRAINING_MAE = 10.01 
+# Written by fit_correction.py; refit there instead of copying numbers by hand
+MODEL_PATH = os.environ.get(
+    "RANGEFINDER_MODEL",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "rangefinder_model.json"),
+)
+SUPPORTED_MODEL_VERSIONS = {1, 2, 3}
+
+
+def load_model(path=MODEL_PATH):
+    """
+    The artifact as a dict. Its "bootstrap" entry, if any, always holds the
+    arrays "coefs" and "noise": inline in version 2, loaded from the .npz
+    sidecar named in "file" since version 3.
+    """
+    with open(path) as f:
+        model = json.load(f)
+    if model.get("version") not in SUPPORTED_MODEL_VERSIONS:
+        raise ValueError("unsupported model artifact version {!r} in {}".format(model.get("version"), path))
+    bootstrap = model.get("bootstrap")
+    if bootstrap is not None and "file" in bootstrap:
+        with np.load(os.path.join(os.path.dirname(os.path.abspath(path)), bootstrap["file"])) as arrays:
+            bootstrap["coefs"], bootstrap["noise"] = arrays["coefs"], arrays["noise"]
+    return model
+
+
+MODEL = load_model()
+LEARNED_INTERCEPT = MODEL["intercept"]
+LEARNED_COEFS = MODEL["coefs"]
+TRAINING_MAE = MODEL["training_mae"]
+
+# Version 2+ artifacts carry bootstrap coefficients for input-dependent intervals
+BOOTSTRAP = MODEL.get("bootstrap")
+if BOOTSTRAP is not None:
+    BOOT_COEFS = np.array(BOOTSTRAP["coefs"], dtype=np.float64)   # (resamples, 4)
+    BOOT_NOISE = np.array(BOOTSTRAP["noise"], dtype=np.float64)   # (resamples,)
+    INTERVAL_LEVEL = BOOTSTRAP["level"]
+    INTERVAL_QUANTILES = [(1 - INTERVAL_LEVEL) / 2, (1 + INTERVAL_LEVEL) / 2]
 
 HTML = """
 <!DOCTYPE html>
@@ -43,7 +89,11 @@ HTML = """
         <div class="result">
             <b>Theoretical distance:</b> {{ theoretical }} m <br>
             <b>Corrected model estimate :</b> {{ distance }} m <br>
+            {% if interval %}
+            <b>{{ level }}% prediction interval:</b> {{ interval[0] }} – {{ interval[1] }} m
+            {% else %}
             <b>Estimated error margin:</b> ± {{ error }} m 
+            {% endif %}
         </div>
         {% endif %}
 
@@ -52,7 +102,7 @@ HTML = """
             <ol>
                 <li>At Point A, face the target and walk perpendicular to that line counting steps to Point B.</li>
                 <li>At B, measure the angle between your baseline and the line to the target and enter it here.</li>
-                <li>Enter steps (heel-to-toe) and your EU shoe size. The app applies a learned correction and shows an error margin.</li>
+                <li>Enter steps (heel-to-toe) and your EU shoe size. The app applies a learned correction and shows how far off it may be.</li>
             </ol>
         </div>
     </div>
@@ -60,39 +110,233 @@ HTML = """
 </html>
 """
 
+# Parsed and compiled once instead of on every request
+TEMPLATE = app.jinja_env.from_string(HTML)
+
+MAX_BATCH = 10000
+
+CACHE_SIZE = int(os.environ.get("RANGEFINDER_CACHE_SIZE", "4096"))
+# RANGEFINDER_GRID=1 precomputes every distance of the common input domain below
+USE_GRID = os.environ.get("RANGEFINDER_GRID", "") not in ("", "0")
+GRID_ANGLE_FIRST, GRID_ANGLE_STEP, GRID_N_ANGLES = 1.0, 0.1, 881   # 1.0 .. 89.0 degrees
+GRID_STEPS = (1, 200)
+GRID_SIZES = (30, 50)
+
+STATS = {"form_requests": 0, "grid_hits": 0, "grid_misses": 0}
+
+
 def apply_correction(theoretical, angle, footsteps):
     return LEARNED_INTERCEPT + LEARNED_COEFS[0]*theoretical + LEARNED_COEFS[1]*angle + LEARNED_COEFS[2]*footsteps
 
+def build_grid():
+    """
+    Corrected distance for every (angle, steps, shoe size) of the grid domain
+    as float32 (about 15 MB), plus cot(angle) in float64 for the theoretical
+    distance, which is just steps * shoe length * cot(angle).
+    """
+    angles = GRID_ANGLE_FIRST + GRID_ANGLE_STEP * np.arange(GRID_N_ANGLES)
+    steps = np.arange(GRID_STEPS[0], GRID_STEPS[1] + 1, dtype=np.float64)
+    sizes = np.arange(GRID_SIZES[0], GRID_SIZES[1] + 1, dtype=np.float64)
+    _, distance, _ = estimate_batch(angles[:, None, None], steps[None, :, None], sizes[None, None, :])
+    return distance.astype(np.float32), 1.0 / np.tan(np.radians(angles))
+
+
+def _grid_lookup(angle_b_deg, steps, shoe_size_eu):
+    a = int(round((angle_b_deg - GRID_ANGLE_FIRST) / GRID_ANGLE_STEP))
+    if (0 <= a < GRID_N_ANGLES and GRID_STEPS[0] <= steps <= GRID_STEPS[1]
+            and shoe_size_eu == int(shoe_size_eu) and GRID_SIZES[0] <= shoe_size_eu <= GRID_SIZES[1]):
+        theoretical = steps * (shoe_size_eu * (2.0/3.0) / 100.0) * GRID_COT[a]
+        return theoretical, float(GRID[a, steps - GRID_STEPS[0], int(shoe_size_eu) - GRID_SIZES[0]])
+    return None
+
+
+def prediction_interval(theoretical, angle, footsteps):
+    """
+    (low, high) of the bootstrap predictions plus noise, clipped at 0 m since
+    a distance cannot be negative; None for an artifact without bootstrap.
+    """
+    if BOOTSTRAP is None:
+        return None
+    samples = BOOT_COEFS @ np.array([1.0, theoretical, angle, footsteps]) + BOOT_NOISE
+    low, high = np.maximum(np.quantile(samples, INTERVAL_QUANTILES), 0.0)
+    return float(low), float(high)
+
+
+def prediction_intervals(theoretical, angle, footsteps, chunk_size=500):
+    """Vectorized prediction_interval for arrays; two arrays (low, high)."""
+    features = np.column_stack([np.ones(len(theoretical)), theoretical, angle, footsteps])
+    bounds = np.empty((2, len(features)))
+    for start in range(0, len(features), chunk_size):
+        samples = features[start:start + chunk_size] @ BOOT_COEFS.T + BOOT_NOISE
+        bounds[:, start:start + chunk_size] = np.quantile(samples, INTERVAL_QUANTILES, axis=1)
+    np.maximum(bounds, 0.0, out=bounds)
+    return bounds[0], bounds[1]
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _estimate(angle_b_deg, steps, shoe_size_eu):
+    hit = None
+    if GRID is not None:
+        hit = _grid_lookup(angle_b_deg, steps, shoe_size_eu)
+        STATS["grid_hits" if hit is not None else "grid_misses"] += 1
+
+    if hit is None:
+        baseline = steps * (shoe_size_eu * (2.0/3.0) / 100.0)
+        tan = math.tan(math.radians(angle_b_deg))
+        if abs(tan) < 1e-9:
+            return None
+        theoretical = baseline / tan
+        hit = theoretical, apply_correction(theoretical, angle_b_deg, steps)
+    return hit + (prediction_interval(hit[0], angle_b_deg, steps),)
+
+
+def estimate(angle_b_deg, steps, shoe_size_eu):
+    """
+    (theoretical, corrected distance, interval or None), or None for an
+    angle with tan ~ 0.
+    Inputs are normalized to the form's resolution (0.1 degree, whole steps,
+    0.1 shoe size) so repeated measurements share a cache entry.
+    """
+    return _estimate(round(angle_b_deg, 1), int(steps), round(shoe_size_eu, 1))
+
+
 @app.route("/", methods=["GET", "POST"])
 def index():
     distance = None
     error = None
     theoretical = None
+    interval = None
 
     if request.method == "POST":
+        STATS["form_requests"] += 1
         try:
             angle_b_deg = float(request.form["angle_b"])
             steps = int(request.form["steps"])
             shoe_size_eu = float(request.form["shoe_size_eu"])
-            shoe_size_cm = shoe_size_eu * (2.0/3.0)
-            shoe_size_m = shoe_size_cm / 100.0
-            baseline = steps * shoe_size_m
-            angle_b_rad = math.radians(angle_b_deg)
-            if abs(math.tan(angle_b_rad)) < 1e-9:
+            result = estimate(angle_b_deg, steps, shoe_size_eu)
+            if result is None:
                 distance = None
                 error = "Angle too small or zero; measurement invalid."
             else:
-                theoretical_val = baseline / math.tan(angle_b_rad)
-                predicted = apply_correction(theoretical_val, angle_b_deg, steps)
-                theoretical = round(theoretical_val, 2)
-                distance = round(predicted, 2)
+                theoretical = round(result[0], 2)
+                distance = round(result[1], 2)
                 error = round(TRAINING_MAE, 2)
+                if result[2] is not None:
+                    interval = (round(result[2][0], 2), round(result[2][1], 2))
 
         except (ValueError, ZeroDivisionError):
             distance = None
             error = "Error in input. Please check your numbers."
 
-    return render_template_string(HTML, distance=distance, theoretical=theoretical, error=error)
+    level = round(100 * INTERVAL_LEVEL) if BOOTSTRAP is not None else None
+    return TEMPLATE.render(distance=distance, theoretical=theoretical, error=error, interval=interval, level=level)
+
+
+def _column(values, name, n, integer=False):
+    """Floats of a JSON array, NaN plus a per-row message where an entry is not a usable number."""
+    if not isinstance(values, list) or len(values) != n:
+        raise ValueError("'{}' must be a list of {} numbers".format(name, n))
+    out = np.full(n, np.nan)
+    errors = {}
+    for i, v in enumerate(values):
+        if isinstance(v, bool) or not isinstance(v, (int, float)) or not math.isfinite(v):
+            errors[i] = "{} is not a number".format(name)
+        elif integer and v != int(v):
+            errors[i] = "{} must be a whole number".format(name)
+        else:
+            out[i] = v
+    return out, errors
+
+
+def estimate_batch(angle_b_deg, steps, shoe_size_eu):
+    """
+    Theoretical and corrected distance for whole arrays of measurements.
+    Rows whose angle gives tan ~ 0 come back as NaN with `invalid` set.
+    """
+    baseline = steps * (shoe_size_eu * (2.0/3.0) / 100.0)
+    tan = np.tan(np.radians(angle_b_deg))
+    invalid = ~(np.abs(tan) >= 1e-9)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        theoretical = np.where(invalid, np.nan, baseline / tan)
+    distance = (LEARNED_INTERCEPT + LEARNED_COEFS[0]*theoretical
+                + LEARNED_COEFS[1]*angle_b_deg + LEARNED_COEFS[2]*steps)
+    return theoretical, distance, invalid
+
+
+GRID, GRID_COT = build_grid() if USE_GRID else (None, None)
+
+
+@app.route("/api/estimate", methods=["POST"])
+def api_estimate():
+    """
+    Body: {"angle_b": [...], "steps": [...], "shoe_size_eu": [...]} (equal lengths).
+    Returns the same columns back, with null and a message in "errors" for bad rows.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get("angle_b"), list):
+        return jsonify(error="expected a JSON object with lists angle_b, steps and shoe_size_eu"), 400
+    n = len(data["angle_b"])
+    if n > MAX_BATCH:
+        return jsonify(error="at most {} measurements per request".format(MAX_BATCH)), 413
+    try:
+        angle_b, angle_errors = _column(data["angle_b"], "angle_b", n)
+        steps, steps_errors = _column(data.get("steps"), "steps", n, integer=True)
+        shoe, shoe_errors = _column(data.get("shoe_size_eu"), "shoe_size_eu", n)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    theoretical, distance, invalid = estimate_batch(angle_b, steps, shoe)
+
+    errors = [None] * n
+    for i in np.flatnonzero(invalid).tolist():
+        errors[i] = "Angle too small or zero; measurement invalid."
+    for row_errors in (shoe_errors, steps_errors, angle_errors):
+        for i, message in row_errors.items():
+            errors[i] = message
+
+    bad = np.array([e is not None for e in errors], dtype=bool)
+    columns = {"theoretical": theoretical, "distance": distance}
+    if BOOTSTRAP is not None:
+        columns["interval_low"], columns["interval_high"] = prediction_intervals(theoretical, angle_b, steps)
+    out = {name: np.where(bad, None, values.astype(object)).tolist() for name, values in columns.items()}
+    if BOOTSTRAP is not None:
+        out["interval_level"] = INTERVAL_LEVEL
+    return jsonify(
+        errors=errors,
+        error_margin=TRAINING_MAE,
+        n_invalid=int(bad.sum()),
+        **out,
+    )
+
+
+@app.route("/api/stats")
+def api_stats():
+    info = _estimate.cache_info()
+    lookups = info.hits + info.misses
+    # key tuple + value tuple + their floats + the cache's link list, per entry
+    entry_bytes = sys.getsizeof((0.0, 0, 0.0)) + sys.getsizeof((0.0, 0.0)) + 5 * sys.getsizeof(0.0) + sys.getsizeof([0] * 4)
+    stats = dict(
+        form_requests=STATS["form_requests"],
+        cache={
+            "hits": info.hits,
+            "misses": info.misses,
+            "hit_rate": info.hits / lookups if lookups else None,
+            "entries": info.currsize,
+            "max_entries": info.maxsize,
+            "approx_bytes": info.currsize * entry_bytes,
+        },
+        grid={
+            "enabled": GRID is not None,
+            "shape": list(GRID.shape) if GRID is not None else None,
+            "dtype": str(GRID.dtype) if GRID is not None else None,
+            "bytes": int(GRID.nbytes + GRID_COT.nbytes) if GRID is not None else 0,
+            "hits": STATS["grid_hits"],
+            "misses": STATS["grid_misses"],
+        },
+    )
+    if resource is not None:
+        stats["max_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return jsonify(stats)
 
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,134 @@
+"""
+Random search sharded over a process pool with reproducible seeds.
+
+The guess budget is cut into blocks. Block k draws its thetas from its own
+generator, seeded by child k of SeedSequence(master_seed), so which thetas
+get evaluated depends only on the master seed, the budget and the block
+size, never on how many workers there are or which worker picks up which
+block. The default block size follows from the budget alone: as many
+blocks of MIN_BLOCK_SIZE guesses as fit, but no more than MAX_BLOCKS, so a
+small budget still spreads over several workers and a given budget and
+seed give the same theta on any machine. Every block returns only its
+local best; the runner keeps the lowest loss, breaking ties by block and
+position, which again does not depend on scheduling. Workers get the feature matrix once through the pool
+initializer, so a task is just a block index.
+
+The search works on any model that is linear in theta given a feature
+matrix X (ml.py's correction, or a feature map of another model).
+
+Usage:
+    python sharded_search.py --guesses 20000000 --workers 8 --seed 1
+"""
+
+import argparse
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from batch_search import DEFAULT_BOUNDS, batch_losses, feature_matrix, scalar_loss
+
+
+MIN_BLOCK_SIZE = 5000
+MAX_BLOCKS = 64
+
+_X = None
+_y = None
+_lo = None
+_width = None
+
+
+def _init_worker(X, y, bounds):
+    global _X, _y, _lo, _width
+    _X = np.asarray(X, dtype=np.float64)
+    _y = np.asarray(y, dtype=np.float64)
+    _lo = np.array([b[0] for b in bounds], dtype=np.float64)
+    _width = np.array([b[1] - b[0] for b in bounds], dtype=np.float64)
+
+
+def block_seed(master_seed, block):
+    """SeedSequence of block `block`; the same as SeedSequence(master).spawn(block + 1)[block]."""
+    return np.random.SeedSequence(master_seed, spawn_key=(block,))
+
+
+def search_block(task):
+    """Evaluate one block; returns (loss, block, index in block, theta)."""
+    master_seed, block, size, chunk_size = task
+    rng = np.random.default_rng(block_seed(master_seed, block))
+    best = (float("inf"), block, -1, None)
+    for start in range(0, size, chunk_size):
+        n = min(chunk_size, size - start)
+        thetas = _lo + _width * rng.random((n, len(_lo)))
+        losses = batch_losses(thetas, _X, _y)
+        i = int(np.argmin(losses))
+        if losses[i] < best[0]:
+            best = (float(losses[i]), block, start + i, thetas[i].tolist())
+    if best[3] is not None:
+        best = (scalar_loss(best[3], _X, _y),) + best[1:]
+    return best
+
+
+def default_block_size(n_guesses):
+    """Blocks of MIN_BLOCK_SIZE guesses, grown so there are at most MAX_BLOCKS of them."""
+    n_blocks = min(MAX_BLOCKS, max(1, math.ceil(n_guesses / MIN_BLOCK_SIZE)))
+    return max(1, math.ceil(n_guesses / n_blocks))
+
+
+def sharded_search(X, y, n_guesses, master_seed=0, bounds=DEFAULT_BOUNDS, workers=None,
+                   block_size=None, chunk_size=50000):
+    """
+    Returns (best_theta, best_loss, stats). Identical for any `workers` as long
+    as `n_guesses`, `master_seed`, `bounds` and `block_size` stay the same;
+    with block_size=None it is default_block_size(n_guesses).
+    """
+    workers = workers or os.cpu_count() or 1
+    if block_size is None:
+        block_size = default_block_size(n_guesses)
+    n_blocks = math.ceil(n_guesses / block_size)
+    tasks = [
+        (master_seed, k, min(block_size, n_guesses - k * block_size), chunk_size)
+        for k in range(n_blocks)
+    ]
+
+    start = time.perf_counter()
+    if workers == 1:
+        _init_worker(X, y, bounds)
+        results = list(map(search_block, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(X, y, bounds)) as pool:
+            results = list(pool.map(search_block, tasks))
+    elapsed = time.perf_counter() - start
+
+    loss, block, index, theta = min(results, key=lambda r: (r[0], r[1], r[2]))
+    stats = {
+        "blocks": n_blocks,
+        "block_size": block_size,
+        "workers": workers,
+        "seconds": elapsed,
+        "guesses_per_second": n_guesses / elapsed if elapsed > 0 else float("inf"),
+        "winner": (block, index),
+    }
+    return theta, loss, stats
+
+
+if __name__ == "__main__":
+    from ml import angles, footsteps, real_dist, theoretical
+
+    parser = argparse.ArgumentParser(description="Sharded random search for the distance correction")
+    parser.add_argument("--guesses", type=int, default=10000000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, nargs="+", default=[os.cpu_count() or 1],
+                        help="one or more pool sizes; several sizes show the scaling")
+    parser.add_argument("--block-size", type=int, default=None,
+                        help="block size; by default it follows from the budget")
+    args = parser.parse_args()
+
+    X = feature_matrix(theoretical, angles, footsteps)
+    for w in args.workers:
+        theta, loss, stats = sharded_search(X, real_dist, args.guesses, args.seed, workers=w,
+                                            block_size=args.block_size)
+        print("workers {:>3d}: {:>4d} blocks of {:>8d}  loss {:.6f}  {:>12.0f} guesses/s  {:6.2f}s  theta {}".format(
+            w, stats["blocks"], stats["block_size"], loss, stats["guesses_per_second"], stats["seconds"], theta))
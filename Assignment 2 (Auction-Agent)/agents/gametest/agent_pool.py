@@ -0,0 +1,184 @@
+"""
+Factories for every agent policy in the repo.
+
+Each factory builds a fresh agent and returns its bid callback with the
+client signature ``(agent_id, current_round, states, auctions, prev_auctions,
+bank_state)``. Agents that keep module level state (lebron, raphael) get a
+private copy of their module per seat, so two seats in one game never share
+it; dict based agents (victor, victor2) are adapted, and side effects that
+only make sense in a live game (corni's live plot, Fortuna's model log) are
+switched off. Printing is left alone; wrap calls in
+``local_game.suppress_output()`` to silence it.
+
+Imports are done lazily so a missing optional dependency (e.g. matplotlib
+for corni) only affects that agent.
+"""
+
+import importlib.util
+import os
+import sys
+from typing import Callable, Dict
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+for path in (CURRENT_DIR, PROJECT_ROOT):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+def _fresh_module(name: str):
+    """A new, unregistered instance of module ``name`` with its own globals."""
+    spec = importlib.util.find_spec(name)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_tiny_bid(**params) -> Callable:
+    from agent_tiny_bid import tiny_bid
+
+    return tiny_bid
+
+
+def make_rand_single(**params) -> Callable:
+    from rand_single import random_single_bid
+
+    return random_single_bid
+
+
+def make_rand_walk(**params) -> Callable:
+    from rand_walk import RandomWalkAgent
+
+    return RandomWalkAgent(**params).random_walk
+
+
+def make_mhmdmain(**params) -> Callable:
+    from mhmdmain import MyAgent
+
+    return MyAgent(**params).make_bid
+
+
+def make_mfgrim(**params) -> Callable:
+    from mfgrim import MyAgent
+
+    return MyAgent(**params).make_bid
+
+
+def make_test2(**params) -> Callable:
+    from test2 import MyAgent
+
+    return MyAgent().make_bid
+
+
+def make_ignacio(**params) -> Callable:
+    from ignacio import FirstAgent
+
+    return FirstAgent(**params).bid
+
+
+def make_fortuna(**params) -> Callable:
+    from fortuna_agent import FortunaAgent
+
+    kwargs = dict(
+        theta=[-50, 500],
+        loadModel=False,
+        min_bid=300,
+        bid_step=10,
+        lambda_base=0.025,
+        lambda_ramp=0.01,
+    )
+    kwargs.update(params)
+    agent = FortunaAgent(**kwargs)
+    # Simulated games must not end up in the shared model store.
+    agent.save_model_to_file = lambda record: None
+    return agent.bid
+
+
+def make_raphael(**params) -> Callable:
+    raphael = _fresh_module("raphael")
+    raphael.predictor = raphael.BidPredictor(**params)
+    return raphael.smart_bid
+
+
+def make_victor(**params) -> Callable:
+    from victor import FortunaHybridAgent
+
+    agent = FortunaHybridAgent(**params)
+
+    def bid(agent_id, current_round, states, auctions, prev_auctions, bank_state):
+        return agent.bid(
+            {
+                "agent_id": agent_id,
+                "states": states,
+                "auctions": auctions,
+                "prev_auctions": prev_auctions,
+                "bank_state": bank_state,
+            }
+        )
+
+    return bid
+
+
+def make_victor2(**params) -> Callable:
+    from victor2 import StrategicAgent, StrategicLive
+
+    adapter = StrategicLive()
+    adapter.agent = StrategicAgent(**params)
+    return adapter.bid_callback
+
+
+def make_magnus(**params) -> Callable:
+    from magnus import jamie_dimon
+
+    return jamie_dimon
+
+
+def make_lebron(**params) -> Callable:
+    return _fresh_module("lebron").smart_bidder
+
+
+def make_corni(**params) -> Callable:
+    import matplotlib
+
+    matplotlib.use("Agg")
+    from corni import FirstAgent
+
+    agent = FirstAgent()
+    agent.live_plot_rounds = lambda *args, **kwargs: None
+    return agent.bid
+
+
+def make_maxi(**params) -> Callable:
+    from maxi import MarketAgent
+
+    return MarketAgent(**params).decide
+
+
+AGENT_FACTORIES: Dict[str, Callable[..., Callable]] = {
+    "tiny_bid": make_tiny_bid,
+    "rand_single": make_rand_single,
+    "rand_walk": make_rand_walk,
+    "mhmdmain": make_mhmdmain,
+    "mfgrim": make_mfgrim,
+    "test2": make_test2,
+    "ignacio": make_ignacio,
+    "fortuna": make_fortuna,
+    "raphael": make_raphael,
+    "victor": make_victor,
+    "victor2": make_victor2,
+    "magnus": make_magnus,
+    "lebron": make_lebron,
+    "corni": make_corni,
+    "maxi": make_maxi,
+}
+
+
+def make_agent(name: str, **params) -> Callable:
+    """Build a fresh bid callback for the agent registered as ``name``."""
+    try:
+        factory = AGENT_FACTORIES[name]
+    except KeyError:
+        raise ValueError(
+            "unknown agent '{}', expected one of {}".format(name, sorted(AGENT_FACTORIES))
+        )
+    return factory(**params)
@@ -3,6 +3,8 @@ import random
 import os
 from dnd_auction_game import AuctionGameClient
 import matplotlib.pyplot as plt
+from history import RingBuffer
+from profiling import maybe_profile
 
 ############################################################################################
 #
@@ -12,11 +14,12 @@ import matplotlib.pyplot as plt
 
 
 class FirstAgent:
-    def __init__(self):
+    def __init__(self, plot_window: int = 2000):
         self.lines = None
-        self.rounds = []
-        self.money = []
-        self.points = []
+        # Only the last plot_window rounds are kept for the live plot
+        self.rounds = RingBuffer(plot_window, dtype=np.int64)
+        self.money = RingBuffer(plot_window)
+        self.points = RingBuffer(plot_window)
 
     def expected_value(self, auction: dict) -> float:
         """
@@ -199,7 +202,9 @@ class FirstAgent:
         self.rounds.append(current_round)
         self.money.append(current_gold)
         self.points.append(points)
-        self.live_plot_rounds(self.rounds, self.money, self.points, lines=self.lines)
+        self.live_plot_rounds(
+            self.rounds.view(), self.money.view(), self.points.view(), lines=self.lines
+        )
 
         return bids
 
@@ -217,7 +222,7 @@ if __name__ == "__main__":
     )
     agent = FirstAgent()
     try:
-        game.run(agent.bid)
+        game.run(maybe_profile(agent.bid, "corni"))
     except KeyboardInterrupt:
         print("<interrupt - shutting down>")
 
@@ -0,0 +1,307 @@
+"""
+Compact delta encoding of round payloads.
+
+The normal protocol sends every agent the full ``states`` of all agents, the
+whole remaining bank schedule (three lists that shrink by one each round)
+and every bid of the previous round as ``{"a_id": ..., "gold": ...}`` dicts.
+In delta mode a round frame instead carries:
+
+- ``states``: only ``[index, gold, points]`` of agents whose state changed,
+  with agent ids sent once and referred to by index afterwards,
+- ``bank``: the full schedule once, then only ``bank_offset`` into it,
+- ``prev``: ``[die, num, bonus, reward, n_bids]`` per previous auction plus
+  two binary-packed arrays (agent index, gold) holding all bids in order.
+
+``DeltaDecoder`` rebuilds the exact ``round_data`` a full frame would have
+contained, so ``DeltaAuctionGameClient`` can call unchanged agents with the
+usual callback arguments. A client asks for delta mode by adding
+``"encoding": "delta"`` to its agent info; servers that do not know the
+option keep sending full frames, which the client handles as well.
+
+Usage:
+    python delta_protocol.py --agents 50 --rounds 200
+"""
+
+import argparse
+import array
+import base64
+import json
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    from dnd_auction_game import AuctionGameClient
+    import websockets
+except ImportError:
+    AuctionGameClient = object
+    websockets = None
+
+
+def _pack(typecode: str, values) -> str:
+    arr = array.array(typecode, values)
+    if sys.byteorder == "big":
+        arr.byteswap()
+    return base64.b64encode(arr.tobytes()).decode("ascii")
+
+
+def _unpack(typecode: str, text: str) -> array.array:
+    arr = array.array(typecode)
+    arr.frombytes(base64.b64decode(text))
+    if sys.byteorder == "big":
+        arr.byteswap()
+    return arr
+
+
+class AgentTable:
+    """Shared, append-only mapping between agent ids and small integer indices."""
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.index: Dict[str, int] = {}
+
+    def get(self, a_id: str) -> int:
+        idx = self.index.get(a_id)
+        if idx is None:
+            idx = len(self.ids)
+            self.index[a_id] = idx
+            self.ids.append(a_id)
+        return idx
+
+
+def pack_prev_auctions(prev_auctions: Dict, table: AgentTable) -> Dict:
+    """Encode ``prev_auctions`` once per round; the result is shared by all delta clients."""
+    meta, bid_agents, bid_gold = {}, [], []
+    for auction_id, a in prev_auctions.items():
+        bids = a["bids"]
+        meta[auction_id] = [a["die"], a["num"], a["bonus"], a["reward"], len(bids)]
+        for b in bids:
+            bid_agents.append(table.get(b["a_id"]))
+            bid_gold.append(int(b["gold"]))
+    return {"prev": meta, "bid_agents": _pack("I", bid_agents), "bid_gold": _pack("q", bid_gold)}
+
+
+class DeltaEncoder:
+    """Per-connection encoder; remembers what this client has already been sent."""
+
+    def __init__(self, table: AgentTable):
+        self.table = table
+        self.sent_agents = 0
+        self.last_states: Dict[str, Tuple[int, int]] = {}
+        self.bank_sent = False
+
+    def encode(self, round_data: Dict, bank_schedule: Dict, packed_prev: Dict) -> str:
+        for a_id in round_data["states"]:
+            self.table.get(a_id)
+
+        changed = []
+        for a_id, s in round_data["states"].items():
+            current = (s["gold"], s["points"])
+            if self.last_states.get(a_id) != current:
+                changed.append([self.table.index[a_id], current[0], current[1]])
+                self.last_states[a_id] = current
+
+        frame = {
+            "enc": "delta",
+            "round": round_data["round"],
+            "agents": self.table.ids[self.sent_agents :],
+            "states": changed,
+            "auctions": round_data["auctions"],
+            "bank_offset": round_data["round"] + 1,
+        }
+        frame.update(packed_prev)
+        self.sent_agents = len(self.table.ids)
+        if not self.bank_sent:
+            frame["bank"] = bank_schedule
+            self.bank_sent = True
+        return json.dumps(frame)
+
+
+class DeltaDecoder:
+    """Rebuilds full ``round_data`` dicts from a stream of delta frames."""
+
+    def __init__(self):
+        self.agent_ids: List[str] = []
+        self.states: Dict[str, Tuple[int, int]] = {}
+        self.bank: Optional[Dict] = None
+
+    def decode(self, frame: Dict) -> Dict:
+        if frame.get("enc") != "delta":
+            return frame
+
+        self.agent_ids.extend(frame["agents"])
+        for idx, gold, points in frame["states"]:
+            self.states[self.agent_ids[idx]] = (gold, points)
+        if "bank" in frame:
+            self.bank = frame["bank"]
+
+        ids = self.agent_ids
+        bid_agents = _unpack("I", frame["bid_agents"])
+        bid_gold = _unpack("q", frame["bid_gold"])
+        prev_auctions, pos = {}, 0
+        for auction_id, (die, num, bonus, reward, n_bids) in frame["prev"].items():
+            prev_auctions[auction_id] = {
+                "die": die,
+                "num": num,
+                "bonus": bonus,
+                "reward": reward,
+                "bids": [
+                    {"a_id": ids[bid_agents[i]], "gold": bid_gold[i]}
+                    for i in range(pos, pos + n_bids)
+                ],
+            }
+            pos += n_bids
+
+        k = frame["bank_offset"]
+        return {
+            "round": frame["round"],
+            # Fresh dicts every round: agents are free to mutate their arguments.
+            "states": {a_id: {"gold": g, "points": p} for a_id, (g, p) in self.states.items()},
+            "auctions": frame["auctions"],
+            "prev_auctions": prev_auctions,
+            "remainder_gold_income": self.bank["gold_income"][k:],
+            "remainder_bank_limit": self.bank["bank_limit"][k:],
+            "remainder_bank_interest": self.bank["bank_interest"][k:],
+        }
+
+
+def read_round_log(path: str) -> Iterator[Dict]:
+    """Yield full round payloads from a client log written in either encoding."""
+    decoder = DeltaDecoder()
+    with open(path, "r") as f:
+        for line in f:
+            if line.strip():
+                yield decoder.decode(json.loads(line))
+
+
+class DeltaAuctionGameClient(AuctionGameClient):
+    """
+    ``AuctionGameClient`` that negotiates delta frames and rebuilds the usual
+    callback arguments, so existing agents run unchanged. Once the server has
+    sent a delta frame, replies carry the round they answer
+    (``{"round": r, "bids": {...}}``); a server that keeps sending full
+    frames gets the bare bids dict, as from ``AuctionGameClient``. The log
+    file keeps the frames as received; read it back with ``read_round_log``.
+    """
+
+    def run(self, bid_callback):
+        import asyncio
+
+        asyncio.run(self._delta_run(bid_callback))
+        print("<run done>")
+
+    async def _delta_run(self, bid_callback):
+        agent_info = {
+            "name": self.agent_name,
+            "a_id": self.agent_id,
+            "player_id": self.player_id[0:128],
+            "encoding": "delta",
+        }
+        connection_str = "ws://{}:{}/ws/{}".format(self.host, self.port, self.token)
+        print("connecting to: {}".format(connection_str))
+
+        decoder = DeltaDecoder()
+        delta = False   # set by the first delta frame; full-frame servers expect bare bids
+        try:
+            async with websockets.connect(connection_str, max_size=None) as sock:
+                print("<connected to game server>")
+                await sock.send(json.dumps(agent_info))
+                with open(self.log_file, "a") as log:
+                    while True:
+                        raw = await sock.recv()
+                        log.write(raw if raw.endswith("\n") else raw + "\n")
+                        frame = json.loads(raw)
+                        delta = delta or frame.get("enc") == "delta"
+                        round_data = decoder.decode(frame)
+
+                        bank_state = {
+                            "gold_income_per_round": round_data["remainder_gold_income"],
+                            "bank_interest_per_round": round_data["remainder_bank_interest"],
+                            "bank_limit_per_round": round_data["remainder_bank_limit"],
+                        }
+                        new_bids = bid_callback(
+                            self.agent_id,
+                            round_data["round"],
+                            round_data["states"],
+                            round_data["auctions"],
+                            round_data["prev_auctions"],
+                            bank_state,
+                        )
+                        if delta:
+                            # tagged, so the server can drop it if it arrives after the round closed
+                            new_bids = {"round": round_data["round"], "bids": new_bids}
+                        await sock.send(json.dumps(new_bids))
+
+        except websockets.exceptions.ConnectionClosedError:
+            print("<ERROR: Connection to server closed>")
+        except websockets.exceptions.ConnectionClosedOK:
+            pass
+
+
+def compare_encodings(history: List[Dict]) -> Dict[str, float]:
+    """
+    Encode a recorded game both ways (as seen by one client) and time decoding.
+    Returns total bytes and decode seconds for each mode.
+    """
+    if not history:
+        return {}
+    bank_schedule = {
+        "gold_income": history[0]["remainder_gold_income"],
+        "bank_limit": history[0]["remainder_bank_limit"],
+        "bank_interest": history[0]["remainder_bank_interest"],
+    }
+    # The recorded remainders start one round after round 0.
+    for key in bank_schedule:
+        bank_schedule[key] = [None] + bank_schedule[key]
+
+    table = AgentTable()
+    encoder = DeltaEncoder(table)
+    full_frames = [json.dumps(r) for r in history]
+    delta_frames = [
+        encoder.encode(r, bank_schedule, pack_prev_auctions(r["prev_auctions"], table))
+        for r in history
+    ]
+
+    start = time.perf_counter()
+    for f in full_frames:
+        json.loads(f)
+    full_decode = time.perf_counter() - start
+
+    decoder = DeltaDecoder()
+    start = time.perf_counter()
+    for f in delta_frames:
+        decoder.decode(json.loads(f))
+    delta_decode = time.perf_counter() - start
+
+    return {
+        "full_bytes": sum(len(f) for f in full_frames),
+        "delta_bytes": sum(len(f) for f in delta_frames),
+        "full_decode_s": full_decode,
+        "delta_decode_s": delta_decode,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare full and delta round payloads")
+    parser.add_argument("--agents", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from agent_pool import AGENT_FACTORIES, make_agent
+    from local_game import LocalAuctionGame
+
+    names = sorted(AGENT_FACTORIES)
+    agents = {
+        "{}_{}".format(names[i % len(names)], i): make_agent(names[i % len(names)])
+        for i in range(args.agents)
+    }
+    game = LocalAuctionGame(agents, num_rounds=args.rounds, seed=args.seed, record=True)
+    game.run()
+
+    r = compare_encodings(game.history)
+    print("per client, {} agents x {} rounds".format(args.agents, args.rounds))
+    print("  full : {:10d} bytes  decode {:7.1f} ms".format(r["full_bytes"], 1000 * r["full_decode_s"]))
+    print("  delta: {:10d} bytes  decode {:7.1f} ms".format(r["delta_bytes"], 1000 * r["delta_decode_s"]))
+    print("  ratio: {:.2f}x bytes, {:.2f}x decode time".format(
+        r["full_bytes"] / max(1, r["delta_bytes"]), r["full_decode_s"] / max(1e-9, r["delta_decode_s"])))
@@ -0,0 +1,120 @@
+"""
+Vectorized Monte Carlo for the points of a portfolio of NdM+bonus auctions.
+
+``DiceMonteCarlo`` draws every die of every candidate auction for many
+samples at once from one preallocated uniform buffer, turns them into rolls
+in place, sums the dice of each auction with ``np.add.reduceat`` and returns
+the distribution of the portfolio total: mean, std, quantiles and the
+probability of overtaking the current leader in ``states``. A typical round
+(a handful of auctions, 2048 samples) takes well under a millisecond, so an
+agent can call it every round.
+
+Usage:
+    mc = DiceMonteCarlo(seed=0)
+    stats = mc.portfolio_vs_leader(chosen_auctions, states, agent_id)
+    python dice_mc.py   # timing on synthetic rounds
+"""
+
+from typing import Dict, Iterable, Optional, Sequence
+
+import numpy as np
+
+
+class DiceMonteCarlo:
+    def __init__(self, n_samples: int = 2048, max_dice: int = 64, seed: Optional[int] = None):
+        self.n_samples = n_samples
+        self.rng = np.random.default_rng(seed)
+        self._buffer = np.empty(n_samples * max_dice, dtype=np.float64)
+
+    def _uniforms(self, n_dice: int) -> np.ndarray:
+        size = self.n_samples * n_dice
+        if size > self._buffer.size:
+            self._buffer = np.empty(size, dtype=np.float64)
+        # One row per die: reduceat then adds whole contiguous rows.
+        u = self._buffer[:size].reshape(n_dice, self.n_samples)
+        self.rng.random(out=u)
+        return u
+
+    def simulate(self, auctions: Sequence[Dict]) -> np.ndarray:
+        """
+        Sampled outcomes, shape ``(len(auctions), n_samples)``.
+        """
+        if not auctions:
+            return np.zeros((0, self.n_samples))
+        nums = np.array([a["num"] for a in auctions], dtype=np.int64)
+        dies = np.array([a["die"] for a in auctions], dtype=np.float64)
+        bonus = np.array([a["bonus"] for a in auctions], dtype=np.float64)
+
+        starts = np.zeros(len(auctions), dtype=np.int64)
+        np.cumsum(nums[:-1], out=starts[1:])
+        rolls = self._uniforms(int(nums.sum()))
+        # u in [0, 1) -> floor(u * die) + 1 in 1..die, in place.
+        np.multiply(rolls, np.repeat(dies, nums)[:, None], out=rolls)
+        np.floor(rolls, out=rolls)
+
+        totals = np.add.reduceat(rolls, starts, axis=0)
+        totals += (nums + bonus)[:, None]
+        return totals
+
+    def portfolio(
+        self,
+        auctions: Sequence[Dict],
+        my_points: float = 0.0,
+        leader_points: Optional[float] = None,
+        quantiles: Iterable[float] = (0.05, 0.25, 0.5, 0.75, 0.95),
+    ) -> Dict:
+        """
+        Statistics of the total points of winning all ``auctions``. With
+        ``leader_points`` also ``p_overtake``, the probability that
+        ``my_points + total`` ends strictly above the leader.
+
+        Totals are integers, so everything is read off one histogram instead
+        of sorting the samples; quantiles are actual totals (inverted CDF).
+        """
+        quantiles = tuple(quantiles)
+        total = self.simulate(auctions).sum(axis=0).astype(np.int64)
+        lo = int(total.min()) if total.size else 0
+        counts = np.bincount(total - lo)
+        cdf = np.cumsum(counts)
+        values = np.arange(lo, lo + len(counts), dtype=np.float64)
+        n = float(self.n_samples)
+
+        mean = float(counts @ values) / n
+        var = float(counts @ (values - mean) ** 2) / n
+        idx = np.searchsorted(cdf, np.asarray(quantiles) * n)
+        out = {
+            "mean": mean,
+            "std": var ** 0.5,
+            "quantiles": dict(zip(quantiles, (lo + np.minimum(idx, len(counts) - 1)).tolist())),
+        }
+        if leader_points is not None:
+            # P(total > leader - mine); totals at or below k never overtake.
+            k = int(np.floor(leader_points - my_points)) - lo
+            at_or_below = 0 if k < 0 else int(cdf[min(k, len(cdf) - 1)])
+            out["p_overtake"] = 1.0 - at_or_below / n
+        return out
+
+    def portfolio_vs_leader(self, auctions: Sequence[Dict], states: Dict, agent_id: str, **kwargs) -> Dict:
+        """``portfolio`` against the best other agent in ``states``."""
+        leader = max((s["points"] for a_id, s in states.items() if a_id != agent_id), default=0)
+        return self.portfolio(auctions, states[agent_id]["points"], leader, **kwargs)
+
+
+if __name__ == "__main__":
+    import time
+
+    from stress_bench import make_payload
+
+    mc = DiceMonteCarlo(seed=0)
+    for k in (1, 3, 8, 20):
+        payload = make_payload(auctions=k, seed=k)
+        chosen = list(payload["auctions"].values())
+        mc.portfolio_vs_leader(chosen, payload["states"], payload["agent_id"])
+        repeats = 200
+        start = time.perf_counter()
+        for _ in range(repeats):
+            stats = mc.portfolio_vs_leader(chosen, payload["states"], payload["agent_id"])
+        ms = 1000 * (time.perf_counter() - start) / repeats
+        print("{:3d} auctions {:4d} dice: {:6.3f} ms  mean {:7.1f}  5%-95% {:7.1f}-{:<7.1f} p_overtake {:.3f}".format(
+            k, sum(a["num"] for a in chosen), ms, stats["mean"],
+            stats["quantiles"][0.05], stats["quantiles"][0.95], stats["p_overtake"]))
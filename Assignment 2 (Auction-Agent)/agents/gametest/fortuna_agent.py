@@ -1,8 +1,8 @@
 import random
 import os
 import math
-import json
 import numpy as np
+from typing import Optional
 from dnd_auction_game import AuctionGameClient
 from helper import (
     get_number_of_rounds,
@@ -10,6 +10,9 @@ from helper import (
     get_winning_bid_stats,
     compute_historical_winning_stats,
 )
+from model_store import ModelStore
+from history import RingBuffer
+from profiling import maybe_profile
 
 
 ############################################################################################
@@ -29,6 +32,8 @@ class FortunaAgent:
         bid_step: int,
         lambda_base: float,
         lambda_ramp: float,
+        model_path: Optional[str] = None,
+        win_history: int = 4096,
     ):
         self.theta = theta
         self.total_rounds = 0
@@ -38,7 +43,10 @@ class FortunaAgent:
         self.lambda_base = lambda_base
         self.lambda_ramp = lambda_ramp
         self.best_run = {"bestU": -1e9, "bestB": 0, "auction": None}
-        self.win_bids: list[int] = []  # Historical winners across the whole run
+        # Recent clearing prices; lifetime max/mean cover the whole run
+        self.win_bids = RingBuffer(win_history, dtype=np.int64)
+        # Append-only run log; defaults to $FORTUNA_MODEL_PATH or agents/fortuna_model.jsonl
+        self.model_store = ModelStore(model_path)
 
     def auction_estimated_value(self, a: dict) -> float:
         # EV = E[sum of dice] + bonus = num * (die+1)/2 + bonus
@@ -64,35 +72,41 @@ class FortunaAgent:
         x = b / 300.0
         return self.sigmoid(self.theta[0] + self.theta[1] * x)
 
-    # TODO: Implement this
-    def learn_from_prev(self):
-        self.theta = self.load_model_from_file() + [
-            random.uniform(-10, 10),
-            random.uniform(-10, 10),
-        ]
+    def learn_from_prev(self, games: Optional[list] = None, iterations: int = 10):
+        """
+        Refit theta with the cross-entropy trainer on recorded games (lists of
+        round payloads). Without games, fall back to the best stored theta.
+        """
+        if not games:
+            self.theta = self.load_model_from_file()
+            return
+        from fortuna_trainer import train_theta
+
+        record = train_theta(
+            games,
+            lambda_base=self.lambda_base,
+            lambda_ramp=self.lambda_ramp,
+            bid_step=self.bid_step,
+            mean=self.theta,
+            iterations=iterations,
+            workers=1,
+            store=self.model_store,
+        )
+        self.theta = record["theta"]
 
     def load_model_from_file(self):
-        path = "/home/ignacio/Proyects/2025/AI-Architecture/fortuna_model.json"
-        with open(path, "r") as f:
-            content = f.read()
-        records = json.loads(content)
-        best = max(records, key=lambda r: r["bestU"]) if records else None
+        """
+        Theta of the latest trained model (marked current by the trainer),
+        else of the best logged run; looked up through the sidecar index.
+        """
+        best = self.model_store.current()
         if best:
             return best["theta"]
         return [0, 5.0]
 
     def save_model_to_file(self, record: dict):
-        """Persist one record per run inside a valid JSON array file."""
-        path = "fortuna_model.json"
-        existing: list = []
-        if os.path.exists(path):
-            with open(path, "r") as f:
-                content = f.read()
-            if content.strip():
-                existing = json.loads(content)
-        existing.append(record)
-        with open(path, "w") as f:
-            json.dump(existing, f, indent=2)
+        """Append one record per run to the model store."""
+        self.model_store.append(record)
 
     def add_to_historical_winners(self, prev_auctions: dict):
         if not prev_auctions:
@@ -206,7 +220,7 @@ if __name__ == "__main__":
         lambda_ramp=0.01,
     )
     try:
-        game.run(agent.bid)
+        game.run(maybe_profile(agent.bid, "fortuna"))
     except KeyboardInterrupt:
         print("<interrupt - shutting down>")
 
@@ -0,0 +1,357 @@
+"""
+Self-play trainer for the FortunaAgent win-probability model.
+
+The agent bids on each auction the ``b`` that maximises
+``U(b) = p(b) * EV - λ * b * (0.4 + 0.6 * p(b))`` with ``p(b) =
+sigmoid(theta[0] + theta[1] * b / 300)``. This trainer replays recorded or
+simulated rounds, lets every candidate theta choose its bids with exactly that
+pipeline (vectorized over candidates × auctions × bid grid) and scores the
+realized outcome: the rolled points when the bid clears, minus the gold it
+cost, weighted by λ. Theta candidates are sampled in batches and the
+sampling distribution is refitted to the elite of each batch (cross-entropy
+method). Thetas with a non-positive slope ``theta[1]`` would make the win
+probability fall as the bid rises; they score ``-inf`` and never become
+elite. The best theta is appended to the agent's model store marked
+``"current"``, so the agent loads it even though its realized score is not
+comparable with the ``bestU`` the agent logs for its games.
+
+The agent's gold constraint inside a round is ignored, so the score is an
+upper bound of what a theta could have earned on those rounds.
+
+Usage:
+    python fortuna_trainer.py --games 8 --rounds 100 --iterations 10
+    python fortuna_trainer.py --logs ../logs/*.jsonl
+"""
+
+import argparse
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from model_store import ModelStore
+
+
+_ROUNDS: Optional[Dict[str, np.ndarray]] = None  # set in each worker process
+
+
+############################################################################################
+#
+# Round data
+#
+############################################################################################
+
+
+def load_recorded_games(paths: Sequence[str]) -> List[List[Dict]]:
+    """Read client logs (one round payload per line, one file per game)."""
+    from delta_protocol import read_round_log
+
+    return [list(read_round_log(path)) for path in paths]
+
+
+def simulate_games(
+    n_games: int,
+    num_rounds: int = 100,
+    opponents: Sequence[str] = ("tiny_bid", "rand_walk", "mhmdmain", "ignacio", "maxi", "victor2", "fortuna"),
+    seed: int = 0,
+) -> List[List[Dict]]:
+    """Record the payloads of ``n_games`` local games between ``opponents``."""
+    import random
+
+    from agent_pool import make_agent
+    from local_game import LocalAuctionGame
+
+    games = []
+    for g in range(n_games):
+        random.seed(seed + g)
+        np.random.seed((seed + g) % 2**32)
+        agents = {"{}_{}".format(name, i): make_agent(name) for i, name in enumerate(opponents)}
+        game = LocalAuctionGame(agents, num_rounds=num_rounds, seed=seed + g, record=True)
+        game.run()
+        games.append(game.history)
+    return games
+
+
+def build_rounds(
+    games: List[List[Dict]],
+    lambda_base: float,
+    lambda_ramp: float,
+    bid_step: int,
+    max_grid: int = 256,
+) -> Dict[str, np.ndarray]:
+    """
+    Flatten resolved auctions into arrays, one row per auction.
+
+    The bid window of every row mirrors ``FortunaAgent.bid``: bids run from
+    the mean to the max of all clearing prices seen before that round, in
+    steps of ``bid_step`` (coarsened so a window has at most ``max_grid`` bids).
+    """
+    cols = {k: [] for k in ("ev", "reward", "price", "lam", "lo", "hi", "step")}
+    for payloads in games:
+        if not payloads:
+            continue
+        total_rounds = len(payloads[0]["remainder_gold_income"])
+        price_sum, price_count, price_max = 0.0, 0, 0
+
+        for t, payload in enumerate(payloads):
+            round_idx = t - 1  # prev_auctions of payload t were bid on in round t-1
+            lam = lambda_base + lambda_ramp * (round_idx / max(1, total_rounds - 1))
+            lo = int(price_sum / price_count) if price_count else 0
+            hi = int(price_max)
+
+            prices = []
+            for a in payload["prev_auctions"].values():
+                bids = a.get("bids", [])
+                price = int(bids[0]["gold"]) if bids else 0
+                if bids:
+                    prices.append(price)
+                if hi <= lo:
+                    continue
+                cols["ev"].append(a["num"] * (a["die"] + 1) / 2.0 + a["bonus"])
+                cols["reward"].append(a["reward"])
+                cols["price"].append(price)
+                cols["lam"].append(lam)
+                cols["lo"].append(lo)
+                cols["hi"].append(hi)
+                cols["step"].append(max(bid_step, int(math.ceil((hi - lo) / max_grid))))
+
+            price_sum += sum(prices)
+            price_count += len(prices)
+            price_max = max([price_max] + prices)
+
+    rounds = {k: np.asarray(v, dtype=np.float64) for k, v in cols.items()}
+    rounds["n_rounds"] = np.array(sum(max(0, len(p) - 1) for p in games))
+    return rounds
+
+
+############################################################################################
+#
+# Vectorized evaluation
+#
+############################################################################################
+
+
+def evaluate_thetas(
+    thetas: np.ndarray, rounds: Dict[str, np.ndarray], max_elements: int = 4_000_000
+) -> np.ndarray:
+    """
+    Return ``(score, bestU, bestB)`` arrays for ``K`` candidate thetas.
+
+    ``score`` is the realized utility per round, ``bestU``/``bestB`` the best
+    predicted utility over all auctions and its bid, as logged by the agent.
+    """
+    thetas = np.atleast_2d(np.asarray(thetas, dtype=np.float64))
+    k = thetas.shape[0]
+    n = rounds["ev"].shape[0]
+    score = np.zeros(k)
+    best_u = np.full(k, -1e9)
+    best_b = np.zeros(k)
+    if n == 0:
+        return np.stack([score, best_u, best_b], axis=1)
+
+    n_grid = int(np.max(np.ceil((rounds["hi"] - rounds["lo"]) / rounds["step"])))
+    j = np.arange(n_grid)
+    t0 = thetas[:, 0, None, None]
+    t1 = thetas[:, 1, None, None]
+    chunk = max(1, max_elements // (k * n_grid))
+
+    for start in range(0, n, chunk):
+        sl = slice(start, start + chunk)
+        ev, lam = rounds["ev"][sl, None], rounds["lam"][sl, None]
+        b = rounds["lo"][sl, None] + j[None, :] * rounds["step"][sl, None]
+        valid = b < rounds["hi"][sl, None]
+
+        z = np.clip(t0 + t1 * (b / 300.0)[None], -30.0, 30.0)
+        p = 1.0 / (1.0 + np.exp(-z))
+        u = p * ev[None] - lam[None] * b[None] * (0.4 + 0.6 * p)
+        u = np.where(valid[None], u, -np.inf)
+
+        idx = np.argmax(u, axis=2)
+        u_star = np.take_along_axis(u, idx[..., None], axis=2)[..., 0]
+        b_star = np.take_along_axis(np.broadcast_to(b, u.shape), idx[..., None], axis=2)[..., 0]
+
+        placed = u_star > 0
+        won = placed & (b_star >= rounds["price"][sl][None])
+        cost = lam[:, 0][None] * b_star * (0.4 + 0.6 * won)
+        realized = np.where(placed, won * rounds["reward"][sl][None] - cost, 0.0)
+        score += realized.sum(axis=1)
+
+        row = np.argmax(u_star, axis=1)
+        chunk_best = u_star[np.arange(k), row]
+        better = chunk_best > best_u
+        best_u = np.where(better, chunk_best, best_u)
+        best_b = np.where(better, b_star[np.arange(k), row], best_b)
+
+    score /= max(1, int(rounds["n_rounds"]))
+    return np.stack([score, best_u, best_b], axis=1)
+
+
+def _init_worker(rounds: Dict[str, np.ndarray]) -> None:
+    global _ROUNDS
+    _ROUNDS = rounds
+
+
+def _evaluate_in_worker(thetas: np.ndarray) -> np.ndarray:
+    return evaluate_thetas(thetas, _ROUNDS)
+
+
+############################################################################################
+#
+# Cross-entropy method
+#
+############################################################################################
+
+
+class FortunaTrainer:
+    """
+    Cross-entropy search over theta.
+
+    Every iteration draws ``batch_size`` thetas from a diagonal Gaussian,
+    scores them on the rounds (split over ``workers`` processes) and moves the
+    Gaussian towards the ``elite_frac`` best, smoothed by ``alpha``.
+    Candidates with ``theta[1] <= min_slope`` are rejected (score ``-inf``).
+    """
+
+    def __init__(
+        self,
+        rounds: Dict[str, np.ndarray],
+        mean: Sequence[float] = (-50.0, 500.0),
+        std: Sequence[float] = (50.0, 500.0),
+        batch_size: int = 256,
+        elite_frac: float = 0.1,
+        alpha: float = 0.7,
+        min_std: float = 1e-3,
+        min_slope: float = 0.0,
+        workers: Optional[int] = None,
+        seed: int = 0,
+    ):
+        self.rounds = rounds
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.std = np.asarray(std, dtype=np.float64)
+        self.batch_size = batch_size
+        self.n_elite = max(1, int(round(batch_size * elite_frac)))
+        self.alpha = alpha
+        self.min_std = min_std
+        self.min_slope = min_slope
+        self.workers = workers or os.cpu_count() or 1
+        self.rng = np.random.default_rng(seed)
+        self.best = {"theta": list(self.mean), "score": -np.inf, "bestU": -1e9, "bestB": 0}
+
+    def _score(self, thetas: np.ndarray, pool: Optional[ProcessPoolExecutor]) -> np.ndarray:
+        if pool is None:
+            return evaluate_thetas(thetas, self.rounds)
+        parts = np.array_split(thetas, self.workers)
+        return np.concatenate(list(pool.map(_evaluate_in_worker, parts)))
+
+    def step(self, pool: Optional[ProcessPoolExecutor] = None) -> float:
+        thetas = self.mean + self.std * self.rng.standard_normal((self.batch_size, 2))
+        results = self._score(thetas, pool)
+        results[thetas[:, 1] <= self.min_slope, 0] = -np.inf
+        order = np.argsort(results[:, 0])[::-1]
+        elite = thetas[order[: self.n_elite]]
+
+        top = order[0]
+        if results[top, 0] > self.best["score"]:
+            self.best = {
+                "theta": [float(v) for v in thetas[top]],
+                "score": float(results[top, 0]),
+                "bestU": float(results[top, 1]),
+                "bestB": int(results[top, 2]),
+            }
+
+        self.mean = self.alpha * elite.mean(axis=0) + (1 - self.alpha) * self.mean
+        self.std = np.maximum(
+            self.alpha * elite.std(axis=0) + (1 - self.alpha) * self.std, self.min_std
+        )
+        return float(results[top, 0])
+
+    def train(self, iterations: int = 10, tol: float = 1e-4, verbose: bool = False) -> Dict:
+        """Run up to ``iterations`` batches; stop early once the distribution has collapsed."""
+        pool = None
+        if self.workers > 1:
+            pool = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_init_worker, initargs=(self.rounds,)
+            )
+        try:
+            for it in range(iterations):
+                batch_best = self.step(pool)
+                if verbose:
+                    print("iter {:3d}  batch best {:9.3f}  best {:9.3f}  mean {}  std {}".format(
+                        it, batch_best, self.best["score"], np.round(self.mean, 3), np.round(self.std, 3)))
+                if np.all(self.std <= np.maximum(tol * np.abs(self.mean), self.min_std)):
+                    break
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        return self.best
+
+
+def train_theta(
+    games: List[List[Dict]],
+    lambda_base: float = 0.025,
+    lambda_ramp: float = 0.01,
+    bid_step: int = 10,
+    mean: Optional[Sequence[float]] = None,
+    iterations: int = 10,
+    workers: Optional[int] = None,
+    store: Optional[ModelStore] = None,
+    verbose: bool = False,
+) -> Dict:
+    """Train theta on ``games`` and, if given a ``store``, append the result to it."""
+    rounds = build_rounds(games, lambda_base, lambda_ramp, bid_step)
+    trainer = FortunaTrainer(
+        rounds, mean=mean if mean is not None else (-50.0, 500.0), workers=workers
+    )
+    best = trainer.train(iterations=iterations, verbose=verbose)
+    if not np.isfinite(best["score"]):
+        raise ValueError("no candidate theta with a positive slope; start from a different mean")
+    record = {
+        "theta": best["theta"],
+        "bestU": best["bestU"],
+        "bestB": best["bestB"],
+        "score": best["score"],
+        "source": "fortuna_trainer",
+        "current": True,
+    }
+    if store is not None:
+        store.append(record)
+    return record
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cross-entropy trainer for FortunaAgent theta")
+    parser.add_argument("--logs", nargs="*", default=None, help="client log files to train on")
+    parser.add_argument("--games", type=int, default=8, help="simulated games when no logs are given")
+    parser.add_argument("--rounds", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--lambda-base", type=float, default=0.025)
+    parser.add_argument("--lambda-ramp", type=float, default=0.01)
+    parser.add_argument("--bid-step", type=int, default=10)
+    parser.add_argument("--model-path", default=None, help="model store (default: agent's store)")
+    parser.add_argument("--dry-run", action="store_true", help="do not write to the model store")
+    args = parser.parse_args()
+
+    if args.logs:
+        games = load_recorded_games(args.logs)
+    else:
+        print("simulating {} games of {} rounds...".format(args.games, args.rounds))
+        games = simulate_games(args.games, args.rounds)
+
+    store = None if args.dry_run else ModelStore(args.model_path)
+    start = store.current()["theta"] if store is not None and store.current() else None
+    record = train_theta(
+        games,
+        lambda_base=args.lambda_base,
+        lambda_ramp=args.lambda_ramp,
+        bid_step=args.bid_step,
+        mean=start,
+        iterations=args.iterations,
+        workers=args.workers,
+        store=store,
+        verbose=True,
+    )
+    print(json.dumps(record))
@@ -0,0 +1,323 @@
+"""
+Columnar analytics over many recorded games.
+
+``build_store`` converts a directory of client logs (one round payload per
+line, full or delta encoded) into flat column files: one row per resolved
+auction plus all bids in one array with ``bid_offsets``, so auction ``i``
+owns ``bid_gold[bid_offsets[i]:bid_offsets[i + 1]]``. ``GameLogStore``
+memory-maps those columns and answers market questions with vectorized
+group-bys instead of walking ``prev_auctions`` dicts:
+
+- clearing price per EV point by round and by bank interest,
+- how often the top EV auction of a round is contested,
+- priors for ``helper.estimated_price`` and ``maxi.MarketAgent(cp=...)``.
+
+The store is rebuilt only when the set of logs (paths, sizes, mtimes)
+changes. Logs of the same game written by several agents are counted once.
+
+Usage:
+    python game_analytics.py ../logs
+    python game_analytics.py ../logs --round-bin 25 --priors market_priors.json
+"""
+
+import argparse
+import array
+import glob
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from delta_protocol import read_round_log
+from helper import calculate_auction_expected_value
+
+
+DEFAULT_STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".game_analytics")
+
+AUCTION_COLUMNS = {
+    "game": "i",
+    "round": "i",
+    "die": "i",
+    "num": "i",
+    "bonus": "i",
+    "reward": "i",
+    "n_bids": "i",
+    "n_agents": "i",
+    "interest": "d",
+    "bank_limit": "d",
+}
+
+
+def find_logs(paths: Sequence[str]) -> List[str]:
+    """Expand directories into their ``*.jsonl`` files."""
+    found = []
+    for p in paths:
+        if os.path.isdir(p):
+            found.extend(sorted(glob.glob(os.path.join(p, "*.jsonl"))))
+        else:
+            found.append(p)
+    return found
+
+
+def _sources(paths: Sequence[str]) -> List[Dict]:
+    out = []
+    for p in paths:
+        st = os.stat(p)
+        out.append({"path": os.path.abspath(p), "size": st.st_size, "mtime": st.st_mtime})
+    return out
+
+
+def _fingerprint(round_data: Dict) -> str:
+    return hashlib.sha1(
+        json.dumps([round_data["round"], round_data["auctions"]], sort_keys=True).encode()
+    ).hexdigest()
+
+
+def build_store(paths: Sequence[str], store_dir: str = DEFAULT_STORE_DIR, force: bool = False) -> str:
+    """Write the column files for ``paths`` into ``store_dir`` unless they are up to date."""
+    logs = find_logs(paths)
+    sources = _sources(logs)
+    manifest_path = os.path.join(store_dir, "manifest.json")
+    if not force and os.path.exists(manifest_path):
+        with open(manifest_path, "r") as f:
+            if json.load(f).get("sources") == sources:
+                return store_dir
+
+    cols = {name: array.array(code) for name, code in AUCTION_COLUMNS.items()}
+    bid_gold = array.array("q")
+    bid_agent = array.array("i")
+    agent_codes: Dict[str, int] = {}
+    seen_games = set()
+    n_games = 0
+
+    for path in logs:
+        bank_now = None
+        first = True
+        for round_data in read_round_log(path):
+            if first:
+                first = False
+                key = _fingerprint(round_data)
+                if key in seen_games:
+                    break
+                seen_games.add(key)
+                game = n_games
+                n_games += 1
+
+            # prev_auctions were bid on in the previous round, whose payload
+            # announced the interest and limit paid at the end of it.
+            interest, limit = bank_now if bank_now else (np.nan, np.nan)
+            n_agents = len(round_data["states"])
+            for a in round_data["prev_auctions"].values():
+                bids = a.get("bids", [])
+                cols["game"].append(game)
+                cols["round"].append(round_data["round"] - 1)
+                cols["die"].append(a["die"])
+                cols["num"].append(a["num"])
+                cols["bonus"].append(a["bonus"])
+                cols["reward"].append(a.get("reward", 0))
+                cols["n_bids"].append(len(bids))
+                cols["n_agents"].append(n_agents)
+                cols["interest"].append(interest)
+                cols["bank_limit"].append(limit)
+                for b in bids:
+                    code = agent_codes.setdefault(b["a_id"], len(agent_codes))
+                    bid_agent.append(code)
+                    bid_gold.append(int(b["gold"]))
+
+            rates = round_data["remainder_bank_interest"]
+            limits = round_data["remainder_bank_limit"]
+            bank_now = (rates[0], limits[0]) if rates and limits else None
+
+    os.makedirs(store_dir, exist_ok=True)
+    for name, values in cols.items():
+        np.save(os.path.join(store_dir, name + ".npy"), np.frombuffer(values, dtype=values.typecode))
+    n_bids = np.frombuffer(cols["n_bids"], dtype="i")
+    offsets = np.zeros(len(n_bids) + 1, dtype=np.int64)
+    np.cumsum(n_bids, out=offsets[1:])
+    np.save(os.path.join(store_dir, "bid_offsets.npy"), offsets)
+    np.save(os.path.join(store_dir, "bid_gold.npy"), np.frombuffer(bid_gold, dtype="q"))
+    np.save(os.path.join(store_dir, "bid_agent.npy"), np.frombuffer(bid_agent, dtype="i"))
+
+    tmp = manifest_path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"sources": sources, "n_games": n_games, "agents": list(agent_codes)}, f)
+    os.replace(tmp, manifest_path)
+    return store_dir
+
+
+def group_stats(keys: np.ndarray, values: np.ndarray, quantiles=(0.25, 0.5, 0.75)) -> Dict[str, np.ndarray]:
+    """
+    Count, mean and quantiles of ``values`` for every distinct key, computed
+    with one lexsort instead of a Python loop over groups.
+    """
+    order = np.lexsort((values, keys))
+    k, v = keys[order], values[order]
+    uniq, start, count = np.unique(k, return_index=True, return_counts=True)
+    out = {"key": uniq, "count": count}
+    if len(v) == 0:
+        out["mean"] = np.zeros(0)
+        for q in quantiles:
+            out["q{:g}".format(100 * q)] = np.zeros(0)
+        return out
+    out["mean"] = np.add.reduceat(v, start) / count
+    for q in quantiles:
+        pos = start + q * (count - 1)
+        lo = np.floor(pos).astype(np.int64)
+        hi = np.ceil(pos).astype(np.int64)
+        out["q{:g}".format(100 * q)] = v[lo] + (v[hi] - v[lo]) * (pos - lo)
+    return out
+
+
+class GameLogStore:
+    """Read-only, memory-mapped view of the columns written by ``build_store``."""
+
+    def __init__(self, store_dir: str = DEFAULT_STORE_DIR):
+        with open(os.path.join(store_dir, "manifest.json"), "r") as f:
+            manifest = json.load(f)
+        self.n_games = manifest["n_games"]
+        self.agents = manifest["agents"]
+
+        def load(name):
+            return np.load(os.path.join(store_dir, name + ".npy"), mmap_mode="r")
+
+        for name in AUCTION_COLUMNS:
+            setattr(self, name, load(name))
+        self.bid_offsets = load("bid_offsets")
+        self.bid_gold = load("bid_gold")
+        self.bid_agent = load("bid_agent")
+
+        # helper's EV is linear in num and bonus: one call per die size gives the mean roll
+        dice = np.unique(np.asarray(self.die))
+        avg = np.zeros(int(dice.max()) + 1 if len(dice) else 1)
+        for die in dice:
+            avg[die] = calculate_auction_expected_value({"die": int(die), "num": 1, "bonus": 0})
+        self.ev = avg[self.die] * self.num + self.bonus
+
+    def __len__(self) -> int:
+        return len(self.die)
+
+    def winning_price(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Indices of auctions with at least one bid and their clearing price (top bid)."""
+        sold = np.flatnonzero(np.asarray(self.n_bids) > 0)
+        return sold, np.asarray(self.bid_gold[self.bid_offsets[sold]], dtype=np.float64)
+
+    def price_per_point(self, per: str = "ev") -> Tuple[np.ndarray, np.ndarray]:
+        """Clearing price divided by EV (or by the rolled reward) for sold auctions worth > 0."""
+        sold, price = self.winning_price()
+        points = self.ev[sold] if per == "ev" else np.asarray(self.reward[sold], dtype=np.float64)
+        keep = points > 0
+        return sold[keep], price[keep] / points[keep]
+
+    def price_per_ev_by_round(self, round_bin: int = 10) -> Dict[str, np.ndarray]:
+        idx, ratio = self.price_per_point("ev")
+        stats = group_stats(np.asarray(self.round[idx]) // round_bin, ratio)
+        stats["key"] = stats["key"] * round_bin
+        return stats
+
+    def price_per_ev_by_interest(self, edges: Optional[Sequence[float]] = None) -> Dict[str, np.ndarray]:
+        if edges is None:
+            edges = np.arange(0.85, 1.151, 0.025)
+        edges = np.asarray(edges, dtype=np.float64)
+        idx, ratio = self.price_per_point("ev")
+        interest = np.asarray(self.interest[idx])
+        known = ~np.isnan(interest)
+        bins = np.clip(np.digitize(interest[known], edges) - 1, 0, len(edges) - 2)
+        stats = group_stats(bins, ratio[known])
+        stats["lo"] = edges[stats["key"]]
+        stats["hi"] = edges[stats["key"] + 1]
+        return stats
+
+    def top_ev_contested(self) -> Dict[str, float]:
+        """Share of rounds whose highest EV auction drew two or more bids."""
+        if len(self) == 0:
+            return {"rounds": 0, "contested": 0.0, "sold": 0.0, "mean_bidders": 0.0, "all_contested": 0.0}
+        rounds = np.asarray(self.round, dtype=np.int64)
+        key = np.asarray(self.game, dtype=np.int64) * (int(rounds.max()) + 2) + rounds + 1
+        order = np.lexsort((-self.ev, key))
+        _, first = np.unique(key[order], return_index=True)
+        top = order[first]
+        n_bids = np.asarray(self.n_bids)
+        return {
+            "rounds": int(len(top)),
+            "contested": float(np.mean(n_bids[top] >= 2)),
+            "sold": float(np.mean(n_bids[top] >= 1)),
+            "mean_bidders": float(np.mean(n_bids[top])),
+            "all_contested": float(np.mean(n_bids >= 2)),
+        }
+
+    def priors(self, min_count: int = 3) -> Dict:
+        """
+        Market priors: ``cp`` is the median clearing price per rolled point
+        (what ``MarketAgent`` learns online), ``signature_price`` the mean
+        clearing price of every (die, num, bonus) seen at least ``min_count``
+        times (the cold start of ``helper.estimated_price``).
+        """
+        _, per_reward = self.price_per_point("reward")
+        sold, price = self.winning_price()
+        sig = (np.asarray(self.die[sold], dtype=np.int64) * 100 + self.num[sold]) * 100 + (self.bonus[sold] + 50)
+        stats = group_stats(sig, price, quantiles=())
+        keep = stats["count"] >= min_count
+        signature_price = {}
+        for s, mean in zip(stats["key"][keep], stats["mean"][keep]):
+            die, rest = divmod(int(s), 10000)
+            num, bonus = divmod(rest, 100)
+            signature_price["{},{},{}".format(die, num, bonus - 50)] = round(float(mean), 2)
+        return {
+            "cp": float(np.median(per_reward)) if len(per_reward) else 30.0,
+            "cp_per_ev": float(np.median(self.price_per_point("ev")[1])) if len(sold) else 30.0,
+            "n_games": self.n_games,
+            "n_auctions": int(len(self)),
+            "signature_price": signature_price,
+        }
+
+
+def load_priors(path: str) -> Tuple[float, Dict[Tuple[int, int, int], float]]:
+    """Read a priors file; returns ``(cp, price_prior)`` for ``MarketAgent`` and ``estimated_price``."""
+    with open(path, "r") as f:
+        data = json.load(f)
+    price_prior = {
+        tuple(int(x) for x in key.split(",")): price
+        for key, price in data.get("signature_price", {}).items()
+    }
+    return data.get("cp", 30.0), price_prior
+
+
+def print_report(store: GameLogStore, round_bin: int = 10) -> None:
+    print("{} games, {} auctions, {} bids".format(store.n_games, len(store), len(store.bid_gold)))
+
+    print("\nprice per EV point by round")
+    s = store.price_per_ev_by_round(round_bin)
+    for k, n, mean, med in zip(s["key"], s["count"], s["mean"], s["q50"]):
+        print("  rounds {:>4d}-{:<4d} n={:<7d} mean {:8.2f}  median {:8.2f}".format(
+            int(k), int(k) + round_bin - 1, int(n), mean, med))
+
+    print("\nprice per EV point by bank interest")
+    s = store.price_per_ev_by_interest()
+    for lo, hi, n, mean, med in zip(s["lo"], s["hi"], s["count"], s["mean"], s["q50"]):
+        print("  {:.3f}-{:.3f}  n={:<7d} mean {:8.2f}  median {:8.2f}".format(lo, hi, int(n), mean, med))
+
+    c = store.top_ev_contested()
+    print("\ntop EV auction: contested in {:.1%} of {} rounds (sold {:.1%}, {:.2f} bidders on average); "
+          "all auctions contested {:.1%}".format(
+              c["contested"], c["rounds"], c["sold"], c["mean_bidders"], c["all_contested"]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Market analytics over recorded game logs")
+    parser.add_argument("logs", nargs="+", help="log files or directories of *.jsonl logs")
+    parser.add_argument("--store", default=DEFAULT_STORE_DIR)
+    parser.add_argument("--rebuild", action="store_true")
+    parser.add_argument("--round-bin", type=int, default=10)
+    parser.add_argument("--priors", default=None, help="write priors for the agents to this file")
+    args = parser.parse_args()
+
+    build_store(args.logs, args.store, force=args.rebuild)
+    store = GameLogStore(args.store)
+    print_report(store, args.round_bin)
+
+    if args.priors:
+        with open(args.priors, "w") as f:
+            json.dump(store.priors(), f, indent=2)
+        print("\npriors written to {}".format(args.priors))
@@ -6,7 +6,7 @@ calculating statistics, and making bidding decisions.
 """
 
 import numpy as np
-from typing import Dict, Tuple, Deque, List
+from typing import Dict, Tuple, Deque, List, Optional
 from collections import deque
 
 
@@ -132,7 +132,8 @@ def estimated_price(price_history: Dict[Tuple[int, int, int], Deque[int]],
                     die: int,
                     num: int,
                     bonus: int,
-                    others_max_gold: int) -> float:
+                    others_max_gold: int,
+                    prior: Optional[Dict[Tuple[int, int, int], float]] = None) -> float:
     """
     Estimate a fair price for an auction signature based on historical winning bids.
 
@@ -140,6 +141,8 @@ def estimated_price(price_history: Dict[Tuple[int, int, int], Deque[int]],
     - price_history: mapping (die, num, bonus) -> deque of past winning bid amounts
     - die, num, bonus: the auction signature
     - others_max_gold: cap the estimate by what others can likely afford
+    - prior: optional mapping (die, num, bonus) -> price learned from recorded
+      games (see game_analytics.load_priors), used before we have own history
 
     Returns a float estimate capped by others_max_gold, with cold-start fallback.
     """
@@ -147,6 +150,8 @@ def estimated_price(price_history: Dict[Tuple[int, int, int], Deque[int]],
     history = price_history.get(key)
     
     if not history or len(history) == 0:
+        if prior and key in prior:
+            return min(float(prior[key]), float(others_max_gold))
         return min(30.0, float(others_max_gold))
     est = sum(history) / len(history)
     return min(float(est), float(others_max_gold))
@@ -160,7 +165,14 @@ def compute_historical_winning_stats(win_bids: List[int]) -> Tuple[int, float]:
     - hist_max never decreases across rounds because it's computed over
       the cumulative list.
     - hist_mean is the arithmetic mean over all entries.
+
+    A history.RingBuffer is accepted as well; its lifetime statistics cover
+    every value ever appended, not only the ones still in the window.
     """
+    if hasattr(win_bids, "lifetime_max"):
+        if win_bids.count == 0:
+            return 0, 0.0
+        return int(win_bids.lifetime_max), float(win_bids.lifetime_sum) / float(win_bids.count)
     if not win_bids:
         return 0, 0.0
     hist_max = max(win_bids)
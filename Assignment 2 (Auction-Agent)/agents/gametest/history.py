@@ -0,0 +1,169 @@
+"""
+Bounded-memory history containers for long running agents.
+
+Agents used to keep every observation in growing Python lists of tuples or
+ints (50-100 bytes per value). These containers store typed values in fixed
+size numpy arrays instead, so memory stays flat however long the game runs:
+
+- ``RingBuffer``: the last ``capacity`` values (or rows of ``width`` values)
+  with O(1) appends and a contiguous, zero-copy numpy view of the window.
+  Lifetime count, sum, min and max are kept for the whole stream.
+- ``ReservoirSampler``: a uniform random sample of the whole stream.
+- ``MultiResolutionHistory``: the recent values at full resolution plus
+  coarser and coarser bucket summaries (mean, min, max, count) of the past.
+"""
+
+import random
+from typing import Iterator, Optional
+
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Fixed capacity FIFO of scalars (``width=None``) or rows of ``width`` values.
+
+    Every value is written twice, at ``i`` and ``i + capacity`` of a buffer of
+    twice the capacity, so the current window is always one contiguous slice
+    and ``view()`` never copies.
+    """
+
+    def __init__(self, capacity: int, width: Optional[int] = None, dtype=np.float64):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.width = width
+        shape = (2 * capacity,) if width is None else (2 * capacity, width)
+        self._data = np.zeros(shape, dtype=dtype)
+        self.count = 0  # values appended over the lifetime of the buffer
+        tail = () if width is None else (width,)
+        self.lifetime_sum = np.zeros(tail, dtype=np.float64)
+        self.lifetime_min = np.full(tail, np.inf)
+        self.lifetime_max = np.full(tail, -np.inf)
+
+    def append(self, value) -> None:
+        i = self.count % self.capacity
+        self._data[i] = value
+        self._data[i + self.capacity] = value
+        self.count += 1
+        v = self._data[i]
+        self.lifetime_sum += v
+        np.minimum(self.lifetime_min, v, out=self.lifetime_min)
+        np.maximum(self.lifetime_max, v, out=self.lifetime_max)
+
+    def extend(self, values) -> None:
+        for v in values:
+            self.append(v)
+
+    def clear(self) -> None:
+        self.count = 0
+        self.lifetime_sum[...] = 0.0
+        self.lifetime_min[...] = np.inf
+        self.lifetime_max[...] = -np.inf
+
+    def view(self) -> np.ndarray:
+        """Read-only view of the stored values, oldest first."""
+        if self.count <= self.capacity:
+            v = self._data[: self.count]
+        else:
+            start = self.count % self.capacity
+            v = self._data[start : start + self.capacity]
+        v = v.view()
+        v.flags.writeable = False
+        return v
+
+    def __array__(self, dtype=None, copy=None):
+        v = self.view()
+        return v if dtype is None else v.astype(dtype)
+
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+
+    def __iter__(self) -> Iterator:
+        return iter(self.view())
+
+    def __getitem__(self, item):
+        return self.view()[item]
+
+    @property
+    def lifetime_mean(self):
+        return self.lifetime_sum / self.count if self.count else self.lifetime_sum * 0.0
+
+    def __repr__(self) -> str:
+        return "RingBuffer(capacity={}, width={}, len={}, count={})".format(
+            self.capacity, self.width, len(self), self.count)
+
+
+class ReservoirSampler:
+    """Uniform sample of at most ``capacity`` values from the whole stream (algorithm R)."""
+
+    def __init__(self, capacity: int, width: Optional[int] = None, dtype=np.float64,
+                 seed: Optional[int] = None):
+        self.capacity = capacity
+        shape = (capacity,) if width is None else (capacity, width)
+        self._data = np.zeros(shape, dtype=dtype)
+        self._rng = random.Random(seed)
+        self.count = 0
+
+    def append(self, value) -> None:
+        if self.count < self.capacity:
+            self._data[self.count] = value
+        else:
+            j = self._rng.randrange(self.count + 1)
+            if j < self.capacity:
+                self._data[j] = value
+        self.count += 1
+
+    def extend(self, values) -> None:
+        for v in values:
+            self.append(v)
+
+    def view(self) -> np.ndarray:
+        v = self._data[: min(self.count, self.capacity)].view()
+        v.flags.writeable = False
+        return v
+
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+
+
+class MultiResolutionHistory:
+    """
+    Level 0 holds the last ``capacity`` raw values. Level ``k`` holds the last
+    ``capacity`` summaries of buckets of ``factor**k`` consecutive values as
+    rows ``[mean, min, max, count]``, so ``levels`` levels cover roughly
+    ``capacity * factor**(levels - 1)`` values in ``levels * capacity`` rows.
+    """
+
+    def __init__(self, capacity: int = 256, factor: int = 8, levels: int = 3):
+        self.factor = factor
+        self.raw = RingBuffer(capacity)
+        self.levels = [RingBuffer(capacity, width=4) for _ in range(levels - 1)]
+        # Running [sum, min, max, count] of the bucket being filled on each level.
+        self._pending = [[0.0, np.inf, -np.inf, 0] for _ in range(levels - 1)]
+
+    def append(self, value: float) -> None:
+        self.raw.append(value)
+        self._push(0, float(value), float(value), float(value), 1)
+
+    def _push(self, level: int, total: float, lo: float, hi: float, n: int) -> None:
+        if level >= len(self.levels):
+            return
+        p = self._pending[level]
+        p[0] += total
+        p[1] = min(p[1], lo)
+        p[2] = max(p[2], hi)
+        p[3] += n
+        # A bucket on this level is complete after ``factor`` buckets of the level below.
+        if p[3] >= self.factor ** (level + 1):
+            self.levels[level].append((p[0] / p[3], p[1], p[2], p[3]))
+            self._push(level + 1, p[0], p[1], p[2], p[3])
+            self._pending[level] = [0.0, np.inf, -np.inf, 0]
+
+    def level(self, k: int) -> np.ndarray:
+        """Level 0: raw values; level ``k > 0``: ``[mean, min, max, count]`` rows."""
+        return self.raw.view() if k == 0 else self.levels[k - 1].view()
+
+    @property
+    def count(self) -> int:
+        return self.raw.count
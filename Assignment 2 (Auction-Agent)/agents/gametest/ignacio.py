@@ -2,6 +2,7 @@ import os
 import random
 from collections import defaultdict, deque
 from dnd_auction_game import AuctionGameClient
+from profiling import maybe_profile
 from helper import (
     get_other_agents_stats,
     get_current_bank_stats,
@@ -31,6 +32,7 @@ class FirstAgent:
         rich_max_bid: int = 500,  # when next income is high
         min_bid: int = 12,
         rounds_qt: int = 12,
+        price_prior: dict = None,  # (die, num, bonus) -> price, see game_analytics.load_priors
     ):
         self.base_max_bid = base_max_bid
         self.rich_max_bid = rich_max_bid
@@ -40,6 +42,7 @@ class FirstAgent:
         self.min_auctions = min_auctions
         self.overpay_margin = overpay_margin
         self.rounds_qt = rounds_qt
+        self.price_prior = price_prior
 
     def isHighestInterestRate(self, interest_rate: float):
         return max(self.bank_state.get("bank_interest_per_round", [])) == interest_rate
@@ -95,6 +98,7 @@ class FirstAgent:
                 a["num"],
                 a["bonus"],
                 max(others_gold) if others_gold else gold,
+                prior=self.price_prior,
             )
             # simple score: EV per unit price; add tiny jitter to avoid ties
             # HIGHER SCORE: Means that the auction gives me more points for my gold.
@@ -151,7 +155,7 @@ if __name__ == "__main__":
     )
     agent = FirstAgent()
     try:
-        game.run(agent.bid)
+        game.run(maybe_profile(agent.bid, "ignacio"))
     except KeyboardInterrupt:
         print("<interrupt - shutting down>")
     print("<game is done>")
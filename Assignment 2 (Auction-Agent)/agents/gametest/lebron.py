@@ -1,6 +1,7 @@
 import random
 from dnd_auction_game import AuctionGameClient
 import numpy as np
+from profiling import maybe_profile
 
 average_roll_for_die = {
     2: 1.5,
@@ -307,7 +308,7 @@ if __name__ == "__main__":
         host=host, agent_name=agent_name, player_id=player_id, port=port
     )
     try:
-        game.run(smart_bidder)
+        game.run(maybe_profile(smart_bidder, "lebron"))
     except KeyboardInterrupt:
         print("\n<interrupt - shutting down>")
     print("<game is done>")
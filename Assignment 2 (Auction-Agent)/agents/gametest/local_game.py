@@ -0,0 +1,237 @@
+"""
+Local, in-process stand-in for the dnd_auction_game server.
+
+Runs a whole game between bid callbacks without websockets or the one second
+server tick, following the rules of the auction house: interest on gold up to
+the bank limit, a gold income every round, 1.5 auctions per agent, every top
+bid wins the rolled points and losing bids get 60% of their gold back.
+
+Each agent receives its own decoded copy of the round payload, just like a
+real client, so agents that mutate their inputs cannot affect each other.
+"""
+
+import contextlib
+import json
+import math
+import os
+import random
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+
+DIE_SIZES = [2, 3, 4, 6, 8, 10, 12, 20, 20]
+DIE_PROB = [8, 8, 9, 8, 6, 6, 5, 2, 1]
+MAX_N_DIE = [5, 7, 10, 2, 3, 3, 6, 2, 4]
+MAX_BONUS = [10, 2, 16, 8, 21, 2, 5, 7, 3]
+MIN_BONUS = [-2, -8, -5, -5, -10, -4, -5, -4, -4]
+
+
+def generate_gold_random_walk(rng: random.Random, n_steps: int) -> List[int]:
+    gold = [1000]
+    for i in range(n_steps - 1):
+        next_gold = min(3000, max(0, gold[-1] + rng.randint(-150, 150)))
+        gold.append(next_gold)
+        if i % 500 == 0:
+            gold[-1] = 1000
+    return gold
+
+
+def bank_limit_random_walk(rng: random.Random, n_steps: int) -> List[int]:
+    limits = [2000]
+    for i in range(n_steps - 1):
+        next_limit = min(10000, max(0, limits[-1] + rng.randint(-150, 150)))
+        limits.append(next_limit)
+        if i % 300 == 0:
+            limits[-1] = 2000
+    return limits
+
+
+def bank_interest_random_walk(rng: random.Random, n_steps: int) -> List[float]:
+    rates = [1.03]
+    for i in range(n_steps - 1):
+        next_rate = min(1.15, max(0.85, rates[-1] + rng.uniform(-0.02, 0.02)))
+        rates.append(next_rate)
+        if i % 250 == 0:
+            rates[-1] = 1.03
+    return rates
+
+
+@contextlib.contextmanager
+def suppress_output():
+    """Send everything printed inside the block to /dev/null."""
+    with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink):
+        yield
+
+
+def bank_state_from_payload(round_data: Dict) -> Dict:
+    """Build the ``bank_state`` callback argument the same way the client does."""
+    return {
+        "gold_income_per_round": round_data["remainder_gold_income"],
+        "bank_interest_per_round": round_data["remainder_bank_interest"],
+        "bank_limit_per_round": round_data["remainder_bank_limit"],
+    }
+
+
+class LocalAuctionGame:
+    """
+    One game between named bid callbacks.
+
+    ``agents`` maps an agent id to a callback with the usual signature
+    ``(agent_id, current_round, states, auctions, prev_auctions, bank_state)``.
+    With a ``seed`` both the auction house and the global ``random`` /
+    ``np.random`` generators used by the agents are seeded, so a game can be
+    replayed exactly. ``quiet`` swallows everything the agents print.
+    """
+
+    def __init__(
+        self,
+        agents: Dict[str, Callable],
+        num_rounds: int = 100,
+        seed: Optional[int] = None,
+        quiet: bool = True,
+        record: bool = False,
+        auctions_per_agent: float = 1.5,
+        gold_back_fraction: float = 0.6,
+    ):
+        self.agents = agents
+        self.num_rounds = num_rounds
+        self.seed = seed
+        self.quiet = quiet
+        self.record = record
+        self.auctions_per_agent = auctions_per_agent
+        self.gold_back_fraction = gold_back_fraction
+
+        self.rng = random.Random(seed)
+        self.states = {a_id: {"gold": 0, "points": 0} for a_id in agents}
+        self.gold_income_per_round = generate_gold_random_walk(self.rng, num_rounds)
+        self.bank_limit_per_round = bank_limit_random_walk(self.rng, num_rounds)
+        self.bank_interest_per_round = bank_interest_random_walk(self.rng, num_rounds)
+
+        self.round_counter = 0
+        self.auction_counter = 1
+        self.current_auctions: Dict[str, Dict] = {}
+        self.current_rolls: Dict[str, int] = {}
+        self.current_bids = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.history: List[Dict] = []
+
+    def _generate_auctions(self):
+        auctions, rolls = {}, {}
+        indices = list(range(len(DIE_SIZES)))
+        n_auctions = int(math.ceil(self.auctions_per_agent * len(self.states)))
+        for _ in range(n_auctions):
+            i = self.rng.choices(indices, weights=DIE_PROB, k=1)[0]
+            a = {
+                "die": DIE_SIZES[i],
+                "num": self.rng.randint(1, MAX_N_DIE[i]),
+                "bonus": self.rng.randint(MIN_BONUS[i], MAX_BONUS[i]),
+            }
+            auction_id = "a{}".format(self.auction_counter)
+            self.auction_counter += 1
+            auctions[auction_id] = a
+            rolls[auction_id] = (
+                sum(self.rng.randint(1, a["die"]) for _ in range(a["num"])) + a["bonus"]
+            )
+        return auctions, rolls
+
+    def prepare_round(self) -> Dict:
+        """Pay interest and income, open new auctions and return the round payload."""
+        prev_auctions, prev_bids, prev_rolls = (
+            self.current_auctions,
+            self.current_bids,
+            self.current_rolls,
+        )
+        self.current_bids = defaultdict(list)
+        self.current_auctions, self.current_rolls = self._generate_auctions()
+
+        rc = self.round_counter
+        limit = self.bank_limit_per_round[rc]
+        interest_rate = self.bank_interest_per_round[rc]
+        for state in self.states.values():
+            state["gold"] += int(min(state["gold"], limit) * interest_rate)
+            state["gold"] += self.gold_income_per_round[rc]
+
+        out_prev = {}
+        for auction_id, info in prev_auctions.items():
+            bids = sorted(prev_bids[auction_id], key=lambda x: x[1], reverse=True)
+            out_prev[auction_id] = dict(info)
+            out_prev[auction_id]["reward"] = prev_rolls[auction_id]
+            out_prev[auction_id]["bids"] = [{"a_id": a, "gold": g} for a, g in bids]
+
+        round_data = {
+            "round": rc,
+            "states": self.states,
+            "auctions": self.current_auctions,
+            "prev_auctions": out_prev,
+            "remainder_gold_income": self.gold_income_per_round[rc + 1 :],
+            "remainder_bank_limit": self.bank_limit_per_round[rc + 1 :],
+            "remainder_bank_interest": self.bank_interest_per_round[rc + 1 :],
+        }
+        self.round_counter += 1
+        return round_data
+
+    def register_bid(self, a_id: str, auction_id: str, gold) -> None:
+        if auction_id not in self.current_auctions:
+            return
+        try:
+            gold = int(gold)
+        except (TypeError, ValueError, OverflowError):
+            return
+        if gold < 1 or self.states[a_id]["gold"] < gold:
+            return
+        self.current_bids[auction_id].append((a_id, gold))
+        self.states[a_id]["gold"] -= gold
+
+    def process_all_bids(self) -> None:
+        for auction_id, bids in self.current_bids.items():
+            if not bids:
+                continue
+            win_amount = max(g for _, g in bids)
+            for a_id, gold in bids:
+                if gold == win_amount:
+                    self.states[a_id]["points"] += self.current_rolls[auction_id]
+                else:
+                    self.states[a_id]["gold"] += int(
+                        math.floor(gold * self.gold_back_fraction)
+                    )
+
+    def play_round(self) -> Dict:
+        """Run one round: broadcast the payload and collect every agent's bids."""
+        round_data = self.prepare_round()
+        payload = json.dumps(round_data)
+        if self.record:
+            self.history.append(json.loads(payload))
+
+        for a_id, callback in self.agents.items():
+            view = json.loads(payload)
+            try:
+                bids = callback(
+                    a_id,
+                    view["round"],
+                    view["states"],
+                    view["auctions"],
+                    view["prev_auctions"],
+                    bank_state_from_payload(view),
+                )
+            except Exception:
+                self.errors[a_id] += 1
+                continue
+            for auction_id, gold in (bids or {}).items():
+                self.register_bid(a_id, auction_id, gold)
+        return round_data
+
+    def run(self) -> Dict[str, Dict[str, int]]:
+        """Play all rounds and return the final ``states``."""
+        if self.seed is not None:
+            random.seed(self.seed)
+            np.random.seed(self.seed % 2**32)
+
+        with suppress_output() if self.quiet else contextlib.nullcontext():
+            for r in range(self.num_rounds):
+                if r > 0:
+                    # The server never resolves bids sent in reply to the last round.
+                    self.process_all_bids()
+                self.play_round()
+        return self.states
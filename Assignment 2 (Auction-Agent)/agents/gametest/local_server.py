@@ -0,0 +1,221 @@
+"""
+Local websocket stand-in for the dnd_auction_game server.
+
+Speaks the same protocol as ``AuctionGameClient``: agents connect to
+``ws://host:port/ws/<token>``, send their agent info as JSON, then receive
+one round payload per round and answer with a JSON dict of bids. The rules
+come from ``local_game.LocalAuctionGame``. Instead of the fixed one second
+tick a round ends as soon as every agent has answered (or ``round_timeout``
+passes), so games run as fast as the agents do.
+
+Clients that send ``"encoding": "delta"`` in their agent info get compact
+delta frames (see ``delta_protocol``); everybody else gets the usual full
+payload. The server counts the bytes sent in each mode.
+
+A reply that arrives after its round timed out must not be taken as the
+bids of the next round. Delta clients tag every reply with its round
+(``{"round": r, "bids": {...}}``) and the server drops tags that do not
+match. Plain clients answer every payload exactly once and in order, so the
+server counts the rounds a connection missed and discards that many replies
+before it accepts bids again.
+
+Usage:
+    python local_server.py --agents 4 --rounds 200
+    # then start 4 agents against localhost, e.g. with DeltaAuctionGameClient
+"""
+
+import argparse
+import asyncio
+import json
+from typing import Dict, List, Optional
+
+import websockets
+
+from delta_protocol import AgentTable, DeltaEncoder, pack_prev_auctions
+from local_game import LocalAuctionGame
+
+
+class _Connection:
+    def __init__(self, ws, info: Dict):
+        self.ws = ws
+        self.a_id = info["a_id"]
+        self.name = info.get("name", self.a_id)
+        self.delta = info.get("encoding") == "delta"
+        self.encoder: Optional[DeltaEncoder] = None
+        self.missed = 0   # untagged replies still owed for timed-out rounds
+
+
+class LocalGameServer:
+    """
+    Waits for ``num_agents`` connections on ``/ws/<token>``, then plays one
+    game of ``num_rounds`` rounds and closes every connection.
+    """
+
+    def __init__(
+        self,
+        num_agents: int,
+        num_rounds: int = 100,
+        host: str = "localhost",
+        port: int = 8000,
+        token: str = "play123",
+        seed: Optional[int] = None,
+        round_timeout: float = 5.0,
+    ):
+        self.num_agents = num_agents
+        self.num_rounds = num_rounds
+        self.host = host
+        self.port = port
+        self.token = token
+        self.seed = seed
+        self.round_timeout = round_timeout
+
+        self.connections: List[_Connection] = []
+        self.table = AgentTable()
+        self.bytes_sent = {"full": 0, "delta": 0}
+        self.frames_sent = {"full": 0, "delta": 0}
+        self.game: Optional[LocalAuctionGame] = None
+        self._ready = asyncio.Event()
+        self._done = asyncio.Event()
+
+    async def _handler(self, ws):
+        request = getattr(ws, "request", None)
+        path = request.path if request is not None else ws.path
+        if path != "/ws/{}".format(self.token) or self._ready.is_set():
+            await ws.close(code=1008, reason="unknown token or game already running")
+            return
+
+        info = json.loads(await ws.recv())
+        if any(c.a_id == info["a_id"] for c in self.connections):
+            await ws.close(code=1008, reason="duplicate agent id")
+            return
+
+        conn = _Connection(ws, info)
+        if conn.delta:
+            conn.encoder = DeltaEncoder(self.table)
+        self.connections.append(conn)
+        print("agent joined: {} ({}, {})".format(
+            conn.name, conn.a_id, "delta" if conn.delta else "full"))
+        if len(self.connections) >= self.num_agents:
+            self._ready.set()
+
+        # Keep the connection open until the game is over.
+        await self._done.wait()
+
+    async def _send_round(self, round_data: Dict) -> None:
+        full_text = None
+        packed_prev = None
+        bank_schedule = {
+            "gold_income": self.game.gold_income_per_round,
+            "bank_limit": self.game.bank_limit_per_round,
+            "bank_interest": self.game.bank_interest_per_round,
+        }
+
+        sends = []
+        for conn in self.connections:
+            if conn.delta:
+                if packed_prev is None:
+                    packed_prev = pack_prev_auctions(round_data["prev_auctions"], self.table)
+                text = conn.encoder.encode(round_data, bank_schedule, packed_prev)
+                mode = "delta"
+            else:
+                if full_text is None:
+                    full_text = json.dumps(round_data)
+                text = full_text
+                mode = "full"
+            self.bytes_sent[mode] += len(text)
+            self.frames_sent[mode] += 1
+            sends.append(conn.ws.send(text))
+        await asyncio.gather(*sends, return_exceptions=True)
+
+    async def _collect_bids(self, round_idx: int) -> None:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.round_timeout
+
+        async def receive(conn):
+            while True:
+                try:
+                    raw = await asyncio.wait_for(conn.ws.recv(), max(0.0, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    conn.missed += 1
+                    return
+                except websockets.exceptions.ConnectionClosed:
+                    return
+                try:
+                    reply = json.loads(raw)
+                except ValueError:
+                    reply = None
+
+                if conn.delta:
+                    if not isinstance(reply, dict) or reply.get("round") != round_idx:
+                        continue  # late answer to an earlier round
+                    bids = reply.get("bids")
+                elif conn.missed > 0:
+                    conn.missed -= 1
+                    continue
+                else:
+                    bids = reply
+                break
+
+            if isinstance(bids, dict):
+                for auction_id, gold in bids.items():
+                    self.game.register_bid(conn.a_id, auction_id, gold)
+
+        await asyncio.gather(*(receive(c) for c in self.connections))
+
+    async def play(self) -> Dict[str, Dict[str, int]]:
+        await self._ready.wait()
+        agents = {c.a_id: None for c in self.connections}
+        self.game = LocalAuctionGame(agents, num_rounds=self.num_rounds, seed=self.seed)
+
+        for r in range(self.num_rounds):
+            if r > 0:
+                self.game.process_all_bids()
+            round_data = self.game.prepare_round()
+            await self._send_round(round_data)
+            if r < self.num_rounds - 1:
+                await self._collect_bids(round_data["round"])
+
+        await asyncio.gather(*(c.ws.close() for c in self.connections), return_exceptions=True)
+        self._done.set()
+        return self.game.states
+
+    async def serve(self) -> Dict[str, Dict[str, int]]:
+        async with websockets.serve(self._handler, self.host, self.port, max_size=None):
+            print("waiting for {} agents on ws://{}:{}/ws/{}".format(
+                self.num_agents, self.host, self.port, self.token))
+            return await self.play()
+
+    def report(self) -> None:
+        names = {c.a_id: c.name for c in self.connections}
+        ranked = sorted(self.game.states.items(), key=lambda kv: kv[1]["points"], reverse=True)
+        for a_id, s in ranked:
+            print("{:<24s} {:>8d} points {:>10d} gold".format(names[a_id], s["points"], s["gold"]))
+        for mode in ("full", "delta"):
+            if self.frames_sent[mode]:
+                print("{:<5s} frames: {:6d}  bytes: {:10d}  ({:.0f} bytes/frame)".format(
+                    mode, self.frames_sent[mode], self.bytes_sent[mode],
+                    self.bytes_sent[mode] / self.frames_sent[mode]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the auction game server")
+    parser.add_argument("--agents", type=int, required=True, help="number of agents to wait for")
+    parser.add_argument("--rounds", type=int, default=100)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--token", default="play123")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--round-timeout", type=float, default=5.0)
+    args = parser.parse_args()
+
+    server = LocalGameServer(
+        num_agents=args.agents,
+        num_rounds=args.rounds,
+        host=args.host,
+        port=args.port,
+        token=args.token,
+        seed=args.seed,
+        round_timeout=args.round_timeout,
+    )
+    asyncio.run(server.serve())
+    server.report()
@@ -3,6 +3,7 @@ import os
 import numpy as np
 
 from dnd_auction_game import AuctionGameClient
+from profiling import maybe_profile
 
 MIN_START_GPP = 60
 
@@ -198,7 +199,7 @@ if __name__ == "__main__":
         host=host, agent_name=agent_name, player_id=player_id, port=port
     )
     try:
-        game.run(jamie_dimon)
+        game.run(maybe_profile(jamie_dimon, "magnus"))
     except KeyboardInterrupt:
         print("<interrupt - shutting down>")
 
@@ -1,5 +1,6 @@
 import os, random, statistics
 from dnd_auction_game import AuctionGameClient
+from profiling import maybe_profile
 
 AVG = {2: 1.5, 3: 2.0, 4: 2.5, 6: 3.5, 8: 4.5, 10: 5.5, 12: 6.5, 20: 10.5}
 
@@ -11,11 +12,27 @@ HARD_CAP = int(os.getenv("HARD_CAP", "4000"))  # absolute Kappe pro Auktion
 EPSILON = float(os.getenv("EPSILON", "0.12"))  # Zufallsanteil
 TOP_K = int(os.getenv("TOP_K", "3"))  # auf wie viele Auktionen verteilen
 EMA_ALPHA = float(os.getenv("EMA_ALPHA", "0.15"))  # Glättung für clearing price
+CP = float(os.getenv("CP", "30.0"))  # Startvermutung, z.B. aus game_analytics priors
 
 
 class MarketAgent:
-    def __init__(self):
-        self.cp = 30.0  # Startvermutung: Gold pro Punkt (wird online gelernt)
+    def __init__(
+        self,
+        aggression: float = AGGRESSION,
+        spend_frac: float = SPEND_FRAC,
+        hard_cap: int = HARD_CAP,
+        epsilon: float = EPSILON,
+        top_k: int = TOP_K,
+        ema_alpha: float = EMA_ALPHA,
+        cp: float = CP,
+    ):
+        self.cp = cp  # Startvermutung: Gold pro Punkt (wird online gelernt)
+        self.aggression = aggression
+        self.spend_frac = spend_frac
+        self.hard_cap = hard_cap
+        self.epsilon = epsilon
+        self.top_k = top_k
+        self.ema_alpha = ema_alpha
 
     def update_cp(self, prev_auctions: dict):
         samples = []
@@ -27,7 +44,7 @@ class MarketAgent:
                 samples.append(win / max(1, r))
         if samples:
             est = statistics.median(samples)  # robust
-            self.cp = (1 - EMA_ALPHA) * self.cp + EMA_ALPHA * est
+            self.cp = (1 - self.ema_alpha) * self.cp + self.ema_alpha * est
 
     def decide(
         self, agent_id, current_round, states, auctions, prev_auctions, bank_state
@@ -37,7 +54,7 @@ class MarketAgent:
         self.update_cp(prev_auctions)
 
         # Budget für diese Runde
-        round_budget = min(gold, int(gold * SPEND_FRAC))
+        round_budget = min(gold, int(gold * self.spend_frac))
 
         scored = []
         for a_id, a in auctions.items():
@@ -49,7 +66,7 @@ class MarketAgent:
 
         # Top-K nach bestem EV/Preis
         scored.sort(reverse=True)
-        targets = scored[:TOP_K]
+        targets = scored[: self.top_k]
 
         bids = {}
         if not targets:
@@ -57,13 +74,13 @@ class MarketAgent:
 
         per = max(1, round(round_budget / len(targets)))
         for _, ev, a_id in targets:
-            base = ev * self.cp * AGGRESSION
-            bid = int(min(base, HARD_CAP, per))
+            base = ev * self.cp * self.aggression
+            bid = int(min(base, self.hard_cap, per))
             # Unvorhersagbar machen
-            jitter = int(random.uniform(-EPSILON, EPSILON) * max(1, bid))
+            jitter = int(random.uniform(-self.epsilon, self.epsilon) * max(1, bid))
             bid = max(1, bid + jitter)
             # kleine Chance blind zu „hässlichen“ Items zu springen
-            if random.random() < (EPSILON / 4):
+            if random.random() < (self.epsilon / 4):
                 bid = max(1, int(bid * random.uniform(0.6, 1.4)))
             bids[a_id] = bid
 
@@ -87,7 +104,7 @@ if __name__ == "__main__":
         host=host, agent_name=agent_name, player_id=player_id, port=port
     )
     try:
-        game.run(make_bid)
+        game.run(maybe_profile(make_bid, "maxi"))
     except KeyboardInterrupt:
         print("<interrupt - shutting down>")
 
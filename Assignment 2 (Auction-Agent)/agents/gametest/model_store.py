@@ -0,0 +1,208 @@
+"""
+Append-only model store for agent training runs.
+
+Every run is one JSON line in the store file. A small sidecar index next to
+it remembers the best record (highest ``bestU``) and the latest record
+marked ``"current": true``, so loading a theta never needs to scan the
+history. Appends take an exclusive file lock (``flock`` on Unix,
+``msvcrt.locking`` on Windows), which makes the store safe to share between
+parallel self-play processes.
+"""
+
+import json
+import os
+import time
+import warnings
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+try:
+    import msvcrt
+except ImportError:  # everything but Windows
+    msvcrt = None
+
+
+DEFAULT_MODEL_PATH = os.environ.get(
+    "FORTUNA_MODEL_PATH",
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        "fortuna_model.jsonl",
+    ),
+)
+
+
+@contextmanager
+def locked(path: str) -> Iterator[None]:
+    """
+    Hold an exclusive lock on ``path + ".lock"`` for the duration of the block.
+    """
+    if fcntl is not None:
+        with open(path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+    elif msvcrt is not None:
+        with open(path + ".lock", "a+") as lock_file:
+            # msvcrt locks a byte range from the current position; always byte 0
+            lock_file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # LK_LOCK gives up after ~10 s; keep waiting
+                    time.sleep(0.1)
+            try:
+                yield
+            finally:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        _warn_unlocked()
+        yield
+
+
+_warned_unlocked = False
+
+
+def _warn_unlocked() -> None:
+    global _warned_unlocked
+    if not _warned_unlocked:
+        _warned_unlocked = True
+        warnings.warn(
+            "no file locking on this platform: concurrent writers can corrupt the model store",
+            RuntimeWarning,
+        )
+
+
+def write_json_atomic(path: str, data) -> None:
+    """
+    Write ``data`` as JSON to ``path`` so readers never see a half written file.
+    """
+    tmp_path = "{}.tmp{}".format(path, os.getpid())
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+class ModelStore:
+    """
+    JSONL store of run records with an O(1) lookup of the best record.
+
+    ``best()`` ranks records by ``score_key``. Records of different kinds do
+    not share a comparable score (the agent logs the predicted ``bestU`` of a
+    game, the trainer the realized score of a theta), so a producer that
+    wants its record served regardless appends it with ``"current": true``;
+    ``current()`` returns the latest such record and falls back to ``best()``.
+
+    The sidecar index holds the best and current records and the size of the
+    store file it has seen. If the store grew without the index being updated (e.g. the
+    file was appended to by hand) only the unseen tail is scanned.
+    """
+
+    def __init__(self, path: Optional[str] = None, score_key: str = "bestU"):
+        self.path = path or DEFAULT_MODEL_PATH
+        self.index_path = self.path + ".idx"
+        self.score_key = score_key
+
+    def append(self, record: Dict) -> None:
+        """Append one record and update the best-record index."""
+        line = (json.dumps(record) + "\n").encode("utf-8")
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+
+        with locked(self.path):
+            index = self._read_index()
+            size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+            if index["size"] != size:
+                index = self._refresh_index(index)
+
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+
+            best = index["best"]
+            if best is None or record[self.score_key] > best[self.score_key]:
+                best = record
+            current = record if record.get("current") else index.get("current")
+            write_json_atomic(
+                self.index_path,
+                {"best": best, "current": current, "size": os.path.getsize(self.path)},
+            )
+
+    def best(self) -> Optional[Dict]:
+        """Return the record with the highest score, or None if the store is empty."""
+        return self._fresh_index()["best"]
+
+    def current(self) -> Optional[Dict]:
+        """Return the latest record marked current, else the best record."""
+        index = self._fresh_index()
+        return index.get("current") or index["best"]
+
+    def _fresh_index(self) -> Dict:
+        index = self._read_index()
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        if index["size"] == size:
+            return index
+
+        # The index is stale - bring it up to date under the lock.
+        with locked(self.path):
+            return self._refresh_index(self._read_index())
+
+    def records(self) -> List[Dict]:
+        """Return every record in append order."""
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, "r") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def import_json_array(self, legacy_path: str) -> int:
+        """
+        Append all records of a legacy ``fortuna_model.json`` array file.
+        Returns the number of imported records.
+        """
+        with open(legacy_path, "r") as f:
+            content = f.read()
+        records = json.loads(content) if content.strip() else []
+        for record in records:
+            self.append(record)
+        return len(records)
+
+    def _read_index(self) -> Dict:
+        try:
+            with open(self.index_path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"best": None, "current": None, "size": 0}
+
+    def _refresh_index(self, index: Dict) -> Dict:
+        if not os.path.exists(self.path):
+            return {"best": None, "current": None, "size": 0}
+
+        size = os.path.getsize(self.path)
+        start = index["size"] if index["size"] <= size else 0
+        best = index["best"] if start > 0 else None
+        current = index.get("current") if start > 0 else None
+
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if best is None or record[self.score_key] > best[self.score_key]:
+                    best = record
+                if record.get("current"):
+                    current = record
+
+        index = {"best": best, "current": current, "size": size}
+        write_json_atomic(self.index_path, index)
+        return index
@@ -0,0 +1,363 @@
+"""
+Parallel hyperparameter search for agent parameters.
+
+A candidate parameter set is scored by playing seeded local games
+(``local_game.LocalAuctionGame``) against a fixed pool of opponents; the
+score of one game is the candidate's points minus the best rival's points.
+Games are spread over a process pool, candidates that are clearly losing
+against the incumbent are dropped early, and every (candidate, seed) result
+is cached on disk so repeated searches never replay a game.
+
+Usage:
+    python param_search.py maxi --method halving --candidates 32 --seeds 8
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from agent_pool import make_agent
+from local_game import LocalAuctionGame
+from model_store import locked
+
+
+# A space maps a parameter name to one of:
+#   (lo, hi)            float, uniform
+#   ("int", lo, hi)     int, uniform, inclusive
+#   ("log", lo, hi)     float, log-uniform
+#   [a, b, c]           one of the listed choices
+SEARCH_SPACES: Dict[str, Dict] = {
+    "maxi": {
+        "aggression": (0.5, 2.0),
+        "spend_frac": (0.05, 0.6),
+        "hard_cap": ("int", 500, 8000),
+        "epsilon": (0.0, 0.3),
+        "top_k": ("int", 1, 8),
+        "ema_alpha": (0.02, 0.5),
+    },
+    "victor2": {
+        "base_aggressiveness": (0.3, 1.0),
+        "min_bid": ("int", 1, 50),
+        "max_spend_fraction": (0.3, 1.0),
+        "risk_balance": (0.0, 1.0),
+        "min_aggr": (0.1, 0.5),
+        "max_aggr": (0.6, 1.0),
+        "lose_cashback_fraction": (0.4, 0.8),
+    },
+    "fortuna": {
+        "lambda_base": ("log", 0.002, 0.2),
+        "lambda_ramp": (0.0, 0.05),
+        "bid_step": ("int", 1, 50),
+    },
+    "mhmdmain": {
+        "top_fraction": (0.05, 1.0),
+    },
+}
+
+DEFAULT_OPPONENTS = [
+    "tiny_bid",
+    "rand_single",
+    "rand_walk",
+    "mhmdmain",
+    "ignacio",
+    "victor",
+    "victor2",
+    "maxi",
+    "fortuna",
+]
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "param_search_cache.jsonl"
+)
+
+
+############################################################################################
+#
+# Parameter spaces
+#
+############################################################################################
+
+
+def sample_params(space: Dict, rng: random.Random) -> Dict:
+    params = {}
+    for name, spec in space.items():
+        if isinstance(spec, list):
+            params[name] = rng.choice(spec)
+        elif spec[0] == "int":
+            params[name] = rng.randint(spec[1], spec[2])
+        elif spec[0] == "log":
+            params[name] = math.exp(rng.uniform(math.log(spec[1]), math.log(spec[2])))
+        else:
+            params[name] = rng.uniform(spec[0], spec[1])
+    return params
+
+
+def perturb_params(space: Dict, params: Dict, radius: float, rng: random.Random) -> Dict:
+    """Sample near ``params``; ``radius`` is a fraction of each parameter's range."""
+    out = {}
+    for name, spec in space.items():
+        value = params[name]
+        if isinstance(spec, list):
+            out[name] = rng.choice(spec) if rng.random() < radius else value
+        elif spec[0] == "int":
+            step = max(1, int(round(radius * (spec[2] - spec[1]))))
+            out[name] = min(spec[2], max(spec[1], value + rng.randint(-step, step)))
+        elif spec[0] == "log":
+            lo, hi = math.log(spec[1]), math.log(spec[2])
+            x = math.log(value) + rng.gauss(0.0, radius * (hi - lo))
+            out[name] = math.exp(min(hi, max(lo, x)))
+        else:
+            lo, hi = spec
+            out[name] = min(hi, max(lo, value + rng.gauss(0.0, radius * (hi - lo))))
+    return out
+
+
+############################################################################################
+#
+# Game evaluation and cache
+#
+############################################################################################
+
+
+def play_game(job: Tuple) -> float:
+    """Play one seeded game and return the candidate's margin over the best rival."""
+    agent_name, params, opponents, seed, num_rounds = job
+
+    # Seed before building agents - some of them draw random numbers in __init__.
+    random.seed(seed)
+    np.random.seed(seed % 2**32)
+    agents = {"candidate": make_agent(agent_name, **params)}
+    for i, opponent in enumerate(opponents):
+        agents["{}_{}".format(opponent, i)] = make_agent(opponent)
+
+    states = LocalAuctionGame(agents, num_rounds=num_rounds, seed=seed).run()
+    mine = states["candidate"]["points"]
+    best_rival = max(s["points"] for a_id, s in states.items() if a_id != "candidate")
+    return float(mine - best_rival)
+
+
+class ResultCache:
+    """Append-only JSONL cache of game scores keyed on (agent, params, opponents, seed, rounds)."""
+
+    def __init__(self, path: Optional[str] = DEFAULT_CACHE_PATH):
+        self.path = path
+        self.scores: Dict[str, float] = {}
+        if path and os.path.exists(path):
+            with open(path, "r") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.scores[entry["key"]] = entry["score"]
+
+    @staticmethod
+    def key(job: Tuple) -> str:
+        return hashlib.sha1(json.dumps(job, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def get(self, job: Tuple) -> Optional[float]:
+        return self.scores.get(self.key(job))
+
+    def put_many(self, results: List[Tuple[Tuple, float]]) -> None:
+        lines = []
+        for job, score in results:
+            k = self.key(job)
+            self.scores[k] = score
+            lines.append(json.dumps({"key": k, "job": job, "score": score}) + "\n")
+        if self.path and lines:
+            with locked(self.path):
+                with open(self.path, "a") as f:
+                    f.writelines(lines)
+
+
+class Candidate:
+    def __init__(self, params: Dict):
+        self.params = params
+        self.scores: List[float] = []
+        self.stopped = False
+
+    @property
+    def mean(self) -> float:
+        return float(np.mean(self.scores)) if self.scores else float("-inf")
+
+    @property
+    def stderr(self) -> float:
+        if len(self.scores) < 2:
+            return float("inf")
+        return float(np.std(self.scores, ddof=1) / math.sqrt(len(self.scores)))
+
+
+############################################################################################
+#
+# Search
+#
+############################################################################################
+
+
+class ParamSearch:
+    """
+    Scores parameter sets for one agent over many seeded games in parallel.
+
+    ``seeds`` fixes the games every candidate is measured on, so candidates
+    are always compared on the same auctions (common random numbers).
+    """
+
+    def __init__(
+        self,
+        agent_name: str,
+        space: Optional[Dict] = None,
+        opponents: Sequence[str] = DEFAULT_OPPONENTS,
+        num_rounds: int = 100,
+        seeds: int = 8,
+        workers: Optional[int] = None,
+        cache_path: Optional[str] = DEFAULT_CACHE_PATH,
+        stop_z: float = 2.0,
+        rng_seed: int = 0,
+    ):
+        self.agent_name = agent_name
+        self.space = space if space is not None else SEARCH_SPACES[agent_name]
+        self.opponents = list(opponents)
+        self.num_rounds = num_rounds
+        self.seeds = list(range(seeds))
+        self.workers = workers or os.cpu_count() or 1
+        self.cache = ResultCache(cache_path)
+        self.stop_z = stop_z
+        self.rng = random.Random(rng_seed)
+        self.games_played = 0
+
+    def _job(self, params: Dict, seed: int) -> Tuple:
+        return (self.agent_name, params, self.opponents, seed, self.num_rounds)
+
+    def evaluate(self, candidates: List[Candidate], n_seeds: int) -> None:
+        """Bring every non stopped candidate up to ``n_seeds`` scored games."""
+        pending: List[Tuple[Candidate, Tuple]] = []
+        for c in candidates:
+            if c.stopped:
+                continue
+            for seed in self.seeds[len(c.scores) : n_seeds]:
+                pending.append((c, self._job(c.params, seed)))
+
+        todo = [job for _, job in pending if self.cache.get(job) is None]
+        if todo:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                scores = list(pool.map(play_game, todo, chunksize=max(1, len(todo) // (4 * self.workers))))
+            self.cache.put_many(list(zip(todo, scores)))
+            self.games_played += len(todo)
+
+        for c, job in pending:
+            c.scores.append(self.cache.get(job))
+
+    def _early_stop(self, candidates: List[Candidate]) -> None:
+        """Stop candidates whose optimistic score is still below the incumbent's mean."""
+        alive = [c for c in candidates if not c.stopped and len(c.scores) >= 2]
+        if not alive:
+            return
+        incumbent = max(alive, key=lambda c: c.mean)
+        for c in alive:
+            if c is not incumbent and c.mean + self.stop_z * c.stderr < incumbent.mean:
+                c.stopped = True
+
+    def _racing(self, candidates: List[Candidate], rung: int) -> List[Candidate]:
+        n = rung
+        while n < len(self.seeds):
+            self.evaluate(candidates, n)
+            self._early_stop(candidates)
+            n += rung
+        self.evaluate(candidates, len(self.seeds))
+        return candidates
+
+    def random_search(self, n_candidates: int, rung: int = 2) -> List[Candidate]:
+        candidates = [Candidate(sample_params(self.space, self.rng)) for _ in range(n_candidates)]
+        return self._racing(candidates, rung)
+
+    def fortuna_search(
+        self,
+        n_candidates: int,
+        batches: int = 4,
+        radius: float = 0.3,
+        shrink: float = 0.5,
+        rung: int = 2,
+    ) -> List[Candidate]:
+        """
+        Fortuna with a shrinking search box: the first batch is uniform, later
+        batches sample half around the best candidate so far and half uniformly.
+        """
+        per_batch = max(1, n_candidates // batches)
+        all_candidates: List[Candidate] = []
+        best: Optional[Candidate] = None
+        for _ in range(batches):
+            batch = []
+            for i in range(per_batch):
+                if best is not None and i % 2 == 0:
+                    params = perturb_params(self.space, best.params, radius, self.rng)
+                else:
+                    params = sample_params(self.space, self.rng)
+                batch.append(Candidate(params))
+            if best is not None:
+                batch.append(best)
+            self._racing(batch, rung)
+            all_candidates.extend(c for c in batch if c is not best)
+            finished = [c for c in batch if not c.stopped]
+            best = max(finished or batch, key=lambda c: c.mean)
+            radius *= shrink
+        if best not in all_candidates:
+            all_candidates.append(best)
+        return all_candidates
+
+    def successive_halving(self, n_candidates: int, eta: int = 2, min_seeds: int = 1) -> List[Candidate]:
+        candidates = [Candidate(sample_params(self.space, self.rng)) for _ in range(n_candidates)]
+        alive = candidates
+        n_seeds = min_seeds
+        while True:
+            self.evaluate(alive, n_seeds)
+            if len(alive) <= 1 or n_seeds >= len(self.seeds):
+                break
+            alive.sort(key=lambda c: c.mean, reverse=True)
+            keep = max(1, len(alive) // eta)
+            for c in alive[keep:]:
+                c.stopped = True
+            alive = alive[:keep]
+            n_seeds = min(len(self.seeds), n_seeds * eta)
+        return candidates
+
+    def run(self, method: str, n_candidates: int) -> List[Candidate]:
+        """Run a search and return all candidates, best full evaluations first."""
+        if method == "random":
+            candidates = self.random_search(n_candidates)
+        elif method == "fortuna":
+            candidates = self.fortuna_search(n_candidates)
+        elif method == "halving":
+            candidates = self.successive_halving(n_candidates)
+        else:
+            raise ValueError("method must be 'random', 'fortuna' or 'halving'")
+        return sorted(
+            candidates, key=lambda c: (not c.stopped, len(c.scores), c.mean), reverse=True
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("agent", choices=sorted(SEARCH_SPACES))
+    parser.add_argument("--method", choices=["random", "fortuna", "halving"], default="halving")
+    parser.add_argument("--candidates", type=int, default=32)
+    parser.add_argument("--seeds", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--top", type=int, default=5)
+    args = parser.parse_args()
+
+    search = ParamSearch(
+        args.agent, num_rounds=args.rounds, seeds=args.seeds, workers=args.workers
+    )
+    ranked = search.run(args.method, args.candidates)
+
+    print("played {} new games ({} cached results)".format(
+        search.games_played, len(search.cache.scores) - search.games_played))
+    for c in ranked[: args.top]:
+        print("{:+9.1f} ± {:6.1f}  over {:2d} games  {}".format(
+            c.mean, c.stderr, len(c.scores), json.dumps(c.params)))
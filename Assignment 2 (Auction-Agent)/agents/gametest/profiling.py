@@ -0,0 +1,233 @@
+"""
+Opt-in profiling for agent scripts.
+
+Wrap the bid callback in an agent's ``__main__`` with ``maybe_profile``;
+nothing changes unless the ``AGENT_PROFILE`` environment variable is set:
+
+    AGENT_PROFILE=sample          sample the stack every 5 ms
+    AGENT_PROFILE=sample:1        ... every 1 ms
+    AGENT_PROFILE=cprofile        run cProfile on every 10th round
+    AGENT_PROFILE=cprofile:3      ... on every 3rd round
+
+``AGENT_PROFILE_DIR`` (default ``profiles``) and ``AGENT_PROFILE_PCT``
+(default 95) set the output directory and the latency percentile above
+which a round counts as slow.
+
+In sample mode a background thread reads the stack of the thread running
+the game via ``sys._current_frames`` for the whole game, so time spent in
+the client between callbacks (JSON decoding, waiting on the socket) shows
+up too, under ``[between rounds]``. At exit the profiler writes, per game:
+
+- ``<name>_<time>.collapsed``: collapsed stacks (``a;b;c count``), ready
+  for flamegraph.pl or speedscope,
+- ``<name>_<time>.txt``: round latency percentiles, the top-N functions by
+  self and inclusive samples, and every slow round with its stacks.
+
+cProfile mode writes the ``.prof`` file, caller;callee pairs in the
+collapsed file and the same summary.
+"""
+
+import atexit
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+
+def _frame_label(code) -> str:
+    return "{} ({}:{})".format(code.co_name, os.path.basename(code.co_filename), code.co_firstlineno)
+
+
+class AgentProfiler:
+    def __init__(
+        self,
+        name: str,
+        mode: str = "sample",
+        interval: float = 0.005,
+        every: int = 10,
+        out_dir: str = "profiles",
+        slow_percentile: float = 95.0,
+        top: int = 20,
+        max_depth: int = 64,
+    ):
+        if mode not in ("sample", "cprofile"):
+            raise ValueError("mode must be 'sample' or 'cprofile', got '{}'".format(mode))
+        self.name = name
+        self.mode = mode
+        self.interval = interval
+        self.every = max(1, every)
+        self.out_dir = out_dir
+        self.slow_percentile = slow_percentile
+        self.top = top
+        self.max_depth = max_depth
+
+        self.latencies: Dict[int, float] = {}
+        self.stacks: Dict[Optional[int], Counter] = defaultdict(Counter)
+        self.n_samples = 0
+        self._round: Optional[int] = None
+        self._target: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._cprofile_stats: Optional[pstats.Stats] = None
+        self._written = False
+
+    # -- sampling ------------------------------------------------------------------------
+
+    def _sample_loop(self) -> None:
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is None or self._target == me:
+                continue
+            labels = []
+            while frame is not None and len(labels) < self.max_depth:
+                labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            self.stacks[self._round][";".join(reversed(labels))] += 1
+            self.n_samples += 1
+
+    def _start_sampler(self) -> None:
+        self._target = threading.get_ident()
+        self._thread = threading.Thread(target=self._sample_loop, name="agent-profiler", daemon=True)
+        self._thread.start()
+
+    # -- wrapping ------------------------------------------------------------------------
+
+    def wrap(self, callback: Callable) -> Callable:
+        def profiled(agent_id, current_round, states, auctions, prev_auctions, bank_state):
+            if self.mode == "sample" and self._thread is None:
+                self._start_sampler()
+
+            profile = None
+            if self.mode == "cprofile" and current_round % self.every == 0:
+                profile = cProfile.Profile()
+
+            self._round = current_round
+            start = time.perf_counter()
+            try:
+                if profile is not None:
+                    return profile.runcall(
+                        callback, agent_id, current_round, states, auctions, prev_auctions, bank_state
+                    )
+                return callback(agent_id, current_round, states, auctions, prev_auctions, bank_state)
+            finally:
+                self.latencies[current_round] = time.perf_counter() - start
+                self._round = None
+                if profile is not None:
+                    self._add_cprofile(profile, current_round)
+
+        atexit.register(self.write_report)
+        return profiled
+
+    def _add_cprofile(self, profile: cProfile.Profile, current_round: int) -> None:
+        if self._cprofile_stats is None:
+            self._cprofile_stats = pstats.Stats(profile)
+        else:
+            self._cprofile_stats.add(profile)
+        # Caller;callee pairs weighted by microseconds, the most cProfile can tell about stacks.
+        for func, (_, _, tottime, _, callers) in pstats.Stats(profile).stats.items():
+            callee = "{} ({}:{})".format(func[2], os.path.basename(func[0]), func[1])
+            if not callers:
+                self.stacks[current_round][callee] += int(tottime * 1e6)
+            for caller, (_, _, caller_tt, _) in callers.items():
+                label = "{} ({}:{})".format(caller[2], os.path.basename(caller[0]), caller[1])
+                self.stacks[current_round]["{};{}".format(label, callee)] += int(caller_tt * 1e6)
+
+    # -- reporting -----------------------------------------------------------------------
+
+    def slow_rounds(self) -> List[int]:
+        if not self.latencies:
+            return []
+        threshold = np.percentile(list(self.latencies.values()), self.slow_percentile)
+        return sorted(r for r, t in self.latencies.items() if t > threshold)
+
+    def hotspots(self) -> List[tuple]:
+        """``(function, self samples, inclusive samples)``, top-N by self samples."""
+        own, inclusive = Counter(), Counter()
+        for per_round in self.stacks.values():
+            for stack, n in per_round.items():
+                frames = stack.split(";")
+                own[frames[-1]] += n
+                for f in set(frames):
+                    inclusive[f] += n
+        return [(f, n, inclusive[f]) for f, n in own.most_common(self.top)]
+
+    def write_report(self) -> Optional[str]:
+        if self._written:
+            return None
+        self._written = True
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+
+        os.makedirs(self.out_dir, exist_ok=True)
+        base = os.path.join(self.out_dir, "{}_{}".format(self.name, time.strftime("%Y%m%d_%H%M%S")))
+
+        total = Counter()
+        for r, per_round in self.stacks.items():
+            prefix = "[between rounds];" if r is None else ""
+            for stack, n in per_round.items():
+                total[prefix + stack] += n
+        with open(base + ".collapsed", "w") as f:
+            for stack, n in total.most_common():
+                f.write("{} {}\n".format(stack, n))
+
+        if self._cprofile_stats is not None:
+            self._cprofile_stats.dump_stats(base + ".prof")
+
+        with open(base + ".txt", "w") as f:
+            f.write(self._summary())
+        return base
+
+    def _summary(self) -> str:
+        out = io.StringIO()
+        lat = np.array(list(self.latencies.values())) * 1000.0
+        out.write("{}: {} rounds, mode {}\n".format(self.name, len(lat), self.mode))
+        if len(lat):
+            p50, p95, p99 = np.percentile(lat, [50, 95, 99])
+            out.write("round latency ms: p50 {:.2f}  p95 {:.2f}  p99 {:.2f}  max {:.2f}  total {:.0f}\n".format(
+                p50, p95, p99, lat.max(), lat.sum()))
+
+        unit = "samples" if self.mode == "sample" else "us"
+        out.write("\ntop {} functions ({} self / inclusive)\n".format(self.top, unit))
+        for func, own, incl in self.hotspots():
+            out.write("  {:>9d} {:>9d}  {}\n".format(own, incl, func))
+
+        if self.mode == "cprofile" and self._cprofile_stats is not None:
+            s = io.StringIO()
+            pstats.Stats(self._cprofile_stats, stream=s).sort_stats("cumulative").print_stats(self.top)
+            out.write("\n" + s.getvalue())
+
+        slow = self.slow_rounds()
+        out.write("\n{} rounds above p{:g}\n".format(len(slow), self.slow_percentile))
+        for r in slow:
+            out.write("round {}: {:.2f} ms\n".format(r, 1000.0 * self.latencies[r]))
+            for stack, n in self.stacks.get(r, Counter()).most_common(5):
+                out.write("    {:>6d}  {}\n".format(n, stack))
+        return out.getvalue()
+
+
+def maybe_profile(callback: Callable, name: str) -> Callable:
+    """Return ``callback`` unchanged, or profiled when ``AGENT_PROFILE`` is set."""
+    spec = os.environ.get("AGENT_PROFILE", "").strip()
+    if not spec:
+        return callback
+    mode, _, arg = spec.partition(":")
+    kwargs = {
+        "out_dir": os.environ.get("AGENT_PROFILE_DIR", "profiles"),
+        "slow_percentile": float(os.environ.get("AGENT_PROFILE_PCT", "95")),
+    }
+    if mode == "sample" and arg:
+        kwargs["interval"] = float(arg) / 1000.0
+    elif mode == "cprofile" and arg:
+        kwargs["every"] = int(arg)
+    profiler = AgentProfiler(name, mode=mode, **kwargs)
+    print("profiling {} ({}) -> {}".format(name, spec, kwargs["out_dir"]))
+    return profiler.wrap(callback)
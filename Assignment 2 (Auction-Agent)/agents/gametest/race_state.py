@@ -0,0 +1,174 @@
+"""
+Race model of the whole scoreboard for deciding how aggressive to be.
+
+``RaceState`` keeps numpy arrays of every agent's gold and points and, from
+one round to the next, estimates per agent:
+
+- points per round (EMA) and its volatility,
+- net gold spent per round (EMA), from the gold an agent should have had
+  after interest and income minus the gold it actually has,
+- remaining buying power: gold plus the income and interest still to come
+  according to ``bank_state``.
+
+From these it projects final scores as ``points + rate * R`` plus normal
+noise over the ``R`` remaining rounds, with every rate capped by what the
+agent can still afford at the market price per point, and estimates the
+probability of finishing first. ``compare`` does that for the current
+spending and for a more aggressive one that buys extra points at a premium
+over the market price, using the same preallocated normal draws for both.
+One update costs O(agents) plus a sort of the remaining bank limits.
+"""
+
+from typing import Dict, Optional
+
+import numpy as np
+
+
+class RaceState:
+    def __init__(
+        self,
+        ema_alpha: float = 0.2,
+        n_samples: int = 1024,
+        aggressive_factor: float = 1.5,
+        marginal_premium: float = 1.5,
+        seed: Optional[int] = None,
+    ):
+        self.ema_alpha = ema_alpha
+        self.n_samples = n_samples
+        self.aggressive_factor = aggressive_factor
+        self.marginal_premium = marginal_premium
+        self.rng = np.random.default_rng(seed)
+
+        self.ids = []
+        self.me = 0
+        self.gold = np.zeros(0)
+        self.points = np.zeros(0)
+        self.rate = np.zeros(0)
+        self.rate_var = np.zeros(0)
+        self.spend = np.zeros(0)
+        self.power = np.zeros(0)
+        self.rounds_left = 0
+        self.rounds_seen = 0
+        self._next_bank = None
+        self._z = np.empty((n_samples, 0))
+
+    def _resize(self, ids) -> None:
+        old = {a_id: i for i, a_id in enumerate(self.ids)}
+        take = np.array([old.get(a_id, -1) for a_id in ids], dtype=np.int64)
+        known = take >= 0
+
+        def remap(arr):
+            out = np.zeros(len(ids))
+            out[known] = arr[take[known]]
+            return out
+
+        self.gold, self.points = remap(self.gold), remap(self.points)
+        self.rate, self.rate_var, self.spend = remap(self.rate), remap(self.rate_var), remap(self.spend)
+        self.ids = list(ids)
+        self._z = np.empty((self.n_samples, len(ids)))
+
+    def update(self, agent_id: str, states: Dict, bank_state: Dict) -> None:
+        """Fold in one round of ``states``; call once per round before ``compare``."""
+        if list(states) != self.ids:
+            self._resize(list(states))
+        self.me = self.ids.index(agent_id)
+
+        n = len(self.ids)
+        gold = np.fromiter((s["gold"] for s in states.values()), dtype=np.float64, count=n)
+        points = np.fromiter((s["points"] for s in states.values()), dtype=np.float64, count=n)
+
+        if self.rounds_seen > 0 and self._next_bank is not None:
+            income, limit, interest = self._next_bank
+            expected_gold = self.gold + np.floor(np.minimum(self.gold, limit) * interest) + income
+            spent = np.maximum(expected_gold - gold, 0.0)
+            gained = points - self.points
+
+            a = self.ema_alpha if self.rounds_seen > 1 else 1.0
+            dev = gained - self.rate
+            self.rate += a * dev
+            self.rate_var = (1 - a) * (self.rate_var + a * dev * dev)
+            self.spend += a * (spent - self.spend)
+
+        self.gold, self.points = gold, points
+        self.rounds_seen += 1
+
+        incomes = np.asarray(bank_state.get("gold_income_per_round", []), dtype=np.float64)
+        limits = np.asarray(bank_state.get("bank_limit_per_round", []), dtype=np.float64)
+        rates = np.asarray(bank_state.get("bank_interest_per_round", []), dtype=np.float64)
+        self.rounds_left = len(incomes)
+        self._next_bank = (incomes[0], limits[0], rates[0]) if self.rounds_left else None
+
+        # Future interest if gold stayed put: sum_t rate_t * min(gold, limit_t),
+        # from prefix sums over the sorted limits instead of an agents x rounds grid.
+        if self.rounds_left:
+            order = np.argsort(limits)
+            lim, r = limits[order], rates[order]
+            below_sum = np.concatenate(([0.0], np.cumsum(lim * r)))
+            above_rate = np.concatenate((np.cumsum(r[::-1])[::-1], [0.0]))
+            k = np.searchsorted(lim, gold, side="right")
+            interest = below_sum[k] + gold * above_rate[k]
+        else:
+            interest = np.zeros(n)
+        self.power = gold + incomes.sum() + interest
+
+    @property
+    def price_per_point(self) -> float:
+        """Market gold per point, from everybody's spending and scoring rates."""
+        total_rate = self.rate.sum()
+        if total_rate <= 0:
+            return float("inf")
+        return max(1.0, float(self.spend.sum() / total_rate))
+
+    def _projected_rates(self) -> np.ndarray:
+        price = self.price_per_point
+        R = max(1, self.rounds_left)
+        cap = self.power / (price * R) if np.isfinite(price) else np.full(len(self.ids), np.inf)
+        return np.minimum(np.maximum(self.rate, 0.0), cap)
+
+    def win_probability(self, my_rate: Optional[float] = None) -> float:
+        """P(finishing strictly first), optionally with a different rate for us."""
+        return self.compare_rates([my_rate])[0]
+
+    def compare_rates(self, my_rates) -> list:
+        n = len(self.ids)
+        if n == 0:
+            return [0.0 for _ in my_rates]
+        R = self.rounds_left
+        rates = self._projected_rates()
+        sd = np.sqrt(np.maximum(self.rate_var, 1.0) * R)
+
+        # Same normals for every candidate rate, so differences are not noise.
+        self.rng.standard_normal(out=self._z)
+        final = self.points + rates * R + self._z * sd
+        others = np.delete(final, self.me, axis=1)
+        best_other = others.max(axis=1) if others.shape[1] else np.full(self.n_samples, -np.inf)
+
+        out = []
+        for my_rate in my_rates:
+            mine = final[:, self.me]
+            if my_rate is not None:
+                mine = mine + (my_rate - rates[self.me]) * R
+            out.append(float(np.mean(mine > best_other)))
+        return out
+
+    def compare(self) -> Dict[str, float]:
+        """Win probability now and when spending ``aggressive_factor`` times as much."""
+        me = self.me
+        price = self.price_per_point
+        R = max(1, self.rounds_left)
+        current = self._projected_rates()[me]
+        if not np.isfinite(price):
+            return dict(zip(("current", "aggressive"), self.compare_rates([None, None])))
+
+        extra_spend = min(
+            (self.aggressive_factor - 1.0) * max(self.spend[me], price),
+            max(0.0, self.power[me] / R - self.spend[me]),
+        )
+        aggressive = current + extra_spend / (price * self.marginal_premium)
+        p_now, p_aggr = self.compare_rates([None, aggressive])
+        return {"current": p_now, "aggressive": p_aggr}
+
+    def leader_gap(self) -> float:
+        """Our points minus the best rival's points."""
+        others = np.delete(self.points, self.me)
+        return float(self.points[self.me] - (others.max() if len(others) else 0.0))
@@ -2,6 +2,8 @@ import random
 import numpy as np
 from dnd_auction_game import AuctionGameClient
 import matplotlib.pyplot as plt
+from history import RingBuffer
+from profiling import maybe_profile
 
 # Constants
 TOTAL_ROUNDS = 1000 # IMPORTANT! don't forget to adapt!!!
@@ -11,10 +13,11 @@ N_ROUNDS_TRAINING = 10
 class BidPredictor:
     """Class to store opponent bid patterns and predict winning bids"""
 
-    def __init__(self, degree=2):
-        self.bid_history = []  # List of (average_reward, winning_bid) tuples
-        self.agent_bids = []
-        self.agent_winning_bids = []
+    def __init__(self, degree=2, history_size=4096):
+        # Rows of (average_reward, bid); only the latest history_size are kept
+        self.bid_history = RingBuffer(history_size, width=2)
+        self.agent_bids = RingBuffer(history_size, width=2)
+        self.agent_winning_bids = RingBuffer(history_size, width=2)
         self.coefficients = None
         self.degree = degree
 
@@ -36,8 +39,9 @@ class BidPredictor:
             # Not enough data, use heuristic
             return False
 
-        x = np.array([reward for reward, bid in self.bid_history])
-        y = np.array([bid for reward, bid in self.bid_history])
+        history = self.bid_history.view()
+        x = history[:, 0]
+        y = history[:, 1]
 
         # Using numpy polyfit (degree 1 = linear)
         self.coefficients = np.polyfit(x, y, self.degree)
@@ -170,22 +174,22 @@ def plot_learning_results(predictor: BidPredictor):
         print("No data to plot.")
         return
 
-    x = np.array([r for r, _ in predictor.bid_history])
-    y = np.array([b for _, b in predictor.bid_history])
+    x = predictor.bid_history[:, 0]
+    y = predictor.bid_history[:, 1]
 
     plt.figure(figsize=(8, 6))
     plt.scatter(x, y, color="blue", label="Observed bids", alpha=0.6)
 
     # Plot this agent's bids
     if predictor.agent_bids:
-        x_agent = np.array([r for r, _ in predictor.agent_bids])
-        y_agent = np.array([b for _, b in predictor.agent_bids])
+        x_agent = predictor.agent_bids[:, 0]
+        y_agent = predictor.agent_bids[:, 1]
         plt.scatter(x_agent, y_agent, color="green", label="Agent's bids", alpha=0.6, marker='x')
 
     # Plot this agent's bids
     if predictor.agent_winning_bids:
-        x_agent = np.array([r for r, _ in predictor.agent_winning_bids])
-        y_agent = np.array([b for _, b in predictor.agent_winning_bids])
+        x_agent = predictor.agent_winning_bids[:, 0]
+        y_agent = predictor.agent_winning_bids[:, 1]
         plt.scatter(x_agent, y_agent, color="orange", label="Agent's winning bids", alpha=0.6, marker='o')
 
     # Plot fitted polynomial curve if available
@@ -216,7 +220,7 @@ if __name__ == "__main__":
                              player_id=player_id,
                              port=port)
     try:
-        game.run(smart_bid)
+        game.run(maybe_profile(smart_bid, "raphael"))
     except KeyboardInterrupt:
         print("<interrupt - shutting down>")
 
@@ -0,0 +1,336 @@
+"""
+Ratings and leaderboard for local tournaments.
+
+Every entrant (an agent name plus its constructor parameters, e.g.
+``mhmdmain:top_fraction=0.3``) gets a multi-player Elo rating stored in a
+local SQLite file. A finished game counts as a round robin of pairwise
+results between its seats, ranked by points. Results are ingested in
+batches; each batch is one rating period, evaluated in a single numpy sweep
+over all games of the batch (grouped by table size) against the ratings at
+the start of the period, so the cost does not depend on how many games were
+played before. After every period the new rating of each entrant that played
+is appended to a history table, which gives the rating trajectory used to
+judge parameter changes.
+
+Usage:
+    python ratings.py play --games 200 --entrants tiny_bid mhmdmain mhmdmain:top_fraction=0.3
+    python ratings.py top
+    python ratings.py history mhmdmain:top_fraction=0.3
+"""
+
+import argparse
+import ast
+import json
+import os
+import random
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from agent_pool import make_agent
+from local_game import LocalAuctionGame
+
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ratings.sqlite")
+
+INITIAL_RATING = 1500.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    id INTEGER PRIMARY KEY,
+    key TEXT UNIQUE NOT NULL,
+    name TEXT NOT NULL,
+    params TEXT NOT NULL,
+    rating REAL NOT NULL,
+    games INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS players_rating ON players (rating DESC);
+CREATE TABLE IF NOT EXISTS periods (
+    id INTEGER PRIMARY KEY,
+    created REAL NOT NULL,
+    n_games INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    period INTEGER NOT NULL REFERENCES periods (id),
+    seed INTEGER,
+    num_rounds INTEGER
+);
+CREATE TABLE IF NOT EXISTS results (
+    game INTEGER NOT NULL REFERENCES games (id),
+    seat INTEGER NOT NULL,
+    player INTEGER NOT NULL REFERENCES players (id),
+    points INTEGER NOT NULL,
+    gold INTEGER NOT NULL,
+    PRIMARY KEY (game, seat)
+);
+CREATE INDEX IF NOT EXISTS results_player ON results (player);
+CREATE TABLE IF NOT EXISTS history (
+    player INTEGER NOT NULL REFERENCES players (id),
+    period INTEGER NOT NULL REFERENCES periods (id),
+    rating REAL NOT NULL,
+    games INTEGER NOT NULL,
+    PRIMARY KEY (player, period)
+);
+"""
+
+
+def entrant_key(name: str, params: Optional[Dict] = None) -> str:
+    """Canonical entrant id: ``name`` or ``name:a=1,b=0.5`` with sorted parameters."""
+    if not params:
+        return name
+    return "{}:{}".format(name, ",".join("{}={!r}".format(k, params[k]) for k in sorted(params)))
+
+
+def parse_entrant(spec: str) -> Tuple[str, Dict]:
+    """Inverse of ``entrant_key``: ``'maxi:top_k=2,aggression=1.5'`` -> ``('maxi', {...})``."""
+    name, _, rest = spec.partition(":")
+    params = {}
+    for item in filter(None, rest.split(",")):
+        k, _, v = item.partition("=")
+        try:
+            params[k.strip()] = ast.literal_eval(v.strip())
+        except (ValueError, SyntaxError):
+            params[k.strip()] = v.strip()
+    return name, params
+
+
+def elo_period(
+    ratings: np.ndarray,
+    games_played: np.ndarray,
+    seats: Sequence[np.ndarray],
+    points: Sequence[np.ndarray],
+    k: float = 24.0,
+    provisional_games: int = 10,
+) -> np.ndarray:
+    """
+    Rating change of every player for one period of multi-player games.
+
+    ``seats[g]`` holds the player indices of game ``g`` and ``points[g]`` their
+    scores. Each seat plays a virtual pairwise match against every other seat
+    of its game (win 1, draw 0.5); the update is ``K / (n - 1)`` times the sum
+    of (actual - expected). Players with few games move twice as fast.
+    """
+    delta = np.zeros_like(ratings)
+    by_size: Dict[int, List[int]] = {}
+    for g, s in enumerate(seats):
+        if len(s) > 1:
+            by_size.setdefault(len(s), []).append(g)
+
+    for n, games in by_size.items():
+        P = np.stack([seats[g] for g in games])  # (G, n)
+        S = np.stack([points[g] for g in games]).astype(np.float64)
+        R = ratings[P]
+        expected = 1.0 / (1.0 + 10.0 ** ((R[:, None, :] - R[:, :, None]) / 400.0))
+        actual = (S[:, :, None] > S[:, None, :]) + 0.5 * (S[:, :, None] == S[:, None, :])
+        # The diagonal contributes 0.5 - 0.5 and cancels out.
+        score = (actual - expected).sum(axis=2)
+        kf = np.where(games_played[P] < provisional_games, 2.0 * k, k)
+        np.add.at(delta, P, kf * score / (n - 1))
+    return delta
+
+
+class RatingStore:
+    """SQLite backed ratings, results and per-period rating history."""
+
+    def __init__(self, path: str = DEFAULT_DB_PATH, k: float = 24.0):
+        self.path = path
+        self.k = k
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.db.close()
+
+    def _player_ids(self, keys: Sequence[str]) -> Dict[str, int]:
+        ids = {}
+        for key in set(keys):
+            row = self.db.execute("SELECT id FROM players WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                name, params = parse_entrant(key)
+                cur = self.db.execute(
+                    "INSERT INTO players (key, name, params, rating) VALUES (?, ?, ?, ?)",
+                    (key, name, json.dumps(params, sort_keys=True), INITIAL_RATING),
+                )
+                ids[key] = cur.lastrowid
+            else:
+                ids[key] = row[0]
+        return ids
+
+    def ingest(self, results: Sequence[Dict]) -> int:
+        """
+        Store a batch of finished games and update ratings as one period.
+
+        A result is ``{"entrants": [key, ...], "points": [...], "gold": [...],
+        "seed": int, "num_rounds": int}`` with one entry per seat.
+        Returns the period id.
+        """
+        if not results:
+            return 0
+        with self.db:
+            ids = self._player_ids([key for r in results for key in r["entrants"]])
+            period = self.db.execute(
+                "INSERT INTO periods (created, n_games) VALUES (?, ?)", (time.time(), len(results))
+            ).lastrowid
+
+            rows = self.db.execute("SELECT id, rating, games FROM players").fetchall()
+            pid = np.array([r[0] for r in rows], dtype=np.int64)
+            index = {p: i for i, p in enumerate(pid)}
+            ratings = np.array([r[1] for r in rows], dtype=np.float64)
+            games_played = np.array([r[2] for r in rows], dtype=np.int64)
+
+            seats, points, result_rows = [], [], []
+            for r in results:
+                game = self.db.execute(
+                    "INSERT INTO games (period, seed, num_rounds) VALUES (?, ?, ?)",
+                    (period, r.get("seed"), r.get("num_rounds")),
+                ).lastrowid
+                players = [ids[key] for key in r["entrants"]]
+                seats.append(np.array([index[p] for p in players], dtype=np.int64))
+                points.append(np.asarray(r["points"]))
+                golds = r.get("gold") or [0] * len(players)
+                result_rows.extend(
+                    (game, seat, p, int(pt), int(g))
+                    for seat, (p, pt, g) in enumerate(zip(players, r["points"], golds))
+                )
+            self.db.executemany("INSERT INTO results VALUES (?, ?, ?, ?, ?)", result_rows)
+
+            delta = elo_period(ratings, games_played, seats, points, k=self.k)
+            played = np.zeros(len(pid), dtype=np.int64)
+            for s in seats:
+                np.add.at(played, s, 1)
+            ratings += delta
+            games_played += played
+
+            touched = np.flatnonzero(played)
+            self.db.executemany(
+                "UPDATE players SET rating = ?, games = ? WHERE id = ?",
+                [(float(ratings[i]), int(games_played[i]), int(pid[i])) for i in touched],
+            )
+            self.db.executemany(
+                "INSERT INTO history VALUES (?, ?, ?, ?)",
+                [(int(pid[i]), period, float(ratings[i]), int(games_played[i])) for i in touched],
+            )
+        return period
+
+    def leaderboard(self, limit: int = 20, name: Optional[str] = None) -> List[Tuple[str, float, int]]:
+        """Top entrants by rating, optionally only variants of one agent."""
+        if name is None:
+            query, args = "SELECT key, rating, games FROM players ORDER BY rating DESC LIMIT ?", (limit,)
+        else:
+            query = "SELECT key, rating, games FROM players WHERE name = ? ORDER BY rating DESC LIMIT ?"
+            args = (name, limit)
+        return self.db.execute(query, args).fetchall()
+
+    def trajectory(self, key: str) -> List[Tuple[int, float, int]]:
+        """``(period, rating, games)`` after every period the entrant played in."""
+        return self.db.execute(
+            "SELECT h.period, h.rating, h.games FROM history h JOIN players p ON p.id = h.player "
+            "WHERE p.key = ? ORDER BY h.period",
+            (key,),
+        ).fetchall()
+
+    def mean_points(self, key: str) -> Tuple[float, int]:
+        row = self.db.execute(
+            "SELECT AVG(r.points), COUNT(*) FROM results r JOIN players p ON p.id = r.player WHERE p.key = ?",
+            (key,),
+        ).fetchone()
+        return (row[0] or 0.0), row[1]
+
+
+def play_rated_game(job: Tuple) -> Dict:
+    """Play one seeded game between entrant keys; returns an ``ingest`` result."""
+    entrants, seed, num_rounds = job
+    random.seed(seed)
+    np.random.seed(seed % 2**32)
+    agents = {}
+    for seat, key in enumerate(entrants):
+        name, params = parse_entrant(key)
+        agents["{}_{}".format(seat, name)] = make_agent(name, **params)
+    states = LocalAuctionGame(agents, num_rounds=num_rounds, seed=seed).run()
+    seat_ids = list(agents)
+    return {
+        "entrants": list(entrants),
+        "points": [states[a]["points"] for a in seat_ids],
+        "gold": [states[a]["gold"] for a in seat_ids],
+        "seed": seed,
+        "num_rounds": num_rounds,
+    }
+
+
+def run_tournament(
+    store: RatingStore,
+    entrants: Sequence[str],
+    n_games: int,
+    table_size: Optional[int] = None,
+    num_rounds: int = 100,
+    seed: int = 0,
+    batch_size: int = 16,
+    workers: Optional[int] = None,
+) -> None:
+    """
+    Play ``n_games`` games between random tables of ``entrants`` on a process
+    pool and ingest the results in batches of ``batch_size`` as they finish.
+    """
+    rng = random.Random(seed)
+    table_size = min(table_size or len(entrants), len(entrants))
+    jobs = [
+        (rng.sample(list(entrants), table_size), seed + g, num_rounds) for g in range(n_games)
+    ]
+    batch = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(play_rated_game, job) for job in jobs]
+        for fut in as_completed(futures):
+            batch.append(fut.result())
+            if len(batch) >= batch_size:
+                store.ingest(batch)
+                batch = []
+    store.ingest(batch)
+
+
+def print_leaderboard(store: RatingStore, limit: int = 20, name: Optional[str] = None) -> None:
+    for i, (key, rating, games) in enumerate(store.leaderboard(limit, name), 1):
+        print("{:3d}. {:7.1f}  {:5d} games  {}".format(i, rating, games, key))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Elo ratings for local tournaments")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    play = sub.add_parser("play", help="play games and update ratings")
+    play.add_argument("--entrants", nargs="+", required=True, help="name or name:param=value,...")
+    play.add_argument("--games", type=int, default=100)
+    play.add_argument("--table-size", type=int, default=None)
+    play.add_argument("--rounds", type=int, default=100)
+    play.add_argument("--seed", type=int, default=0)
+    play.add_argument("--batch-size", type=int, default=16)
+    play.add_argument("--workers", type=int, default=None)
+
+    top = sub.add_parser("top", help="show the leaderboard")
+    top.add_argument("--limit", type=int, default=20)
+    top.add_argument("--name", default=None, help="only variants of this agent")
+
+    hist = sub.add_parser("history", help="rating trajectory of one entrant")
+    hist.add_argument("entrant")
+
+    args = parser.parse_args()
+    store = RatingStore(args.db)
+
+    if args.command == "play":
+        entrants = [entrant_key(*parse_entrant(e)) for e in args.entrants]
+        run_tournament(store, entrants, args.games, args.table_size, args.rounds,
+                       args.seed, args.batch_size, args.workers)
+        print_leaderboard(store)
+    elif args.command == "top":
+        print_leaderboard(store, args.limit, args.name)
+    else:
+        key = entrant_key(*parse_entrant(args.entrant))
+        for period, rating, games in store.trajectory(key):
+            print("period {:5d}  {:7.1f}  after {:5d} games".format(period, rating, games))
+        mean, n = store.mean_points(key)
+        print("mean points {:.1f} over {} games".format(mean, n))
+    store.close()
@@ -0,0 +1,202 @@
+"""
+Synthetic stress payloads and a scaling benchmark for agent bid callbacks.
+
+``make_payload`` builds realistic callback arguments at any scale: auctions
+drawn with the auction house's dice table, rival agents with spread out gold
+and points, a ``prev_auctions`` dict with many sorted bids per auction and a
+bank schedule of the remaining rounds. The benchmark sweeps one size at a
+time for every agent in ``agent_pool``, reports per-round latency curves and
+fits the complexity exponent ``k`` in ``latency ~ size**k`` on a log-log
+scale, so super-linear hot spots show up before they bite in a big game.
+
+Usage:
+    python stress_bench.py
+    python stress_bench.py --agents fortuna victor2 --sweep prev_bids --repeats 5
+"""
+
+import argparse
+import copy
+import json
+import random
+import time
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from agent_pool import AGENT_FACTORIES, make_agent
+from local_game import DIE_PROB, DIE_SIZES, MAX_BONUS, MAX_N_DIE, MIN_BONUS, suppress_output
+
+
+SWEEPS = {
+    "auctions": [25, 50, 100, 200],
+    "agents": [20, 50, 125, 250, 500],
+    "prev_bids": [2, 8, 32, 128],
+}
+
+DEFAULT_SIZE = {"auctions": 50, "agents": 40, "prev_bids": 8, "rounds_left": 500}
+
+
+def _auction(rng: random.Random) -> Dict:
+    i = rng.choices(range(len(DIE_SIZES)), weights=DIE_PROB, k=1)[0]
+    return {
+        "die": DIE_SIZES[i],
+        "num": rng.randint(1, MAX_N_DIE[i]),
+        "bonus": rng.randint(MIN_BONUS[i], MAX_BONUS[i]),
+    }
+
+
+def make_payload(
+    auctions: int = 50,
+    agents: int = 40,
+    prev_bids: int = 8,
+    rounds_left: int = 500,
+    current_round: int = 7,
+    seed: int = 0,
+    agent_id: str = "me",
+) -> Dict:
+    """
+    Return keyword arguments for a bid callback at the given scale.
+
+    ``prev_bids`` is the number of bids on every previous auction (capped by
+    the number of agents), so ``prev_auctions`` holds ``auctions * prev_bids``
+    bids in total.
+    """
+    rng = random.Random(seed)
+    agent_ids = [agent_id] + ["rival_{}".format(i) for i in range(agents - 1)]
+
+    states = {
+        a_id: {
+            "gold": int(rng.lognormvariate(8.0, 1.0)),
+            "points": rng.randint(0, 40 * max(1, current_round)),
+        }
+        for a_id in agent_ids
+    }
+
+    offset = 1000 * current_round
+    new_auctions = {"a{}".format(offset + i): _auction(rng) for i in range(auctions)}
+
+    prev_auctions = {}
+    for i in range(auctions):
+        a = _auction(rng)
+        a["reward"] = sum(rng.randint(1, a["die"]) for _ in range(a["num"])) + a["bonus"]
+        bidders = rng.sample(agent_ids, k=min(prev_bids, len(agent_ids)))
+        golds = sorted((int(rng.lognormvariate(5.0, 1.2)) + 1 for _ in bidders), reverse=True)
+        a["bids"] = [{"a_id": b, "gold": g} for b, g in zip(bidders, golds)]
+        prev_auctions["a{}".format(offset - 1000 + i)] = a
+
+    bank_state = {
+        "gold_income_per_round": [rng.randint(850, 1150) for _ in range(rounds_left)],
+        "bank_interest_per_round": [rng.uniform(0.95, 1.1) for _ in range(rounds_left)],
+        "bank_limit_per_round": [rng.randint(1500, 4000) for _ in range(rounds_left)],
+    }
+    return {
+        "agent_id": agent_id,
+        "current_round": current_round,
+        "states": states,
+        "auctions": new_auctions,
+        "prev_auctions": prev_auctions,
+        "bank_state": bank_state,
+    }
+
+
+def time_callback(agent_name: str, payload: Dict, repeats: int = 5) -> Tuple[float, int]:
+    """
+    ``(median seconds per successful call, failed calls)`` of a freshly built
+    agent on copies of ``payload``. Calls that raise are not timed; the median
+    is NaN when every call failed.
+    """
+    random.seed(0)
+    np.random.seed(0)
+    callback = make_agent(agent_name)
+    timings = []
+    failures = 0
+    with suppress_output():
+        for _ in range(repeats):
+            args = copy.deepcopy(payload)
+            start = time.perf_counter()
+            try:
+                callback(**args)
+            except Exception:
+                failures += 1
+                continue
+            timings.append(time.perf_counter() - start)
+    return (float(np.median(timings)) if timings else float("nan")), failures
+
+
+def fit_exponent(sizes: Sequence[float], latencies: Sequence[float]) -> float:
+    """Slope of log(latency) against log(size), over the sizes with a latency (NaN if < 2)."""
+    x = np.log(np.asarray(sizes, dtype=np.float64))
+    latencies = np.asarray(latencies, dtype=np.float64)
+    ok = np.isfinite(latencies)
+    if ok.sum() < 2:
+        return float("nan")
+    y = np.log(np.maximum(latencies[ok], 1e-9))
+    return float(np.polyfit(x[ok], y, 1)[0])
+
+
+def run_sweep(
+    sweep: str,
+    agent_names: Sequence[str],
+    sizes: Optional[Sequence[int]] = None,
+    repeats: int = 5,
+) -> Dict[str, Dict]:
+    """Sweep one payload dimension for every agent; returns sizes, latencies, failures and exponent."""
+    sizes = list(sizes or SWEEPS[sweep])
+    base = dict(DEFAULT_SIZE)
+    if sweep == "prev_bids":
+        # bids per auction are capped by the number of agents; keep that cap out of the sweep
+        base["agents"] = max(base["agents"], max(sizes))
+    payloads = []
+    for size in sizes:
+        kwargs = dict(base)
+        kwargs[sweep] = size
+        payloads.append(make_payload(**kwargs))
+
+    results = {}
+    for name in agent_names:
+        timed = [time_callback(name, p, repeats) for p in payloads]
+        latencies = [t for t, _ in timed]
+        results[name] = {
+            "sizes": sizes,
+            "latency_ms": [1000.0 * t for t in latencies],
+            "failures": [f for _, f in timed],
+            "exponent": fit_exponent(sizes, latencies),
+        }
+    return results
+
+
+def print_report(sweep: str, results: Dict[str, Dict], warn_above: float = 1.2) -> None:
+    sizes = next(iter(results.values()))["sizes"]
+    header = "{:<12s}".format(sweep) + "".join("{:>10d}".format(s) for s in sizes) + "       k  failed"
+    print(header)
+    print("-" * len(header))
+    ranked = sorted(results.items(), key=lambda kv: -np.inf if np.isnan(kv[1]["exponent"]) else kv[1]["exponent"],
+                    reverse=True)
+    for name, r in ranked:
+        flag = "  <-- super-linear" if r["exponent"] > warn_above else ""
+        failed = sum(r["failures"])
+        if failed:
+            flag += "  <-- {} calls raised, not timed".format(failed)
+        print("{:<12s}".format(name)
+              + "".join("{:>10.3f}".format(ms) for ms in r["latency_ms"])
+              + "{:>8.2f}{:>8d}{}".format(r["exponent"], failed, flag))
+    print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scaling benchmark for agent bid callbacks")
+    parser.add_argument("--agents", nargs="*", default=sorted(AGENT_FACTORIES))
+    parser.add_argument("--sweep", nargs="*", choices=sorted(SWEEPS), default=list(SWEEPS))
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--json", default=None, help="also write the results to this file")
+    args = parser.parse_args()
+
+    all_results = {}
+    for sweep in args.sweep:
+        print("latency per round (ms) by number of {}".format(sweep))
+        all_results[sweep] = run_sweep(sweep, args.agents, repeats=args.repeats)
+        print_report(sweep, all_results[sweep])
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(all_results, f, indent=2)
@@ -0,0 +1,67 @@
+"""
+DeltaAuctionGameClient against a server that speaks the plain protocol
+(like the dnd_auction_game server) and one that sends delta frames.
+
+    python -m pytest test_delta_protocol.py
+"""
+
+import asyncio
+import json
+
+import pytest
+
+websockets = pytest.importorskip("websockets")
+pytest.importorskip("dnd_auction_game")
+
+from delta_protocol import AgentTable, DeltaAuctionGameClient, DeltaEncoder, pack_prev_auctions
+
+
+ROUND = {
+    "round": 0,
+    "states": {"other": {"gold": 1000, "points": 0}},
+    "auctions": {"a1": {"die": 6, "num": 2, "bonus": 1}},
+    "prev_auctions": {},
+    "remainder_gold_income": [1000],
+    "remainder_bank_interest": [1.1],
+    "remainder_bank_limit": [2000],
+}
+BANK = {"gold_income": [None, 1000], "bank_interest": [None, 1.1], "bank_limit": [None, 2000]}
+
+
+def _play_one_round(frame):
+    """Serve `frame` to one client, then return the JSON reply it sent."""
+    replies = []
+
+    async def handler(ws):
+        json.loads(await ws.recv())   # agent info
+        await ws.send(frame)
+        replies.append(json.loads(await ws.recv()))
+        await ws.close()
+
+    async def main():
+        async with websockets.serve(handler, "127.0.0.1", 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            client = DeltaAuctionGameClient("localhost", "tester", port=port)
+            await client._delta_run(lambda *args: {"a1": 7})
+
+    asyncio.run(main())
+    return replies[0]
+
+
+def test_full_frame_server_gets_bare_bids(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    reply = _play_one_round(json.dumps(ROUND))
+
+    # what the course server does with a reply
+    registered = {auction_id: gold for auction_id, gold in reply.items() if auction_id in ROUND["auctions"]}
+    assert reply == {"a1": 7}
+    assert registered == {"a1": 7}
+
+
+def test_delta_server_gets_tagged_bids(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    table = AgentTable()
+    frame = DeltaEncoder(table).encode(ROUND, BANK, pack_prev_auctions(ROUND["prev_auctions"], table))
+    reply = _play_one_round(frame)
+
+    assert reply == {"round": 0, "bids": {"a1": 7}}
@@ -5,6 +5,8 @@ import random
 
 from dnd_auction_game import AuctionGameClient
 
+from profiling import maybe_profile
+
 
 average_roll_for_die = {
     2: 1.5,
@@ -185,7 +187,7 @@ if __name__ == "__main__":
     )
     adapter = FortunaHybridAgent()
     try:
-        game.run(adapter.bid)
+        game.run(maybe_profile(adapter.bid, "victor"))
     except KeyboardInterrupt:
         print("<interrupt - shutting down>")
     print("<game is done>")
@@ -14,6 +14,8 @@ try:
 except Exception:
     AuctionGameClient = None
 
+from profiling import maybe_profile
+
 
 class Agent:
     def bid(self, auction_info: Dict[str, Any]) -> Dict[str, int]:
@@ -34,6 +36,8 @@ class StrategicAgent(Agent):
         min_aggr: float = 0.30,
         max_aggr: float = 0.92,
         lose_cashback_fraction: float = 0.60,
+        race_aware: bool = False,
+        race_margin: float = 0.02,
     ):
         self.base_aggressiveness = max(0.0, min(1.0, base_aggressiveness))
         self.current_aggressiveness = self.base_aggressiveness
@@ -47,6 +51,14 @@ class StrategicAgent(Agent):
         self.last_round_points_gained = 0
         self.last_round_gold_net_spent = 0
 
+        # Optional race model: push when spending more raises our chance of finishing first
+        self.race_margin = race_margin
+        self.race = None
+        if race_aware:
+            from race_state import RaceState
+
+            self.race = RaceState()
+
     def _estimate_win_probability(self, my_bid: int, others_gold: List[int]) -> float:
         if my_bid <= 0:
             return 0.0
@@ -100,6 +112,13 @@ class StrategicAgent(Agent):
             best_other = max(best_other, int(s["points"]))
         return my_points < best_other
 
+    def _should_push(self, agent_id: str, states: Dict[str, Dict[str, int]], bank_state: Dict[str, Any]) -> bool:
+        if self.race is None:
+            return self._am_i_losing(agent_id, states)
+        self.race.update(agent_id, states, bank_state)
+        p = self.race.compare()
+        return p["aggressive"] > p["current"] + self.race_margin
+
     def bid(self, auction_info: Dict[str, Any]) -> Dict[str, int]:
         agent_id: str = auction_info["agent_id"]
         states: Dict[str, Dict[str, int]] = auction_info["states"]
@@ -116,7 +135,7 @@ class StrategicAgent(Agent):
         self._adjust_aggressiveness_with_history()
 
         my_gold = int(states[agent_id]["gold"])
-        am_losing = self._am_i_losing(agent_id, states)
+        am_losing = self._should_push(agent_id, states, bank_state)
         budget = self._compute_spend_budget(my_gold, bank_state, am_losing)
         if budget <= 0:
             return {}
@@ -220,7 +239,7 @@ if __name__ == "__main__":
     game = AuctionGameClient(host=host, agent_name=agent_name, player_id=player_id, port=port)
     adapter = StrategicLive()
     try:
-        game.run(adapter.bid_callback)
+        game.run(maybe_profile(adapter.bid_callback, "victor2"))
     except KeyboardInterrupt:
         print("<interrupt - shutting down>")
     print("<game is done>")
@@ -0,0 +1,233 @@
+"""
+What-if evaluator: run every agent policy on the same recorded payloads.
+
+Each policy from ``agent_pool`` is loaded once into its own worker process,
+so module level state (lebron, raphael), the global random generators and
+printed output stay isolated and the policies really run in parallel. A
+single recorded round or a whole replayed game is sent to all workers at
+once; every worker feeds the rounds to its agent in order, impersonating the
+recorded agent, and returns the bids with the time each call took.
+
+The result is a bids matrix per round (policies x auctions) plus per-policy
+timings.
+
+Usage:
+    python what_if.py ../logs/agent_xyz_n0.jsonl --round 12
+    python what_if.py ../logs/agent_xyz_n0.jsonl --policies maxi fortuna victor2
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from agent_pool import AGENT_FACTORIES, make_agent
+from delta_protocol import read_round_log
+from helper import calculate_auction_expected_value
+from local_game import bank_state_from_payload, suppress_output
+
+
+def _worker(conn, name: str, params: Dict) -> None:
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    with suppress_output():
+        try:
+            callback = make_agent(name, **params)
+            conn.send(("ready", None))
+        except Exception as e:
+            conn.send(("error", "{}: {}".format(type(e).__name__, e)))
+            return
+
+        while True:
+            msg = conn.recv()
+            if msg is None:
+                return
+            payloads, agent_id, reset = msg
+            bids, seconds, errors = [], [], []
+            if reset:
+                try:
+                    callback = make_agent(name, **params)
+                except Exception as e:
+                    err = "{}: {}".format(type(e).__name__, e)
+                    conn.send(("done", ([{}] * len(payloads), [0.0] * len(payloads), [err] * len(payloads))))
+                    continue
+
+            for p in payloads:
+                start = time.perf_counter()
+                try:
+                    out = callback(
+                        agent_id,
+                        p["round"],
+                        p["states"],
+                        p["auctions"],
+                        p["prev_auctions"],
+                        bank_state_from_payload(p),
+                    )
+                    seconds.append(time.perf_counter() - start)
+                    bids.append(_valid_bids(out))
+                    errors.append(None)
+                except Exception as e:
+                    seconds.append(time.perf_counter() - start)
+                    bids.append({})
+                    errors.append("{}: {}".format(type(e).__name__, e))
+            conn.send(("done", (bids, seconds, errors)))
+
+
+def _valid_bids(out) -> Dict[str, int]:
+    """Bids as the server would accept them: non-integer and non-positive amounts are dropped."""
+    if out is None:
+        return {}
+    if not isinstance(out, dict):
+        raise TypeError("bid callback returned {} instead of a dict".format(type(out).__name__))
+    bids = {}
+    for auction_id, gold in out.items():
+        try:
+            gold = int(gold)
+        except (TypeError, ValueError, OverflowError):
+            continue
+        if gold >= 1:
+            bids[auction_id] = gold
+    return bids
+
+
+class RoundBids:
+    """Bids of every policy for one round: ``matrix[i, j]`` is policy ``i`` on ``auctions[j]``."""
+
+    def __init__(self, round_index: int, policies: List[str], auctions: Dict, matrix: np.ndarray,
+                 seconds: np.ndarray, errors: List[Optional[str]]):
+        self.round = round_index
+        self.policies = policies
+        self.auction_ids = list(auctions)
+        self.ev = np.array([calculate_auction_expected_value(a) for a in auctions.values()])
+        self.matrix = matrix
+        self.seconds = seconds
+        self.errors = errors
+
+    def print(self, max_auctions: int = 12) -> None:
+        order = np.argsort(-self.ev)[:max_auctions]
+        print("round {}".format(self.round))
+        print("{:<12s}{:>9s} ".format("", "ms") + "".join("{:>8s}".format(self.auction_ids[j]) for j in order))
+        print("{:<12s}{:>9s} ".format("EV", "") + "".join("{:>8.1f}".format(self.ev[j]) for j in order))
+        for i, name in enumerate(self.policies):
+            row = "".join("{:>8d}".format(int(self.matrix[i, j])) for j in order)
+            note = "  ({})".format(self.errors[i]) if self.errors[i] else ""
+            print("{:<12s}{:>9.2f} {}{}".format(name, 1000 * self.seconds[i], row, note))
+
+
+class WhatIfEvaluator:
+    """
+    Keeps one worker process per policy. Use as a context manager, or call
+    ``close()`` when done.
+    """
+
+    def __init__(self, policies: Sequence[str] = None, params: Optional[Dict[str, Dict]] = None):
+        self.policies = list(policies or AGENT_FACTORIES)
+        params = params or {}
+        self.workers = {}
+        self.failed: Dict[str, str] = {}
+        for name in self.policies:
+            parent, child = mp.Pipe()
+            proc = mp.Process(target=_worker, args=(child, name, params.get(name, {})), daemon=True)
+            proc.start()
+            self.workers[name] = (proc, parent)
+
+        for name, (proc, conn) in list(self.workers.items()):
+            status, info = conn.recv()
+            if status != "ready":
+                self.failed[name] = info
+                proc.join()
+                del self.workers[name]
+        self.policies = [p for p in self.policies if p in self.workers]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self) -> None:
+        for proc, conn in self.workers.values():
+            try:
+                conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            proc.join(timeout=5)
+        self.workers = {}
+
+    def evaluate(self, payloads: Sequence[Dict], agent_id: Optional[str] = None,
+                 reset: bool = True) -> List[RoundBids]:
+        """
+        Feed ``payloads`` (consecutive rounds) to every policy. ``agent_id`` is
+        the seat the policies play; by default the recorded agent of the log.
+        With ``reset`` every policy starts from a fresh agent.
+        """
+        payloads = list(payloads)
+        if not payloads:
+            return []
+        if agent_id is None:
+            first = payloads[0]
+            agent_id = first.get("current_agent") or next(iter(first["states"]))
+
+        for proc, conn in self.workers.values():
+            conn.send((payloads, agent_id, reset))
+        replies = {name: conn.recv()[1] for name, (proc, conn) in self.workers.items()}
+
+        out = []
+        for r, p in enumerate(payloads):
+            column = {a: j for j, a in enumerate(p["auctions"])}
+            matrix = np.zeros((len(self.policies), len(column)), dtype=np.int64)
+            seconds = np.zeros(len(self.policies))
+            errors = []
+            for i, name in enumerate(self.policies):
+                bids, secs, errs = replies[name]
+                for auction_id, gold in bids[r].items():
+                    if auction_id in column:
+                        matrix[i, column[auction_id]] = gold
+                seconds[i] = secs[r]
+                errors.append(errs[r])
+            out.append(RoundBids(p["round"], self.policies, p["auctions"], matrix, seconds, errors))
+        return out
+
+
+def load_rounds(path: str, round_index: Optional[int] = None) -> List[Dict]:
+    """All rounds of a log, or the rounds up to and including ``round_index``."""
+    rounds = []
+    for p in read_round_log(path):
+        rounds.append(p)
+        if round_index is not None and p["round"] >= round_index:
+            break
+    return rounds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run every agent policy on recorded payloads")
+    parser.add_argument("log", help="client log of one game")
+    parser.add_argument("--round", type=int, default=None,
+                        help="show this round (the policies replay the rounds before it)")
+    parser.add_argument("--only", action="store_true",
+                        help="feed only the selected round instead of replaying up to it")
+    parser.add_argument("--policies", nargs="*", default=sorted(AGENT_FACTORIES))
+    parser.add_argument("--agent-id", default=None)
+    args = parser.parse_args()
+
+    rounds = load_rounds(args.log, args.round)
+    if args.only:
+        rounds = rounds[-1:]
+
+    with WhatIfEvaluator(args.policies) as evaluator:
+        for name, err in evaluator.failed.items():
+            print("could not load {}: {}".format(name, err))
+        results = evaluator.evaluate(rounds, agent_id=args.agent_id)
+
+    if args.round is not None:
+        results[-1].print()
+    else:
+        total = np.sum([r.seconds for r in results], axis=0)
+        worst = np.max([r.seconds for r in results], axis=0)
+        spent = np.sum([r.matrix.sum(axis=1) for r in results], axis=0)
+        print("{} rounds".format(len(results)))
+        print("{:<12s}{:>12s}{:>12s}{:>14s}".format("policy", "total ms", "max ms", "gold bid"))
+        for i, name in enumerate(evaluator.policies):
+            print("{:<12s}{:>12.1f}{:>12.2f}{:>14d}".format(name, 1000 * total[i], 1000 * worst[i], int(spent[i])))
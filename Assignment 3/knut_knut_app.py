@@ -1,37 +1,106 @@
-import random
 from flask import Flask
 from flask import request
 import datetime
+import os
+import threading
+import time
+import numpy as np
 import pandas as pd
 
+from route_models import DEFAULT_ARTIFACT, load_route_models, predict_arrivals
+from traffic_data import load_traffic_df
+
 app = Flask(__name__)
 
-def read_traffic_data(filename :str) -> pd.DataFrame:
-    records = []
-    with open(filename, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if line:
-                records.append(json.loads(line))
-    
-    df = pd.DataFrame(records)
-
-    # Convert time strings to datetime objects
-    df["depature"] = pd.to_datetime(df["depature"], format="%H:%M")
-    df["arrival"]  = pd.to_datetime(df["arrival"], format="%H:%M")
-
-    # Calculate duration in minutes and add column
-    df["duration"] = (df["arrival"] - df["depature"]).dt.total_seconds() / 60
+# Written by script.py; dropping in a new file updates the running app
+MODEL_PATH = os.environ.get("KNUT_ROUTE_MODEL", DEFAULT_ARTIFACT)
+FIRST_HOUR, LAST_HOUR = 6, 16   # the hours the form offers
+
+
+class RouteTable:
+    """
+    Best route and travel time for every departure minute the form allows
+    (11 hours x 60 minutes = 660 rows), predicted once from the model
+    artifact, so a request is a list index. At most every `check_interval`
+    seconds a request looks at the artifact's mtime; when it changed the
+    table is rebuilt on the side and swapped in with one assignment. A
+    broken (or missing) artifact leaves the old table in place and is not
+    tried again until its mtime changes.
+    """
+
+    def __init__(self, path, check_interval=1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._next_check = 0.0
+        self._failed_mtime = None
+        try:
+            self._table = self._build()
+        except FileNotFoundError:
+            raise RuntimeError(
+                "no route models at {}; run script.py first to train them".format(path)) from None
+
+    def _build(self):
+        mtime = os.stat(self.path).st_mtime_ns
+        departures = np.arange(FIRST_HOUR * 60, (LAST_HOUR + 1) * 60)
+        routes, arrivals = predict_arrivals(load_route_models(self.path), departures)   # (660, routes)
+        best = np.argmin(arrivals, axis=1)
+        travel = np.rint(arrivals[np.arange(len(departures)), best] - departures).astype(int)
+        return {
+            "mtime": mtime,
+            "arrivals": arrivals,
+            "best_route": [routes[i] for i in best],
+            "travel_minutes": travel.tolist(),
+        }
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now < self._next_check or not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._next_check = now + self.check_interval
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError:
+                mtime = -1   # missing: reported once, like a broken file
+            if mtime in (self._table["mtime"], self._failed_mtime):
+                return
+            try:
+                self._table = self._build()
+            except (OSError, ValueError, KeyError) as e:
+                self._failed_mtime = mtime
+                print("keeping the current route table, reload failed:", e)
+        finally:
+            self._lock.release()
+
+    def lookup(self, hour, minute):
+        """(best route, travel minutes) for a departure at hour:minute."""
+        self._maybe_reload()
+        table = self._table
+        i = (hour - FIRST_HOUR) * 60 + minute
+        return table["best_route"][i], table["travel_minutes"][i]
+
+
+route_table = RouteTable(MODEL_PATH)
 
+def read_traffic_data(filename :str) -> pd.DataFrame:
+    # road, dep_min, arr_min and duration (minutes, wrapped at midnight); cached after the first read
+    df = load_traffic_df(filename)
+    df["duration"] = df["duration_min"]
     return df
 
 def get_the_best_route_as_a_text_informatic(dep_hour, dep_min):
-    roads = ["A->C->D", "A->C->E", "B->C->D", "B->C->E"]
-    # perform some magic here - instead of just a random selection
-    est_travel_time = random.randint(10, 120)
-    best_road = random.choice(roads)
-
+    try:
+        hour, minute = int(dep_hour), int(dep_min)
+    except (TypeError, ValueError):
+        hour = minute = None
+    if hour is None or not (FIRST_HOUR <= hour <= LAST_HOUR and 0 <= minute <= 59):
+        return """
+    <p>Please pick an hour between {:02d} and {:02d} and enter minutes from 0 to 59.</p>
+    <p><a href="/">Back</a></p>
+    """.format(FIRST_HOUR, LAST_HOUR)
 
+    best_road, est_travel_time = route_table.lookup(hour, minute)
 
     out = """
     <p>
@@ -0,0 +1,296 @@
+"""
+Exact fitting of the route models in script.py.
+
+Every model there has the form module(xs, theta) = X(xs) @ theta: a fixed
+feature map followed by a product with theta. For such a model the sum of
+squared errors is minimised exactly by least squares, so no sampling is
+needed and theta is not confined to the [-1, 1] box of the random search.
+
+A model does not have to declare that it is linear. design_matrix probes
+the module with the unit vectors e_i (column i of X is module(xs, e_i)) and
+then checks the result against a few random thetas; a module that fails the
+check (nonlinear in theta) is handed to the fallback search instead.
+
+    theta, loss, method = fit_model(xs, y, module_polytan, (4, 1), fallback=fortuna_algorithm)
+
+The feature maps themselves live here too (features_*), so a route's
+design matrices are built once and reused; batched_random_search scores
+thousands of sampled thetas per matrix product when the random search is
+wanted after all.
+
+select_models runs the whole (route x model) grid, optionally over a
+process pool; see its docstring. A model there may name its feature map;
+one that does not goes through fit_model, so it is probed for linearity and
+handed to the fallback search when it is not linear.
+
+save_route_models writes the winners to route_models.json (model name and
+theta per route plus the scaler), which knut_knut_app.py loads and turns
+into its departure-time lookup table with predict_arrivals.
+"""
+
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+def features_linear(xs):
+    return np.hstack([np.ones((xs.shape[0], 1)), xs])
+
+
+def features_polynomial(xs):
+    return np.hstack([np.ones((xs.shape[0], 1)), xs, xs**2])
+
+
+def features_tangent(xs):
+    return np.hstack([np.ones((xs.shape[0], 1)), np.tan(xs)])
+
+
+def features_polytan(xs):
+    return np.hstack([np.ones((xs.shape[0], 1)), xs, xs**2, np.tan(xs)])
+
+
+FEATURE_MAPS = {
+    "Linear": features_linear,
+    "Polynomial": features_polynomial,
+    "Tangent": features_tangent,
+    "PolyTan": features_polytan,
+}
+
+ARTIFACT_VERSION = 1
+DEFAULT_ARTIFACT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "route_models.json")
+
+
+def design_matrix(module, xs, theta_shape, n_checks=3, rtol=1e-9, seed=0):
+    """
+    The feature matrix X with module(xs, theta) == X @ theta, or None when
+    `module` is not linear in theta. Only single-output thetas (d, 1) or (d,).
+    """
+    d = theta_shape[0]
+    if len(theta_shape) > 1 and int(np.prod(theta_shape[1:])) != 1:
+        return None
+    columns = []
+    for i in range(d):
+        e = np.zeros(theta_shape)
+        e.flat[i] = 1.0
+        columns.append(np.asarray(module(xs, e), dtype=np.float64).reshape(-1))
+    X = np.column_stack(columns)
+
+    rng = np.random.default_rng(seed)
+    for _ in range(n_checks):
+        theta = rng.standard_normal(theta_shape)
+        expected = np.asarray(module(xs, theta), dtype=np.float64).reshape(-1)
+        if not np.allclose(X @ theta.reshape(-1), expected, rtol=rtol, atol=rtol * (1 + np.abs(expected).max())):
+            return None
+    return X
+
+
+def least_squares(X, y):
+    """(theta, sum of squared errors) of the exact least-squares fit of y ~ X."""
+    y = np.asarray(y, dtype=np.float64).reshape(-1)
+    theta, _, _, _ = np.linalg.lstsq(X, y, rcond=None)
+    residuals = X @ theta - y
+    return theta, float(residuals @ residuals)
+
+
+def batched_random_search(X, y, theta_shape, n_samples=100000, low=-1.0, high=1.0, chunk_size=10000,
+                          rng=np.random):
+    """
+    Random search over uniform thetas in [low, high], scored chunk_size at a
+    time as X @ Theta, so memory stays at (rows x chunk_size).
+
+    The thetas are drawn from `rng` in the same order as one
+    rng.uniform(low, high, theta_shape) call per sample, so with the same
+    seed the winner is the one the sample-at-a-time loop finds (the first
+    theta with the lowest loss). Returns (theta in `theta_shape`, loss).
+    """
+    y = np.asarray(y, dtype=np.float64).reshape(-1, 1)
+    d = X.shape[1]
+    best_theta, best_loss = None, float("inf")
+    for start in range(0, n_samples, chunk_size):
+        n = min(chunk_size, n_samples - start)
+        thetas = rng.uniform(low, high, size=(n, d))
+        residuals = X @ thetas.T - y
+        losses = np.einsum("ij,ij->j", residuals, residuals)
+        i = int(np.argmin(losses))
+        if losses[i] < best_loss:
+            best_theta, best_loss = thetas[i].reshape(theta_shape), float(losses[i])
+    return best_theta, best_loss
+
+
+def fit_model(xs, y, module, theta_shape, fallback=None, X=None):
+    """
+    Fit one model. Returns (theta in `theta_shape`, loss, method) where loss
+    is the sum of squared errors and method is "lstsq" or "fallback". Pass
+    the route's cached feature matrix as X to skip probing the module.
+    """
+    if X is None:
+        X = design_matrix(module, xs, theta_shape)
+    if X is not None:
+        theta, loss = least_squares(X, y)
+        return theta.reshape(theta_shape), loss, "lstsq"
+    if fallback is None:
+        raise ValueError("{} is not linear in theta and no fallback search was given".format(
+            getattr(module, "__name__", module)))
+    theta, loss = fallback(xs, y, module, theta_shape)
+    return theta, float(loss), "fallback"
+
+
+def _fit_cell(xs, y, model, method, n_samples, seed, fallback):
+    """(theta, loss) of one (route, model) cell."""
+    module, theta_shape = model.get("module"), model["theta_shape"]
+    features = model.get("features")
+    X = features(xs) if features is not None else design_matrix(module, xs, theta_shape)
+    if X is not None and method != "lstsq":
+        return batched_random_search(X, y, theta_shape, n_samples, rng=np.random.RandomState(seed))
+    if X is None:
+        # the fallback draws from np.random; seeded per cell like the batched search
+        np.random.seed(seed)
+    theta, loss, _ = fit_model(xs, y, module, theta_shape, fallback=fallback, X=X)
+    return theta, loss
+
+
+def _fit_job(job):
+    """One (route, model) cell in a worker; the route's rows come from shared memory."""
+    shm_name, shape, start, stop, model, method, n_samples, seed, fallback = job
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        rows = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        xs = np.array(rows[start:stop, :1])
+        y = np.array(rows[start:stop, 1:])
+        del rows
+    finally:
+        shm.close()
+    return _fit_cell(xs, y, model, method, n_samples, seed, fallback)
+
+
+def _job_model(model):
+    # with a feature map the worker never calls the module, so it is not pickled
+    if model.get("features") is None:
+        return model
+    return {"features": model["features"], "theta_shape": model["theta_shape"]}
+
+
+def select_models(route_data, models, method="lstsq", workers=1, n_samples=100000, seed=0, fallback=None):
+    """
+    Fit every model in `models` (name -> {"module", "theta_shape"} and
+    optionally "features") on every route in `route_data` (route -> (xs, y),
+    column vectors) and keep the lowest loss per route.
+
+    A model with "features" is fitted on that feature map: exactly with
+    method "lstsq", by batched_random_search otherwise. A model without it
+    is probed with design_matrix; if it turns out linear it is fitted the
+    same way, if not `fallback(xs, y, module, theta_shape)` searches it
+    (np.random seeded per cell) and a missing fallback raises ValueError.
+
+    With workers > 1 the cells run in a process pool. All routes are copied
+    once into one shared-memory block of (xs, y) rows and a job only carries
+    its row range, so nothing but a few numbers is pickled per job. Every
+    cell has its own seed (seed + its position in the grid), so the random
+    search gives the same result for any number of workers.
+
+    Returns (best_models_per_route, losses) where best_models_per_route has
+    the structure script.py uses and losses[route][name] = (theta, loss).
+    """
+    cells = [(route, name) for route in route_data for name in models]
+    if workers <= 1:
+        results = [
+            _fit_cell(route_data[route][0], route_data[route][1], models[name], method, n_samples, seed + k, fallback)
+            for k, (route, name) in enumerate(cells)
+        ]
+    else:
+        offsets, start = {}, 0
+        for route, (xs, _) in route_data.items():
+            offsets[route] = (start, start + len(xs))
+            start += len(xs)
+        shape = (start, 2)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, start * 2 * 8))
+        try:
+            rows = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+            for route, (xs, y) in route_data.items():
+                lo, hi = offsets[route]
+                rows[lo:hi, 0] = np.ravel(xs)
+                rows[lo:hi, 1] = np.ravel(y)
+            del rows
+            jobs = [
+                (shm.name, shape) + offsets[route]
+                + (_job_model(models[name]), method, n_samples, seed + k, fallback)
+                for k, (route, name) in enumerate(cells)
+            ]
+            # fork where possible: spawn would re-run the importing script in every worker
+            context = (multiprocessing.get_context("fork")
+                       if "fork" in multiprocessing.get_all_start_methods() else None)
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                results = list(pool.map(_fit_job, jobs))
+        finally:
+            shm.close()
+            shm.unlink()
+
+    losses = {route: {} for route in route_data}
+    best_models_per_route = {}
+    for (route, name), (theta, loss) in zip(cells, results):
+        losses[route][name] = (theta, loss)
+        best = best_models_per_route.get(route)
+        if best is None or loss < best["loss"]:
+            best_models_per_route[route] = {
+                "model_name": name,
+                "theta": theta,
+                "module": models[name]["module"],
+                "loss": loss,
+            }
+    return best_models_per_route, losses
+
+
+def save_route_models(best_models_per_route, scaler, path=DEFAULT_ARTIFACT):
+    """
+    Write the chosen model per route and the scaler (dep_mu, dep_sigma,
+    arr_mean, arr_std) as JSON; the file is replaced atomically, so a
+    running app never reads half an artifact.
+    """
+    artifact = {
+        "version": ARTIFACT_VERSION,
+        "scaler": {k: float(v) for k, v in scaler.items()},
+        "routes": {
+            route: {
+                "model_name": info["model_name"],
+                "theta": np.ravel(info["theta"]).tolist(),
+                "loss": float(info["loss"]),
+            }
+            for route, info in best_models_per_route.items()
+        },
+    }
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(artifact, f, indent=2)
+        f.write("\n")
+    os.replace(tmp, path)
+
+
+def load_route_models(path=DEFAULT_ARTIFACT):
+    with open(path) as f:
+        artifact = json.load(f)
+    if artifact.get("version") != ARTIFACT_VERSION:
+        raise ValueError("unsupported route model artifact version {!r} in {}".format(artifact.get("version"), path))
+    for route, info in artifact["routes"].items():
+        if info["model_name"] not in FEATURE_MAPS:
+            raise ValueError("unknown model {!r} for route {}".format(info["model_name"], route))
+    return artifact
+
+
+def predict_arrivals(artifact, dep_min):
+    """
+    Predicted arrival minute of every route for every departure minute in
+    `dep_min`. Returns (route names, array of shape (len(dep_min), routes)).
+    """
+    scaler = artifact["scaler"]
+    xs = ((np.asarray(dep_min, dtype=np.float64) - scaler["dep_mu"]) / scaler["dep_sigma"]).reshape(-1, 1)
+    routes = list(artifact["routes"])
+    arrivals = np.empty((len(xs), len(routes)))
+    for j, route in enumerate(routes):
+        info = artifact["routes"][route]
+        scaled = FEATURE_MAPS[info["model_name"]](xs) @ np.asarray(info["theta"])
+        arrivals[:, j] = scaled * scaler["arr_std"] + scaler["arr_mean"]
+    return routes, arrivals
@@ -1,8 +1,23 @@
+import time
+
+import numpy as np
+
+from route_models import (
+    features_linear, features_polynomial, features_polytan, features_tangent, save_route_models, select_models,
+)
+from traffic_data import load_traffic_df
+
+
+df = load_traffic_df()
+
 dep_mu = df['dep_min'].mean()
 dep_sigma = df['dep_min'].std()
 arr_mean = df['arr_min'].mean()
 arr_std = df['arr_min'].std()
 
+df['dep_scaled'] = (df['dep_min'] - dep_mu) / dep_sigma
+df['arr_scaled'] = (df['arr_min'] - arr_mean) / arr_std
+
 def scale_input(dep_min):
     return (dep_min - dep_mu) / dep_sigma
 
@@ -10,20 +25,16 @@ def unscale_arrival_time(scaled_time):
     return (scaled_time * arr_std) + arr_mean
 
 def module_linear(xs_input, theta):
-    X = np.hstack([np.ones((xs_input.shape[0], 1)), xs_input])
-    return X @ theta
+    return features_linear(xs_input) @ theta
 
 def module_polynomial(xs_input, theta):
-    X = np.hstack([np.ones((xs_input.shape[0], 1)), xs_input, xs_input**2])
-    return X @ theta
+    return features_polynomial(xs_input) @ theta
 
 def module_tangent(xs_input, theta):
-    X = np.hstack([np.ones((xs_input.shape[0], 1)), np.tan(xs_input)])
-    return X @ theta
+    return features_tangent(xs_input) @ theta
 
 def module_polytan(xs_input, theta):
-    X = np.hstack([np.ones((xs_input.shape[0], 1)), xs_input, xs_input**2, np.tan(xs_input)])
-    return X @ theta
+    return features_polytan(xs_input) @ theta
 
 
 def regression_loss_function(y_hat, y_true):
@@ -33,6 +44,7 @@ def sample_theta(size_of_theta, min, max):
     theta = np.random.uniform(min, max, size=size_of_theta)
     return theta
 
+# select_models only calls this for a model that is not linear in theta
 def fortuna_algorithm(xs_data, y_true_data, module, size_of_theta):
     best_loss, best_theta = float('inf'), None
     for i in range(100000):
@@ -43,47 +55,43 @@ def fortuna_algorithm(xs_data, y_true_data, module, size_of_theta):
             best_loss, best_theta = curr_loss, curr_theta
     return best_theta, best_loss
 
+# "lstsq": exact fit, "fortuna": the random search (seeded, see SEED); either way a
+# model without "features" is probed for linearity and falls back to fortuna_algorithm
+# when it is not linear
+FIT_METHOD = "lstsq"
+SEED = 42
+WORKERS = 1   # e.g. os.cpu_count() for FIT_METHOD = "fortuna"
+
 N_OUTPUTS = 1 
 models_to_train = {
-    "Linear":     {"module": module_linear, "theta_shape": (2, N_OUTPUTS)},
-    "Polynomial": {"module": module_polynomial, "theta_shape": (3, N_OUTPUTS)},
-    "Tangent":    {"module": module_tangent, "theta_shape": (2, N_OUTPUTS)},
-    "PolyTan":    {"module": module_polytan, "theta_shape": (4, N_OUTPUTS)}
+    "Linear":     {"module": module_linear, "features": features_linear, "theta_shape": (2, N_OUTPUTS)},
+    "Polynomial": {"module": module_polynomial, "features": features_polynomial, "theta_shape": (3, N_OUTPUTS)},
+    "Tangent":    {"module": module_tangent, "features": features_tangent, "theta_shape": (2, N_OUTPUTS)},
+    "PolyTan":    {"module": module_polytan, "features": features_polytan, "theta_shape": (4, N_OUTPUTS)}
 }
 
 route_names = df['road'].unique()
-best_models_per_route = {}
+route_data = {
+    route: (df.loc[df['road'] == route, ['dep_scaled']].values, df.loc[df['road'] == route, ['arr_scaled']].values)
+    for route in route_names
+}
 
 print("Starting route-by-route model training...\n")
+training_start = time.perf_counter()
+
+# every (route, model) cell is independent; WORKERS > 1 fans them out over processes
+best_models_per_route, route_losses = select_models(
+    route_data, models_to_train, method=FIT_METHOD, workers=WORKERS, seed=SEED, fallback=fortuna_algorithm
+)
 
 for route in route_names:
     print(f"--- Finding Best Model for Route: [{route}] ---")
-    
-    route_df = df[df['road'] == route]
-    xs_route = route_df[['dep_scaled']].values
-    y_true_route = route_df[['arr_scaled']].values
-    
-    route_best_loss = float('inf')
-    route_best_model_name = ""
-    route_best_theta = None
-
-    for name, model_info in models_to_train.items():
-        best_theta, final_loss = fortuna_algorithm(
-            xs_route, y_true_route, model_info["module"], model_info["theta_shape"]
-        )
-        print(f"  - Testing {name}: loss = {final_loss:.4f} , theta = {best_theta}")
-        if final_loss < route_best_loss:
-            route_best_loss = final_loss
-            route_best_model_name = name
-            route_best_theta = best_theta
-            
-    best_models_per_route[route] = {
-        "model_name": route_best_model_name,
-        "theta": route_best_theta,
-        "module": models_to_train[route_best_model_name]["module"],
-        "loss": route_best_loss
-    }
+    for name, (best_theta, final_loss) in route_losses[route].items():
+        print(f"  - Testing {name} ({FIT_METHOD}): loss = {final_loss:.4f} , theta = {best_theta.ravel()}")
 
+    route_best_model_name = best_models_per_route[route]["model_name"]
+    route_best_loss = best_models_per_route[route]["loss"]
+    route_best_theta = best_models_per_route[route]["theta"]
     # use RMSE in case I have used the mean loss function (and not sum of squared errors)
     #rmse_scaled = np.sqrt(route_best_loss)
     #rmse_minutes = rmse_scaled * arr_std
@@ -92,6 +100,14 @@ for route in route_names:
           #f"RMSE = {rmse_minutes:.2f} minutes, "
           f"theta = {route_best_theta}\n")
 
+print(f"Training took {(time.perf_counter() - training_start) * 1000:.1f} ms")
+
+# picked up by knut_knut_app.py, also while it is running
+save_route_models(
+    best_models_per_route,
+    {"dep_mu": dep_mu, "dep_sigma": dep_sigma, "arr_mean": arr_mean, "arr_std": arr_std},
+)
+
 
 def predict_best_route_and_time(departure_time_scaled):
     route_predictions = []
@@ -0,0 +1,167 @@
+"""
+One loader for traffic.jsonl, shared by knut_knut_app.py and script.py.
+
+The file is parsed in one json.loads call (all lines joined into a single
+JSON array) instead of one call per line. The HH:MM strings are turned into
+minutes after midnight by viewing them as a (n, 5) byte matrix, with no
+per-row Python. Arrivals earlier than the departure are treated as the next
+day, so the duration wraps at midnight. The road names become small integer
+codes plus a list of names.
+
+The columns are cached as .npy files in .traffic_cache/ next to the source,
+under a key made of the source's size and mtime. A reload with an unchanged
+source memory-maps those files instead of parsing anything. Appending trips
+changes the key and the next load rebuilds the cache.
+
+    trips = load_traffic("traffic.jsonl")    # TrafficData with numpy columns
+    df = load_traffic_df("traffic.jsonl")    # road, dep_min, arr_min, duration_min
+"""
+
+import json
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+
+
+MINUTES_PER_DAY = 24 * 60
+COLUMNS = ("road_code", "dep_min", "arr_min", "duration_min")
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "traffic.jsonl")
+
+
+@dataclass
+class TrafficData:
+    roads: List[str]            # road name of every code
+    road_code: np.ndarray       # int8
+    dep_min: np.ndarray         # int16, minutes after midnight
+    arr_min: np.ndarray         # int16, minutes after midnight (of the arrival day)
+    duration_min: np.ndarray    # int16, wrapped at midnight
+
+    def __len__(self):
+        return len(self.dep_min)
+
+    def road_mask(self, road):
+        return self.road_code == self.roads.index(road)
+
+
+def hhmm_to_minutes(times):
+    """Vectorized 'HH:MM' -> minutes after midnight for a sequence of strings."""
+    raw = np.asarray(times, dtype="S5")
+    if raw.size == 0:
+        return np.zeros(0, dtype=np.int16)
+    digits = raw.view(np.uint8).reshape(-1, 5).astype(np.int16) - ord("0")
+    if not (np.all(raw.view(np.uint8).reshape(-1, 5)[:, 2] == ord(":"))
+            and np.all((digits[:, [0, 1, 3, 4]] >= 0) & (digits[:, [0, 1, 3, 4]] <= 9))):
+        # 'H:MM' or other stray formats: the slow path, still correct
+        return np.array([int(h) * 60 + int(m) for h, m in (t.split(":") for t in times)], dtype=np.int16)
+    return (digits[:, 0] * 10 + digits[:, 1]) * 60 + digits[:, 3] * 10 + digits[:, 4]
+
+
+def parse_traffic(path):
+    """Parse the JSON lines file into a TrafficData (no cache)."""
+    with open(path, "r", encoding="utf-8") as f:
+        lines = [line for line in f.read().splitlines() if line.strip()]
+    records = json.loads("[" + ",".join(lines) + "]")
+
+    # the log spells it 'depature'; accept the correct spelling too
+    dep_key = "depature" if records and "depature" in records[0] else "departure"
+    dep_min = hhmm_to_minutes([r[dep_key] for r in records])
+    arr_min = hhmm_to_minutes([r["arrival"] for r in records])
+    roads, road_code = np.unique([r["road"] for r in records], return_inverse=True)
+
+    return TrafficData(
+        roads=roads.tolist(),
+        road_code=road_code.astype(np.int8),
+        dep_min=dep_min,
+        arr_min=arr_min,
+        duration_min=((arr_min - dep_min) % MINUTES_PER_DAY).astype(np.int16),
+    )
+
+
+def _cache_key(path):
+    st = os.stat(path)
+    return "{}-{}-{}".format(os.path.basename(path), st.st_size, st.st_mtime_ns)
+
+
+def _write_cache(data, cache_dir, key):
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=cache_dir, prefix=".tmp-")
+    for name in COLUMNS:
+        np.save(os.path.join(tmp, name + ".npy"), getattr(data, name))
+    with open(os.path.join(tmp, "roads.json"), "w") as f:
+        json.dump(data.roads, f)
+    target = os.path.join(cache_dir, key)
+    try:
+        os.rename(tmp, target)
+    except OSError:
+        # another process finished the same cache first
+        shutil.rmtree(tmp, ignore_errors=True)
+        return
+    # drop the caches of earlier versions of the same file
+    stem = key.rsplit("-", 2)[0]
+    for old in os.listdir(cache_dir):
+        if old != key and old.rsplit("-", 2)[0] == stem:
+            shutil.rmtree(os.path.join(cache_dir, old), ignore_errors=True)
+
+
+def _read_cache(directory):
+    with open(os.path.join(directory, "roads.json")) as f:
+        roads = json.load(f)
+    columns = {name: np.load(os.path.join(directory, name + ".npy"), mmap_mode="r") for name in COLUMNS}
+    return TrafficData(roads=roads, **columns)
+
+
+def load_traffic(path=DEFAULT_PATH, cache_dir: Optional[str] = None, use_cache=True):
+    """
+    TrafficData of `path`. The columns are read-only memory maps when they
+    come from the cache, plain arrays otherwise.
+    """
+    if not use_cache:
+        return parse_traffic(path)
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(path)), ".traffic_cache")
+    key = _cache_key(path)
+    directory = os.path.join(cache_dir, key)
+    if os.path.isdir(directory):
+        try:
+            return _read_cache(directory)
+        except (OSError, ValueError):
+            shutil.rmtree(directory, ignore_errors=True)
+    data = parse_traffic(path)
+    _write_cache(data, cache_dir, key)
+    return data
+
+
+def load_traffic_df(path=DEFAULT_PATH, cache_dir: Optional[str] = None, use_cache=True):
+    """The trips as a DataFrame: road (categorical), dep_min, arr_min, duration_min."""
+    import pandas as pd
+
+    data = load_traffic(path, cache_dir, use_cache)
+    return pd.DataFrame({
+        "road": pd.Categorical.from_codes(np.asarray(data.road_code), data.roads),
+        "dep_min": np.asarray(data.dep_min),
+        "arr_min": np.asarray(data.arr_min),
+        "duration_min": np.asarray(data.duration_min),
+    })
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Parse traffic.jsonl and time cold vs cached loads")
+    parser.add_argument("path", nargs="?", default=DEFAULT_PATH)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    parse_traffic(args.path)
+    parsed = time.perf_counter() - start
+    load_traffic(args.path)
+    start = time.perf_counter()
+    data = load_traffic(args.path)
+    cached = time.perf_counter() - start
+    print("{} trips, roads {}".format(len(data), data.roads))
+    print("parse {:.2f} ms, cached load {:.3f} ms".format(parsed * 1e3, cached * 1e3))
@@ -0,0 +1,332 @@
+"""
+Load test for the course web apps under a production WSGI server.
+
+Every app is imported in-process from its file, served by waitress (or, when
+waitress is not installed, a threaded wsgiref server) on a free local port,
+and driven by a pool of client threads with keep-alive connections. For every
+endpoint and Dash callback the run reports p50/p99/mean latency, throughput
+and errors, followed by an allocation pass: the same requests sent one at a
+time through the app's test client under tracemalloc, giving peak and
+retained bytes per request.
+
+    rangefinder   Assignment 1/rangefinder.py          form, /api/estimate, /api/stats
+    knut_knut     Assignment 3/knut_knut_app.py        form, /get_best_route
+    kkd           Assignment 4 (Hand-in 2)/kkd_dashboard.py   page, predict_price callback
+
+Results can be saved as JSON and later runs compared against them; with
+--max-regression the script exits with 1 when a p50 or p99 got slower by
+more than that fraction, so it can gate a deployment.
+
+Usage:
+    python load_test.py
+    python load_test.py --apps rangefinder --concurrency 8 --requests 2000
+    python load_test.py --save baseline.json
+    python load_test.py --compare baseline.json --max-regression 0.2
+"""
+
+import argparse
+import http.client
+import importlib.util
+import json
+import os
+import random
+import socketserver
+import sys
+import threading
+import time
+import tracemalloc
+import urllib.parse
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+import numpy as np
+
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+# -- scenarios ---------------------------------------------------------------------------
+# A scenario is (label, method, path, body) where body(rng) returns (content type, bytes)
+# or None, so every request can carry different inputs.
+
+def _form(fields):
+    return lambda rng: ("application/x-www-form-urlencoded", urllib.parse.urlencode(fields(rng)).encode())
+
+
+def _json(payload):
+    return lambda rng: ("application/json", json.dumps(payload(rng)).encode())
+
+
+def _rangefinder_form(rng):
+    return {"angle_b": round(rng.uniform(1, 89), 1), "steps": rng.randint(1, 200), "shoe_size_eu": rng.randint(36, 47)}
+
+
+def _rangefinder_batch(rng, n=200):
+    return {
+        "angle_b": [round(rng.uniform(0, 89), 1) for _ in range(n)],
+        "steps": [rng.randint(1, 200) for _ in range(n)],
+        "shoe_size_eu": [rng.randint(36, 47) for _ in range(n)],
+    }
+
+
+def _dash_callback(rng):
+    # The request the browser sends when an input of predict_price changes
+    return {
+        "output": "output-price.children",
+        "outputs": {"id": "output-price", "property": "children"},
+        "inputs": [
+            {"id": "year", "property": "value", "value": rng.randint(1900, 2024)},
+            {"id": "remodeled", "property": "value", "value": rng.randint(1950, 2024)},
+            {"id": "color", "property": "value", "value": rng.choice(["blue", "red"])},
+            {"id": "month-to-marked", "property": "value",
+             "value": rng.choice(["jan", "feb", "march", "april", "november"])},
+        ],
+        "changedPropIds": ["year.value"],
+        "state": [],
+    }
+
+
+APPS = {
+    "rangefinder": {
+        "path": os.path.join("Assignment 1", "rangefinder.py"),
+        "scenarios": [
+            ("GET /", "GET", "/", None),
+            ("POST / (form)", "POST", "/", _form(_rangefinder_form)),
+            ("POST /api/estimate (200 rows)", "POST", "/api/estimate", _json(_rangefinder_batch)),
+            ("GET /api/stats", "GET", "/api/stats", None),
+        ],
+    },
+    "knut_knut": {
+        "path": os.path.join("Assignment 3", "knut_knut_app.py"),
+        "scenarios": [
+            ("GET /", "GET", "/", None),
+            ("GET /get_best_route", "GET",
+             lambda rng: "/get_best_route?hour={:02d}&mins={:02d}".format(rng.randint(6, 16), rng.randint(0, 59)),
+             None),
+        ],
+    },
+    "kkd": {
+        "path": os.path.join("Assignment 4 (Hand-in 2)", "kkd_dashboard.py"),
+        "scenarios": [
+            ("GET /", "GET", "/", None),
+            ("GET /_dash-layout", "GET", "/_dash-layout", None),
+            ("callback predict_price", "POST", "/_dash-update-component", _json(_dash_callback)),
+        ],
+    },
+}
+
+
+# -- app loading and serving -------------------------------------------------------------
+
+def load_wsgi_app(path):
+    """Import the app file as a module and return its Flask WSGI app (Dash: app.server)."""
+    path = os.path.join(ROOT, path)
+    directory = os.path.dirname(path)
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+    name = "loadtest_" + os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    app = module.app
+    return getattr(app, "server", app)
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class _ThreadingWSGIServer(socketserver.ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+def start_server(app, threads=8, server="auto"):
+    """Serve `app` on 127.0.0.1 in a daemon thread; returns (port, server name, stop)."""
+    if server in ("auto", "waitress"):
+        try:
+            from waitress.server import create_server
+        except ImportError:
+            if server == "waitress":
+                raise
+        else:
+            srv = create_server(app, host="127.0.0.1", port=0, threads=threads, _quiet=True)
+            threading.Thread(target=srv.run, daemon=True).start()
+            return srv.effective_port, "waitress ({} threads)".format(threads), srv.close
+
+    srv = make_server("127.0.0.1", 0, app, server_class=_ThreadingWSGIServer, handler_class=_QuietHandler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+
+    def stop():
+        srv.shutdown()
+        srv.server_close()
+    return srv.server_port, "wsgiref (thread per request)", stop
+
+
+# -- load generation ---------------------------------------------------------------------
+
+def _request(scenario, rng):
+    _, method, path, body = scenario
+    if callable(path):
+        path = path(rng)
+    headers, data = {}, None
+    if body is not None:
+        content_type, data = body(rng)
+        headers["Content-Type"] = content_type
+    return method, path, data, headers
+
+
+def drive(port, scenario, n_requests, concurrency, seed=0):
+    """
+    Send `n_requests` of one scenario from `concurrency` threads.
+    Returns (latencies in seconds, errors, wall time).
+    """
+    latencies, errors = [], []
+    lock = threading.Lock()
+    counter = iter(range(n_requests))
+
+    def worker(k):
+        rng = random.Random(seed * 1000 + k)
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        own, own_errors = [], []
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    break
+            method, path, data, headers = _request(scenario, rng)
+            start = time.perf_counter()
+            try:
+                conn.request(method, path, body=data, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+                if response.getheader("Connection", "").lower() == "close" or response.version == 10:
+                    conn.close()
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                own_errors.append(type(e).__name__)
+                continue
+            own.append(time.perf_counter() - start)
+            if status >= 400:
+                own_errors.append(str(status))
+        conn.close()
+        with lock:
+            latencies.extend(own)
+            errors.extend(own_errors)
+
+    threads = [threading.Thread(target=worker, args=(k,)) for k in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, errors, time.perf_counter() - start
+
+
+def allocations(app, scenario, n_requests, seed=0):
+    """Median peak and mean retained bytes per request, sent one by one through the test client."""
+    client = app.test_client()
+    rng = random.Random(seed)
+    peaks, retained = [], []
+    tracemalloc.start()
+    try:
+        for _ in range(n_requests):
+            method, path, data, headers = _request(scenario, rng)
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            client.open(path, method=method, data=data, headers=headers)
+            current, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            retained.append(current - before)
+    finally:
+        tracemalloc.stop()
+    return float(np.median(peaks)), float(np.mean(retained))
+
+
+def run_app(name, n_requests, concurrency, warmup, alloc_requests, server, seed):
+    spec = APPS[name]
+    app = load_wsgi_app(spec["path"])
+    port, server_name, stop = start_server(app, threads=concurrency, server=server)
+    print("\n{} ({}) on port {} under {}".format(name, spec["path"], port, server_name))
+    print("{:<34s} {:>9s} {:>9s} {:>9s} {:>10s} {:>7s} {:>11s} {:>11s}".format(
+        "endpoint", "p50 ms", "p99 ms", "mean ms", "req/s", "errors", "peak KiB", "kept B"))
+
+    results = {}
+    try:
+        for scenario in spec["scenarios"]:
+            if warmup:
+                drive(port, scenario, warmup, 1, seed)
+            latencies, errors, wall = drive(port, scenario, n_requests, concurrency, seed)
+            peak, kept = allocations(app, scenario, alloc_requests, seed)
+            ms = np.array(latencies) * 1000.0 if latencies else np.array([np.nan])
+            row = {
+                "p50_ms": float(np.percentile(ms, 50)),
+                "p99_ms": float(np.percentile(ms, 99)),
+                "mean_ms": float(ms.mean()),
+                "throughput": len(latencies) / wall if wall > 0 else 0.0,
+                "errors": len(errors),
+                "peak_bytes": peak,
+                "retained_bytes": kept,
+            }
+            results[scenario[0]] = row
+            print("{:<34s} {:>9.2f} {:>9.2f} {:>9.2f} {:>10.0f} {:>7d} {:>11.1f} {:>11.0f}".format(
+                scenario[0], row["p50_ms"], row["p99_ms"], row["mean_ms"], row["throughput"],
+                row["errors"], peak / 1024.0, kept))
+            if errors:
+                print("    first errors:", ", ".join(sorted(set(errors))[:5]))
+    finally:
+        stop()
+    return results
+
+
+def compare(results, baseline, max_regression):
+    """Print the change against `baseline`; returns the endpoints slower than allowed."""
+    regressions = []
+    print("\nchange against baseline (p50 / p99)")
+    for app_name, endpoints in results.items():
+        for endpoint, row in endpoints.items():
+            old = baseline.get(app_name, {}).get(endpoint)
+            if old is None:
+                continue
+            changes = [row[k] / old[k] - 1.0 if old[k] > 0 else 0.0 for k in ("p50_ms", "p99_ms")]
+            flag = ""
+            if max_regression is not None and max(changes) > max_regression:
+                regressions.append((app_name, endpoint))
+                flag = "  REGRESSION"
+            print("  {:<12s} {:<34s} {:>+7.1%} {:>+7.1%}{}".format(app_name, endpoint, changes[0], changes[1], flag))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the Flask and Dash apps")
+    parser.add_argument("--apps", nargs="+", choices=sorted(APPS), default=sorted(APPS))
+    parser.add_argument("--requests", type=int, default=1000, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=4, help="client threads (and server threads)")
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--alloc-requests", type=int, default=100, help="requests of the allocation pass")
+    parser.add_argument("--server", choices=["auto", "waitress", "wsgiref"], default="auto")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON file of an earlier --save")
+    parser.add_argument("--max-regression", type=float, default=None,
+                        help="with --compare: fail when p50 or p99 grows by more than this fraction")
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.apps:
+        try:
+            results[name] = run_app(name, args.requests, args.concurrency, args.warmup,
+                                    args.alloc_requests, args.server, args.seed)
+        except ImportError as e:
+            print("\n{}: skipped, {}".format(name, e))
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+        print("\nresults written to", args.save)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.max_regression):
+            sys.exit(1)